@@ -0,0 +1,233 @@
+# Benchmark for Library operations on synthetic catalogs
+# Usage: python -m benchmarks.bench_library [--sizes 10000 100000] [--storage json] [--output results.json]
+#        python -m benchmarks.bench_library --compare old.json new.json
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from models.library import Library
+from benchmarks.data import write_dataset
+from storage.migrate import migrate
+from storage.sqlite_storage import SqliteStorage
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+STORAGES = ["json", "journal", "sqlite"]
+
+
+# Method to get a percentile from an already sorted list of numbers
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+# Method to turn the latencies of one operation into a result record
+def summarize(operation, size, latencies, peak_memory):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "operation": operation,
+        "size": size,
+        "iterations": len(latencies),
+        "throughput_ops_per_s": len(latencies) / total if total else None,
+        "latency_ms": {
+            "mean": total / len(latencies) * 1000 if latencies else 0.0,
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p90": percentile(latencies, 0.90) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0
+        },
+        "peak_memory_bytes": peak_memory
+    }
+
+
+# Method to time each call separately, in seconds
+def time_calls(calls):
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# Method to get the peak traced memory used while running the calls
+def peak_memory(calls):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for call in calls:
+            call()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+class LibraryBenchmark:
+    def __init__(self, size, user_count, storage, columnar, iterations, workdir, seed=0):
+        self.size = size
+        self.storage = storage
+        self.columnar = columnar
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+        self.books_path = os.path.join(workdir, f"library_{size}.json")
+        self.users_path = os.path.join(workdir, f"users_{size}.json")
+        self.db_path = os.path.join(workdir, f"library_{size}.db")
+        self.books, self.users = write_dataset(self.books_path, self.users_path, size, user_count, seed)
+        if storage == "sqlite":
+            migrate(self.books_path, self.users_path, self.db_path)
+        self.library = None
+
+    # Method to open the library the way the selected storage needs
+    def open_library(self):
+        if self.storage == "sqlite":
+            return Library(None, None, storage=SqliteStorage(self.db_path), columnar=self.columnar)
+        return Library(self.books_path, self.users_path, journal=self.storage == "journal", columnar=self.columnar)
+
+    def sample(self, items, count):
+        return self.rng.sample(items, min(count, len(items)))
+
+    # Methods building the calls for each operation, tag keeps repeated runs from colliding
+    def load_calls(self, count, tag):
+        return [self.open_library for _ in range(count)]
+
+    def search_title_calls(self, count, tag):
+        titles = [book["title"] for book in self.sample(self.books, count)]
+        return [lambda title=title: self.library.search_by_title(title) for title in titles]
+
+    def search_title_fuzzy_calls(self, count, tag):
+        queries = [" ".join(book["title"].split()[2:]).lower() for book in self.sample(self.books, count)]
+        return [lambda query=query: self.library.search_by_title(query) for query in queries]
+
+    def search_author_calls(self, count, tag):
+        authors = [book["author"] for book in self.sample(self.books, count)]
+        return [lambda author=author: self.library.search_by_author(author) for author in authors]
+
+    def display_calls(self, count, tag):
+        return [self.library.display_books for _ in range(max(1, count // 10))]
+
+    def display_page_calls(self, count, tag):
+        offsets = [self.rng.randrange(len(self.books)) for _ in range(count)]
+        return [lambda offset=offset: self.library.display_books(offset, 20) for offset in offsets]
+
+    def overdue_calls(self, count, tag):
+        return [lambda: self.library.overdue_books(limit=50) for _ in range(count)]
+
+    def add_calls(self, count, tag):
+        return [lambda n=n: self.library.add_book(f"Benchmark Book {tag} {n}", "Benchmark Author") for n in range(count)]
+
+    def remove_calls(self, count, tag):
+        return [lambda n=n: self.library.remove_book(f"Benchmark Book {tag} {n}") for n in range(count)]
+
+    def borrow_calls(self, count, tag):
+        self.lent = [book["title"] for book in self.sample([book for book in self.books if book["status"]], count)]
+        return [lambda title=title: self.library.borrow_book(title) for title in self.lent]
+
+    def return_calls(self, count, tag):
+        return [lambda title=title: self.library.return_book(title) for title in self.lent]
+
+    def save_books_calls(self, count, tag):
+        return [self.library.add_book_to_file for _ in range(max(1, count // 10))]
+
+    def save_users_calls(self, count, tag):
+        return [self.library.save_users for _ in range(max(1, count // 10))]
+
+    # Method to run every operation and return one result record per operation
+    def run(self, trace_memory=True):
+        operations = [
+            ("load", self.load_calls, max(1, self.iterations // 20)),
+            ("search_by_title", self.search_title_calls, self.iterations),
+            ("search_by_title_fuzzy", self.search_title_fuzzy_calls, self.iterations),
+            ("search_by_author", self.search_author_calls, self.iterations),
+            ("display_books", self.display_calls, self.iterations),
+            ("display_books_page", self.display_page_calls, self.iterations),
+            ("overdue_books", self.overdue_calls, self.iterations),
+            ("add_book", self.add_calls, self.iterations),
+            ("remove_book", self.remove_calls, self.iterations),
+            ("borrow_book", self.borrow_calls, self.iterations),
+            ("return_book", self.return_calls, self.iterations),
+            ("add_book_to_file", self.save_books_calls, self.iterations),
+            ("save_users", self.save_users_calls, self.iterations),
+        ]
+        self.library = self.open_library()
+        reader = next(iter(self.users))
+        self.library.login(reader, self.users[reader]["password"])
+
+        results = []
+        for operation, make_calls, count in operations:
+            latencies = time_calls(make_calls(count, "timed"))
+            results.append(summarize(operation, self.size, latencies, None))
+        if trace_memory:  # second, shorter pass, tracemalloc slows everything down
+            for result, (operation, make_calls, count) in zip(results, operations):
+                result["peak_memory_bytes"] = peak_memory(make_calls(max(1, min(count, 10)), "traced"))
+        if self.storage == "sqlite":
+            self.library.storage.close()
+        return results
+
+
+# Method to print how the p50 latency of each operation changed between two runs
+def compare(old_path, new_path):
+    with open(old_path) as file:
+        old = {(r["operation"], r["size"]): r for r in json.load(file)["results"]}
+    with open(new_path) as file:
+        new = json.load(file)["results"]
+    print(f"{'operation':<24}{'size':>10}{'old p50 ms':>14}{'new p50 ms':>14}{'change':>10}")
+    for result in new:
+        before = old.get((result["operation"], result["size"]))
+        if before is None:
+            continue
+        old_p50 = before["latency_ms"]["p50"]
+        new_p50 = result["latency_ms"]["p50"]
+        change = f"{(new_p50 / old_p50 - 1) * 100:+.1f}%" if old_p50 else "n/a"
+        print(f"{result['operation']:<24}{result['size']:>10}{old_p50:>14.3f}{new_p50:>14.3f}{change:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Library operations on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalog sizes to test")
+    parser.add_argument("--users", type=int, default=1000, help="number of synthetic users")
+    parser.add_argument("--storage", choices=STORAGES, default="json")
+    parser.add_argument("--columnar", action="store_true", help="use the columnar catalog")
+    parser.add_argument("--iterations", type=int, default=100, help="calls per operation")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Benchmarking {size} books...", file=sys.stderr)
+            benchmark = LibraryBenchmark(size, args.users, args.storage, args.columnar, args.iterations, workdir)
+            results.extend(benchmark.run(trace_memory=not args.no_memory))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "columnar": args.columnar,
+        "users": args.users,
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
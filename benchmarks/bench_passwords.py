@@ -0,0 +1,82 @@
+# Benchmark of logins per second at each password hashing work factor
+# Usage: python -m benchmarks.bench_passwords [--scheme scrypt] [--costs 12 13 14 15] [--threads 4]
+#        [--logins 200] [--cache] [--output results.json]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.bench_library import summarize
+from models.library import Library
+from utils.passwords import SCHEMES, PasswordHasher
+
+DEFAULT_COSTS = {"scrypt": [12, 13, 14, 15], "pbkdf2_sha256": [100000, 300000, 600000]}
+
+
+# Method to time logins spread over users readers from threads threads, with passwords
+# hashed by hasher. Returns the result record with the logins per second
+def bench_logins(hasher, users, logins, threads):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open(os.path.join(temp_dir, "users_data.json"), "w") as file:
+            json.dump({f"reader{n}": {"password": hasher.hash(f"password{n}"), "role": "reader", "borrowed_books": []}
+                       for n in range(users)}, file)
+        library = Library(os.path.join(temp_dir, "library_data.json"), os.path.join(temp_dir, "users_data.json"),
+                          password_hasher=hasher)
+        library.users # load them before timing
+
+        def login(n):
+            start = time.perf_counter()
+            success, _ = library.create_session(f"reader{n % users}", f"password{n % users}")
+            if not success:
+                raise RuntimeError("Login failed")
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            start = time.perf_counter()
+            latencies = list(executor.map(login, range(logins)))
+            elapsed = time.perf_counter() - start
+    result = summarize("login", users, latencies, None)
+    result.update({"scheme": hasher.scheme, "cost": hasher.cost, "threads": threads,
+                   "cached": hasher.cache.maxsize > 0, "logins_per_sec": logins / elapsed})
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure logins per second at each password work factor.")
+    parser.add_argument("--scheme", choices=SCHEMES, default="scrypt")
+    parser.add_argument("--costs", type=int, nargs="+",
+                        help="work factors to test, log2 of n for scrypt or PBKDF2 iterations")
+    parser.add_argument("--users", type=int, default=50, help="number of synthetic users")
+    parser.add_argument("--logins", type=int, default=200, help="logins per work factor")
+    parser.add_argument("--threads", type=int, default=4, help="threads logging in at once")
+    parser.add_argument("--cache", action="store_true", help="also measure with the verification cache on")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    for cost in args.costs or DEFAULT_COSTS[args.scheme]:
+        for cache_size in ([0, args.users] if args.cache else [0]):
+            print(f"Logging in with {args.scheme} cost {cost}{' (cached)' if cache_size else ''}...", file=sys.stderr)
+            hasher = PasswordHasher(args.scheme, cost, cache_size=cache_size)
+            results.append(bench_logins(hasher, args.users, args.logins, args.threads))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
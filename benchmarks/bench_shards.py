@@ -0,0 +1,69 @@
+# Benchmark of fuzzy scans that can't use the n-gram index, on one shard and on several
+# Usage: python -m benchmarks.bench_shards [--size 200000] [--shards 1 2 4 8] [--output results.json]
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from benchmarks.bench_library import summarize, time_calls
+from benchmarks.data import generate_books
+from models.book import Book
+from models.catalog import Catalog
+from models.sharded_catalog import ShardedCatalog
+
+# queries too short for the index, so every book is checked, with few matches each
+QUERIES = ["zq", "x", "77 4", "05 9", "wy", "j 88"]
+
+
+# Method to time scans of a catalog of size books split into shards shards (1 = no workers)
+def bench_scans(books, shards, iterations, seed=0):
+    rng = random.Random(seed)
+    catalog = Catalog(books) if shards == 1 else ShardedCatalog(books, shards=shards, parallel_min=0)
+    try:
+        if shards > 1:
+            catalog.fuzzy_by_title("x") # start the workers and send them the books before timing
+        queries = [rng.choice(QUERIES) for _ in range(iterations)]
+        results = []
+        for field, scan in [("title", catalog.fuzzy_by_title), ("author", catalog.fuzzy_by_author)]:
+            latencies = time_calls([lambda query=query: scan(query) for query in queries])
+            result = summarize(f"scan_{field}", len(books), latencies, None)
+            result["shards"] = shards
+            results.append(result)
+        return results
+    finally:
+        catalog.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fuzzy scan latency on one and several shards.")
+    parser.add_argument("--size", type=int, default=200000, help="number of books")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="shard counts to test")
+    parser.add_argument("--iterations", type=int, default=50, help="scans per field and shard count")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    books = [Book(record["title"], record["author"], True) for record in generate_books(args.size)]
+    results = []
+    for shards in args.shards:
+        print(f"Scanning {args.size} books on {shards} shard(s)...", file=sys.stderr)
+        results.extend(bench_scans(books, shards, args.iterations))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
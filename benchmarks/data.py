@@ -0,0 +1,71 @@
+# Synthetic catalogs and user bases for the benchmarks
+
+import json
+import random
+import time
+from models.book import DAY, LOAN_DAYS
+
+ADJECTIVES = ["Silent", "Hidden", "Broken", "Golden", "Last", "Lost", "Crimson", "Endless", "Quiet", "Distant",
+              "Burning", "Frozen", "Secret", "Wild", "Hollow", "Bright", "Ancient", "Restless", "Fallen", "Paper"]
+NOUNS = ["River", "Garden", "Kingdom", "Letter", "Mountain", "Harbor", "Library", "Promise", "Shadow", "Voyage",
+         "Orchard", "Window", "Empire", "Season", "Island", "Machine", "Forest", "Station", "Mirror", "Storm"]
+FIRST_NAMES = ["Amara", "Thabo", "Lerato", "James", "Maria", "Chen", "Fatima", "Olga", "Kwame", "Sofia",
+               "Noah", "Aisha", "Lucas", "Yuki", "Sipho", "Elena", "Omar", "Zanele", "Ivan", "Grace"]
+LAST_NAMES = ["Dlamini", "Smith", "Garcia", "Nkosi", "Kim", "Okafor", "Rossi", "Naidoo", "Novak", "Mensah",
+              "Silva", "Khumalo", "Tanaka", "Brown", "Mokoena", "Petrov", "Haddad", "Zulu", "Jansen", "Moyo"]
+
+
+# Method to make a unique book title for number n
+def make_title(n, rng):
+    return f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}"
+
+
+# Method to make an author name, there are about one author per ten books
+def make_author(n, rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}"
+
+
+# Method to generate book records, borrowed_fraction of them lent to one of the users at some
+# time in the last four weeks, so about half of those are overdue
+def generate_books(size, usernames=(), borrowed_fraction=0.1, seed=0):
+    rng = random.Random(seed)
+    now = time.time()
+    authors = [make_author(n, rng) for n in range(max(1, size // 10))]
+    books = []
+    for n in range(size):
+        borrower = borrowed_at = due_at = None
+        if usernames and rng.random() < borrowed_fraction:
+            borrower = rng.choice(usernames)
+            borrowed_at = now - rng.uniform(0, 4 * 7 * DAY)
+            due_at = borrowed_at + LOAN_DAYS * DAY
+        books.append({
+            "id": n + 1,
+            "title": make_title(n, rng),
+            "author": rng.choice(authors),
+            "status": borrower is None,
+            "borrowed_by": borrower,
+            "borrowed_at": borrowed_at,
+            "due_at": due_at
+        })
+    return books
+
+
+# Method to generate user records and attach the loans of each user
+def generate_users(count, books=()):
+    users = {f"reader{n}": {"password": f"password{n}", "role": "reader", "borrowed_books": []} for n in range(count)}
+    for book in books:
+        if book["borrowed_by"] is not None:
+            users[book["borrowed_by"]]["borrowed_books"].append({"id": book["id"], "title": book["title"]})
+    return users
+
+
+# Method to write a synthetic library to the two JSON data files
+def write_dataset(books_path, users_path, size, user_count, seed=0):
+    usernames = [f"reader{n}" for n in range(user_count)]
+    books = generate_books(size, usernames, seed=seed)
+    users = generate_users(user_count, books)
+    with open(books_path, "w") as file:
+        json.dump(books, file, indent=4)
+    with open(users_path, "w") as file:
+        json.dump(users, file, indent=4)
+    return books, users
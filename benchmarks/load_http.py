@@ -0,0 +1,149 @@
+# Load generator for the library HTTP service
+# Usage: python -m benchmarks.load_http [--url http://127.0.0.1:8080] [--connections 50] [--duration 10]
+#        [--mix search] [--output results.json]
+#
+# Each connection sends requests back to back over keep-alive and the run reports requests per second
+# and latency percentiles. The "borrow" mix logs in as the given reader and borrows/returns titles.
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from urllib.parse import quote, urlsplit
+from benchmarks.bench_library import percentile
+
+
+class HttpConnection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    # Method to send one request and read the response, JSON responses are decoded
+    async def request(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(data)}\r\n"
+        if token:
+            head += f"Authorization: Bearer {token}\r\n"
+        self.writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        body = await self.reader.readexactly(length) if length else b""
+        if not body:
+            return status, None
+        if headers.get("content-type", "").startswith("application/json"):
+            return status, json.loads(body)
+        return status, body.decode("utf-8")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+# Method to fetch up to limit titles to use in the generated requests
+async def fetch_titles(host, port, limit=1000):
+    connection = HttpConnection(host, port)
+    await connection.open()
+    try:
+        status, payload = await connection.request("GET", f"/books?limit={limit}")
+        return [book["title"] for book in payload["books"]]
+    finally:
+        connection.close()
+
+
+async def worker(host, port, titles, mix, deadline, latencies, errors, credentials):
+    connection = HttpConnection(host, port)
+    await connection.open()
+    rng = random.Random()
+    token = None
+    if mix == "borrow":
+        status, payload = await connection.request("POST", "/login", credentials)
+        token = payload.get("token")
+    try:
+        while time.perf_counter() < deadline:
+            title = rng.choice(titles)
+            start = time.perf_counter()
+            if mix == "borrow":
+                status, _ = await connection.request("POST", "/borrow", {"title": title}, token)
+                latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                status, _ = await connection.request("POST", "/return", {"title": title}, token)
+            elif rng.random() < 0.5:
+                status, _ = await connection.request("GET", f"/search/title?q={quote(title)}")
+            else:
+                words = title.split()
+                status, _ = await connection.request("GET", f"/search/author?q={quote(rng.choice(words))}")
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(status)
+    finally:
+        connection.close()
+
+
+async def run_load(url, connections, duration, mix, credentials):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    titles = await fetch_titles(host, port)
+    if not titles:
+        raise SystemExit("The library has no books to query.")
+    latencies, errors = [], []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(host, port, titles, mix, deadline, latencies, errors, credentials)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "url": url,
+        "mix": mix,
+        "connections": connections,
+        "duration_s": elapsed,
+        "requests": len(latencies),
+        "requests_per_s": len(latencies) / elapsed,
+        "errors": len(errors),
+        "latency_ms": {
+            "p50": percentile(latencies, 0.50) * 1000,
+            "p90": percentile(latencies, 0.90) * 1000,
+            "p99": percentile(latencies, 0.99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0
+        }
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure requests per second against the library service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--mix", choices=["search", "borrow"], default="search")
+    parser.add_argument("--username", help="reader used by the borrow mix")
+    parser.add_argument("--password")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    credentials = {"username": args.username or "", "password": args.password or ""}
+    report = asyncio.run(run_load(args.url, args.connections, args.duration, args.mix, credentials))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# Command line tool to import books from a CSV or JSON Lines file
+# Usage: python -m interface.import_books FILE [--format csv|jsonl] [--report REPORT.json]
+
+import argparse
+import csv
+import json
+import os
+import sys
+from models.library import Library
+
+
+# Method to read (title, author) records from a CSV file, with or without a header row
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = csv.reader(file)
+        for row in rows:
+            if not row:
+                continue
+            if [cell.strip().lower() for cell in row[:2]] == ["title", "author"]:
+                continue # skip the header row
+            yield {"title": row[0], "author": row[1] if len(row) > 1 else ""}
+
+
+# Method to read records from a JSON Lines file, one {"title": ..., "author": ...} object per line
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            if not isinstance(record, dict):
+                print(f"Line {line_number} is not a JSON object and will be reported as invalid.")
+                record = {}
+            yield {"title": record.get("title", ""), "author": record.get("author", "")}
+
+
+# Method to import every record of the file into the library and return the report
+def import_books(library, path, file_format=None):
+    if file_format is None:
+        file_format = "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    records = read_jsonl(path) if file_format == "jsonl" else read_csv(path)
+    return library.add_books(records)
+
+
+def main(argv=None):
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Import books into the library from a CSV or JSON Lines file.")
+    parser.add_argument("file", help="CSV file with title,author columns or JSON Lines file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format, guessed from the extension by default")
+    parser.add_argument("--books", default=os.path.join(base_path, "data", "library_data.json"))
+    parser.add_argument("--users", default=os.path.join(base_path, "data", "users_data.json"))
+    parser.add_argument("--report", help="write the per record report to this JSON file")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} does not exist.")
+        return 1
+
+    library = Library(args.books, args.users)
+    report = import_books(library, args.file, args.format)
+
+    counts = {"added": 0, "duplicate": 0, "invalid": 0}
+    for result in report:
+        counts[result["status"]] += 1
+        if result["status"] == "invalid":
+            print(f"Record {result['record']}: {result['message']}")
+    print(f"Imported {counts['added']} books, skipped {counts['duplicate']} duplicates and {counts['invalid']} invalid records.")
+
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(report, file, indent=4)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
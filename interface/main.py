@@ -1,8 +1,30 @@
+import atexit
 import os
 import sys
+import time
+STARTED = time.perf_counter() # before the library modules are imported, for the --timing report
 from models.library import Library
 from models.book import Book
 
+PAGE_SIZE = 20 # books shown per page when browsing the catalog
+
+# Print how long each startup step took, and when the books and users were loaded
+def startup_report(library, steps):
+    print("\n=== Startup Timing ===")
+    for name, seconds in steps:
+        print(f"{name:<24}{seconds * 1000:>10.1f} ms")
+    loading_report(library)
+
+def loading_report(library, heading=None):
+    if heading:
+        print(f"\n=== {heading} ===")
+    for name in ["books", "users"]:
+        seconds = library.load_times.get(name)
+        if seconds is None:
+            print(f"{'load ' + name:<24}{'not loaded':>13}")
+        else:
+            print(f"{'load ' + name:<24}{seconds * 1000:>10.1f} ms")
+
 # User authentication
 def authenticate_user(library):
     while True:
@@ -33,6 +55,87 @@ def authenticate_user(library):
         except ValueError:
             print("Invalid input. Please enter a number.")
 
+# Page through the books in the library, readers can also pick a book to borrow
+def browse_books(library, allow_borrow=False):
+    offset = 0
+    while True:
+        total = library.count_books()
+        if total == 0:
+            print("There are no books in this library.")
+            return
+        offset = min(offset, (total - 1) // PAGE_SIZE * PAGE_SIZE) # books may have been removed meanwhile
+        print(library.display_books(offset, PAGE_SIZE))
+        last = min(offset + PAGE_SIZE, total)
+        print(f"\nShowing books {offset + 1}-{last} of {total}.")
+
+        prompt = "n = next page, p = previous page"
+        if allow_borrow:
+            prompt += ", book number to borrow"
+        choice = input(f"{prompt} (or press Enter to go back): ").strip().lower()
+        if not choice:
+            return
+        elif choice == "n":
+            if last < total:
+                offset += PAGE_SIZE
+            else:
+                print("This is the last page.")
+        elif choice == "p":
+            if offset > 0:
+                offset -= PAGE_SIZE
+            else:
+                print("This is the first page.")
+        elif allow_borrow:
+            try:
+                book_idx = int(choice) - 1
+                page = library.books_page(book_idx, 1) if book_idx >= 0 else []
+                if page:
+                    book = page[0]
+                    if book.status:
+                        print(library.borrow_book(book.title))
+                    else:
+                        print(f"{book.title} is currently borrowed.")
+                        offer_hold(library, book.title)
+                else:
+                    print("Invalid book number.")
+            except ValueError:
+                print("Invalid input. Please enter a valid number.")
+        else:
+            print("Invalid choice.")
+
+# Ask a reader whether to join the queue for a book that is borrowed
+def offer_hold(library, title):
+    hold_choice = input("Do you want to place a hold? (y/n): ").lower()
+    if hold_choice in ['y', 'yes']:
+        print(library.place_hold(title))
+
+# Due date of a lent book as shown to users
+def due_text(book):
+    if book.due_at is None:
+        return ""
+    return f" - due {time.strftime('%Y-%m-%d', time.localtime(book.due_at))}"
+
+# Print the circulation statistics with the authors and readers that have the most books
+def show_stats(library, top=5):
+    stats = library.stats(details=True)
+    print("\n=== Library Statistics ===")
+    print(f"Books: {stats['total']} ({stats['available']} available, {stats['borrowed']} borrowed)")
+    print(f"Users: {stats['users']} ({stats['borrowers']} with borrowed books)")
+    authors = sorted(stats["authors"].items(), key=lambda item: -item[1]["books"])[:top]
+    if authors:
+        print("\nAuthors with the most books:")
+        for author, counts in authors:
+            print(f"  {author}: {counts['books']} books, {counts['borrowed']} borrowed")
+    readers = sorted(stats["loans_per_user"].items(), key=lambda item: -item[1])[:top]
+    if readers:
+        print("\nReaders with the most borrowed books:")
+        for username, count in readers:
+            print(f"  {username}: {count}")
+    overdue = library.overdue_books(limit=top)
+    if overdue:
+        print("\nLongest overdue books:")
+        for book in overdue:
+            print(f"  {book.title} by {book.author}, borrowed by {book.borrowed_by}{due_text(book)}")
+
 # Librarian view
 def librarian_menu(library):
     while True:
@@ -40,11 +143,12 @@ def librarian_menu(library):
         print("1. Add Book")
         print("2. Remove Book")
         print("3. Display All Books")
-        print("4. Back to Main Menu")
-        print("5. Exit")
+        print("4. View Statistics")
+        print("5. Back to Main Menu")
+        print("6. Exit")
 
         try:
-            choice = int(input("Choose option (1-5): "))
+            choice = int(input("Choose option (1-6): "))
 
             match choice:
                 case 1:  # Adding a new book
@@ -58,17 +162,20 @@ def librarian_menu(library):
 
                 case 3:  # Displaying all books
                     print("These are the books in the Library: ")
-                    print(library.display_books())
+                    browse_books(library)
+
+                case 4:  # Circulation statistics
+                    show_stats(library)
 
-                case 4:  # Back to Main Menu
+                case 5:  # Back to Main Menu
                     return
 
-                case 5:  # Exiting
+                case 6:  # Exiting
                     print("Goodbye! :)")
                     sys.exit(0)
 
                 case _:  # Invalid choice
-                    print("Invalid choice. Please enter a number between 1 and 5.")
+                    print("Invalid choice. Please enter a number between 1 and 6.")
 
         except ValueError:
             print("Invalid input. Please enter a number.")
@@ -100,6 +207,8 @@ def reader_menu(library):
                             if borrow_choice in ['y', 'yes']:
                                 message = library.borrow_book(book.title)
                                 print(message)
+                        else:
+                            offer_hold(library, book.title)
                     else:
                         print("Book not found in the library.")
 
@@ -122,6 +231,7 @@ def reader_menu(library):
                                         print(library.borrow_book(selected_book.title))
                                     else:
                                         print(f"The book {selected_book.title} is currently borrowed.")
+                                        offer_hold(library, selected_book.title)
                                 else:
                                     print("Invalid book number.")
                             except ValueError:
@@ -131,32 +241,19 @@ def reader_menu(library):
 
                 case 3:  # Displaying all books in the library
                     print("\n=== All Books in Library ===")
-                    print(library.display_books())
-                    if library.books:
-                        borrow_choice = input("\nEnter book number to borrow (or press Enter to skip): ")
-                        if borrow_choice.strip():
-                            try:
-                                book_idx = int(borrow_choice) - 1
-                                if 0 <= book_idx < len(library.books):
-                                    book = library.books[book_idx]
-                                    if book.status:
-                                        print(library.borrow_book(book.title))
-                                    else:
-                                        print(f"{book.title} is currently borrowed.")
-                                else:
-                                    print("Invalid book number.")
-                            except ValueError:
-                                print("Invalid input. Please enter a valid number.")
+                    browse_books(library, allow_borrow=True)
 
                 case 4:  # Returning a book
                     title = input("Enter the book title you'd like to return: ")
                     print(library.return_book(title))
 
                 case 5:  # View borrowed books
-                    if library.current_user.borrowed_books:
+                    loans = library.loans_for_user(library.current_user.username)
+                    if loans:
                         print("\n=== Your Borrowed Books ===")
-                        for idx, book_title in enumerate(library.current_user.borrowed_books, 1):
-                            print(f"{idx}. {book_title}")
+                        for idx, book in enumerate(loans, 1):
+                            overdue = " (overdue)" if book.is_overdue(library.clock()) else ""
+                            print(f"{idx}. {book.title} by {book.author}{due_text(book)}{overdue}")
                     else:
                         print("You have no borrowed books.")
 
@@ -174,7 +271,7 @@ def reader_menu(library):
         except ValueError:
             print("Invalid input. Please enter a number.")
 
-# Run the library management system
+# Run the library management system, with --timing a startup timing report is printed
 def main():
     try:
         # Use relative paths for better portability
@@ -182,12 +279,22 @@ def main():
         library_file = os.path.join(base_path, "data", "library_data.json")
         users_file = os.path.join(base_path, "data", "users_data.json")
         
-        library = Library(library_file, users_file)
+        # Books and users are only loaded when a menu first needs them, so the main menu
+        # shows up at once however large the data files are
+        imported = time.perf_counter()
+        library = Library(library_file, users_file, lazy=True)
+        created = time.perf_counter()
 
         print("\n" + "="*50)
         print("    Welcome to the Library Management System!")
         print("="*50)
 
+        if "--timing" in sys.argv[1:]:
+            startup_report(library, [("import modules", imported - STARTED),
+                                     ("create library", created - imported),
+                                     ("ready", time.perf_counter() - STARTED)])
+            atexit.register(loading_report, library, "Loaded On Demand")
+
         while True:
             print("\n=== Main Menu ===")
             print("1. Librarian Login")
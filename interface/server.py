@@ -0,0 +1,363 @@
+# Asyncio HTTP/JSON service for the library
+# Usage: python -m interface.server [--host 127.0.0.1] [--port 8080] [--journal] [--group-commit SECONDS]
+#        [--metrics] [--outbox PATH [--sweep-interval SECONDS]] [--password-cost COST] [--login-workers N]
+#
+# Endpoints (JSON bodies, tokens are sent as "Authorization: Bearer TOKEN"):
+#   POST   /register        {"username", "password"}
+#   POST   /login           {"username", "password"}    -> {"token"}, admin/admin gives a librarian token
+#   POST   /logout
+#   GET    /books           ?offset=0&limit=50
+#   GET    /search/title    ?q=TITLE
+#   GET    /search/author   ?q=AUTHOR
+#   GET    /loans                                        reader token gets its own loans, librarian token every loan
+#   GET    /stats           ?details=1                   librarian token
+#   GET    /metrics         ?format=json                 Prometheus text by default, needs --metrics
+#   GET    /overdue         ?limit=50                    librarian token, overdue loans and the next ones due
+#   POST   /borrow          {"title"}                    reader token
+#   POST   /return          {"title"}                    reader token
+#   GET    /holds           ?title=TITLE                 the queue for a book
+#   POST   /holds           {"title"}                    reader token, joins the queue for a book
+#   DELETE /holds           ?title=TITLE                 reader token, leaves the queue or gives up the held copy
+#   POST   /books           {"title", "author"}          librarian token
+#   DELETE /books           ?title=TITLE                 librarian token
+
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from models.library import Library
+from storage.base import book_record
+from storage.group_commit import GroupCommitStorage
+from storage.json_storage import JsonStorage
+from utils.instrumentation import Metrics
+from utils.passwords import SCHEMES, PasswordHasher
+
+MAX_BODY = 1024 * 1024
+ADMIN_PASSWORD = "admin" # same hardcoded librarian password as the command line interface
+
+
+# Raised by handlers to answer with an HTTP error
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class LibraryServer:
+    def __init__(self, library, workers=8, login_workers=4):
+        self.library = library
+        # every library call runs here so the event loop never waits on disk or on the
+        # library's locks, searches can wait for a slow scan while holding them
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="library")
+        # password hashing runs on its own threads so a burst of logins can't hold up the
+        # other requests, hashlib releases the GIL while it hashes
+        self.login_executor = ThreadPoolExecutor(max_workers=login_workers, thread_name_prefix="login")
+        self.sessions = {} # token -> Session, or None for the librarian
+        self.routes = {
+            ("POST", "/register"): self.register,
+            ("POST", "/login"): self.login,
+            ("POST", "/logout"): self.logout,
+            ("GET", "/books"): self.list_books,
+            ("GET", "/search/title"): self.search_title,
+            ("GET", "/search/author"): self.search_author,
+            ("GET", "/loans"): self.loans,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/overdue"): self.overdue,
+            ("POST", "/borrow"): self.borrow,
+            ("POST", "/return"): self.return_book,
+            ("GET", "/holds"): self.holds,
+            ("POST", "/holds"): self.place_hold,
+            ("DELETE", "/holds"): self.cancel_hold,
+            ("POST", "/books"): self.add_book,
+            ("DELETE", "/books"): self.remove_book,
+        }
+
+    # Method to run a blocking library call on the worker threads
+    async def run(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: function(*args, **kwargs))
+
+    # Method to run a library call that hashes a password on the login threads
+    async def run_login(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.login_executor, lambda: function(*args))
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.login_executor.shutdown(wait=True)
+
+    # Method to serve requests on one connection until the client closes it
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e: # malformed request, answer once and hang up
+            self.write_response(writer, e.status, {"error": e.message}, False)
+        finally:
+            writer.close()
+
+    # Method to read one request, returns None when the connection was closed
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length must be a number")
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length can't be negative")
+        if length > MAX_BODY:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    # Payloads are sent as JSON, except strings which are sent as plain text
+    def write_response(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    # Method to find the handler for a request and turn its result into a response
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed"}
+            return HTTPStatus.NOT_FOUND, {"error": "Not found"}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+            return await handler(data=data, query=query, token=token)
+        except json.JSONDecodeError:
+            return HTTPStatus.BAD_REQUEST, {"error": "Request body is not valid JSON"}
+        except HttpError as e:
+            return e.status, {"error": e.message}
+
+    # Methods checking the token sent with a request
+    def reader_session(self, token):
+        session = self.sessions.get(token)
+        if session is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "Please login first.")
+        return session
+
+    def require_librarian(self, token):
+        if token not in self.sessions or self.sessions[token] is not None:
+            raise HttpError(HTTPStatus.FORBIDDEN, "Librarian login required.")
+
+    @staticmethod
+    def field(data, name):
+        value = data.get(name)
+        if not isinstance(value, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Missing field: {name}")
+        return value
+
+    # Request handlers
+    async def register(self, data, query, token):
+        success, message = await self.run_login(self.library.register_user, self.field(data, "username"),
+                                                self.field(data, "password"))
+        return (HTTPStatus.CREATED if success else HTTPStatus.BAD_REQUEST), {"message": message}
+
+    async def login(self, data, query, token):
+        username, password = self.field(data, "username"), self.field(data, "password")
+        if username.strip().lower() == "admin":
+            if password != ADMIN_PASSWORD:
+                raise HttpError(HTTPStatus.UNAUTHORIZED, "Invalid admin password.")
+            session = None
+        else:
+            success, session = await self.run_login(self.library.create_session, username, password)
+            if not success:
+                raise HttpError(HTTPStatus.UNAUTHORIZED, session)
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = session
+        return HTTPStatus.OK, {"token": token, "role": "librarian" if session is None else session.user.role}
+
+    async def logout(self, data, query, token):
+        if self.sessions.pop(token, False) is False:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "No user logged in")
+        return HTTPStatus.OK, {"message": "Goodbye!"}
+
+    async def list_books(self, data, query, token):
+        try:
+            offset = int(query.get("offset", 0))
+            limit = int(query.get("limit", 50))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "offset and limit must be numbers")
+        if offset < 0 or limit < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "offset and limit can't be negative")
+        books = await self.run(self.library.books_page, offset, limit)
+        total = await self.run(self.library.count_books)
+        return HTTPStatus.OK, {"offset": offset, "total": total, "books": [book_record(book) for book in books]}
+
+    async def search_title(self, data, query, token):
+        book = await self.run(self.library.search_by_title, query.get("q", ""))
+        if book is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Book not found in the library.")
+        return HTTPStatus.OK, {"book": book_record(book)}
+
+    async def search_author(self, data, query, token):
+        books = await self.run(self.library.search_by_author, query.get("q", ""))
+        if isinstance(books, str):
+            raise HttpError(HTTPStatus.NOT_FOUND, books)
+        return HTTPStatus.OK, {"books": [book_record(book) for book in books]}
+
+    async def loans(self, data, query, token):
+        if token in self.sessions and self.sessions[token] is None:
+            loans = await self.run(self.library.all_loans)
+        else:
+            username = self.reader_session(token).username
+            loans = {username: await self.run(self.library.loans_for_user, username)}
+        return HTTPStatus.OK, {"loans": {username: [book_record(book) for book in books]
+                                         for username, books in loans.items()}}
+
+    async def stats(self, data, query, token):
+        self.require_librarian(token)
+        return HTTPStatus.OK, await self.run(self.library.stats, details=query.get("details") == "1")
+
+    async def metrics(self, data, query, token):
+        if self.library.metrics is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Metrics are not enabled, start the server with --metrics.")
+        if query.get("format") == "json":
+            return HTTPStatus.OK, self.library.metrics.snapshot()
+        return HTTPStatus.OK, self.library.metrics.to_prometheus()
+
+    async def overdue(self, data, query, token):
+        self.require_librarian(token)
+        try:
+            limit = int(query.get("limit", 50))
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "limit must be a number")
+        if limit < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "limit can't be negative")
+        overdue = await self.run(self.library.overdue_books, limit=limit)
+        next_due = await self.run(self.library.next_due, limit)
+        return HTTPStatus.OK, {"overdue": [book_record(book) for book in overdue],
+                               "next_due": [book_record(book) for book in next_due]}
+
+    async def borrow(self, data, query, token):
+        session = self.reader_session(token)
+        message = await self.run(session.borrow_book, self.field(data, "title"))
+        return HTTPStatus.OK, {"message": message}
+
+    async def return_book(self, data, query, token):
+        session = self.reader_session(token)
+        message = await self.run(session.return_book, self.field(data, "title"))
+        return HTTPStatus.OK, {"message": message}
+
+    async def holds(self, data, query, token):
+        title = self.field(query, "title")
+        return HTTPStatus.OK, {"title": title, "queue": await self.run(self.library.hold_queue, title)}
+
+    async def place_hold(self, data, query, token):
+        session = self.reader_session(token)
+        message = await self.run(session.place_hold, self.field(data, "title"))
+        return HTTPStatus.OK, {"message": message}
+
+    async def cancel_hold(self, data, query, token):
+        session = self.reader_session(token)
+        message = await self.run(session.cancel_hold, self.field(query, "title"))
+        return HTTPStatus.OK, {"message": message}
+
+    async def add_book(self, data, query, token):
+        self.require_librarian(token)
+        message = await self.run(self.library.add_book, self.field(data, "title"), self.field(data, "author"))
+        return HTTPStatus.OK, {"message": message}
+
+    async def remove_book(self, data, query, token):
+        self.require_librarian(token)
+        message = await self.run(self.library.remove_book, self.field(query, "title"))
+        return HTTPStatus.OK, {"message": message}
+
+
+async def serve(library, host, port, login_workers=4):
+    server = LibraryServer(library, login_workers=login_workers)
+    listener = await server.start(host, port)
+    print(f"Library service listening on http://{host}:{port}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Run the library HTTP/JSON service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--books", default=os.path.join(base_path, "data", "library_data.json"))
+    parser.add_argument("--users", default=os.path.join(base_path, "data", "users_data.json"))
+    parser.add_argument("--journal", action="store_true", help="use the append-only journal storage mode")
+    parser.add_argument("--group-commit", type=float, metavar="SECONDS",
+                        help="write changes in groups at most this many seconds apart")
+    parser.add_argument("--batch-size", type=int, default=500, help="largest group of changes for --group-commit")
+    parser.add_argument("--metrics", action="store_true", help="time library calls and serve them at /metrics")
+    parser.add_argument("--outbox", metavar="PATH", help="write overdue and hold notices to this file")
+    parser.add_argument("--sweep-interval", type=float, default=3600.0, metavar="SECONDS",
+                        help="how often overdue loans and ready holds are looked for with --outbox")
+    parser.add_argument("--password-scheme", choices=SCHEMES, default="scrypt")
+    parser.add_argument("--password-cost", type=int,
+                        help="work factor of new password hashes, log2 of n for scrypt or PBKDF2 iterations")
+    parser.add_argument("--login-workers", type=int, default=4, help="threads that hash passwords")
+    args = parser.parse_args(argv)
+
+    storage = JsonStorage(args.books, args.users, journal=args.journal)
+    if args.group_commit is not None:
+        storage = GroupCommitStorage(storage, interval=args.group_commit, batch_size=args.batch_size)
+    hasher = PasswordHasher(args.password_scheme, args.password_cost)
+    library = Library(args.books, args.users, storage=storage, metrics=Metrics() if args.metrics else None,
+                      password_hasher=hasher)
+    if args.outbox:
+        library.start_overdue_sweep(args.outbox, args.sweep_interval)
+    try:
+        asyncio.run(serve(library, args.host, args.port, args.login_workers))
+    except KeyboardInterrupt:
+        library.compact()
+    finally:
+        library.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # Class representing an author in the library system
 
 class Author:
+    __slots__ = ("full_name", "books")
+
     def __init__(self, full_name):
         self.full_name = full_name
         self.books = []
@@ -1,18 +1,42 @@
 # Class representing a book in the library system
+import time
+
+LOAN_DAYS = 14 # books are due back this many days after they are borrowed
+HOLD_DAYS = 3 # a returned book is kept this many days for the next reader in its hold queue
+DAY = 86400
+
 
 class Book:
-    def __init__(self, title, author, status, borrowed_by=None):
+    __slots__ = ("title", "author", "status", "borrowed_by", "book_id", "borrowed_at", "due_at", "holds", "held_for",
+                 "hold_until")
+
+    # Every copy of a title is a Book of its own. book_id is given by the catalog the
+    # first time the book is added and stays the same for as long as the book is kept.
+    # borrowed_at and due_at are Unix times, None while the book is available.
+    # holds is the queue of usernames waiting for the book, shared by all of its copies in
+    # a catalog, None until someone waits for it. A copy set aside for the first of them is
+    # held_for them until hold_until
+    def __init__(self, title, author, status, borrowed_by=None, book_id=None, borrowed_at=None, due_at=None,
+                 holds=None, held_for=None, hold_until=None):
         self.title = title.strip()
         self.author = author.strip()
         self.status = status # True = available & False = Borrowed
         self.borrowed_by = borrowed_by
+        self.book_id = book_id
+        self.borrowed_at = borrowed_at
+        self.due_at = due_at
+        self.holds = holds
+        self.held_for = held_for
+        self.hold_until = hold_until
 
     # Method to borrow books
-    def borrow(self, username=None):
+    def borrow(self, username=None, now=None, loan_days=LOAN_DAYS):
         # Check if the book is available
         if self.status:
             self.status = False # set it to borrowed
             self.borrowed_by = username
+            self.borrowed_at = time.time() if now is None else now
+            self.due_at = self.borrowed_at + loan_days * DAY
             return f"The book {self.title} has been successfully borrowed."
         else:
             return f"The book {self.title} is currently borrowed."
@@ -22,10 +46,21 @@ class Book:
         if not self.status:  # Checking if book is borrowed
             self.status = True
             self.borrowed_by = None
+            self.borrowed_at = None
+            self.due_at = None
             return f"You have successfully returned the book {self.title}."
         else:
             return f"The book {self.title} was not borrowed."
 
+    # Method to check if the user can borrow the book now: it is available and not set
+    # aside for another reader
+    def can_lend_to(self, username):
+        return bool(self.status) and self.held_for in (None, username)
+
+    # Method to check if the book should have been returned by now
+    def is_overdue(self, now=None):
+        return not self.status and self.due_at is not None and self.due_at < (time.time() if now is None else now)
+
     def __str__(self):
         return f"{self.title} by {self.author}"
 
@@ -0,0 +1,550 @@
+# Class holding the books of a library together with lookup indexes
+import threading
+from array import array
+from collections import deque
+from bisect import bisect_right
+from itertools import islice
+from models.book import Book
+from utils.due_queue import DueQueue
+from utils.search_index import NgramIndex
+from utils.validation import fuzzy_search
+
+def normalize(text):
+    return text.strip().casefold()
+
+
+# The key indexes map a key to the seqs of its books. Most keys have a single book, so
+# its seq is kept as a bare int and only keys with several books get a {seq: None} dict
+def _index_add(index, key, seq):
+    bucket = index.get(key)
+    if bucket is None:
+        index[key] = seq
+    elif isinstance(bucket, int):
+        index[key] = {bucket: None, seq: None}
+    else:
+        bucket[seq] = None
+
+
+def _index_seqs(index, key):
+    bucket = index.get(key, ())
+    return (bucket,) if isinstance(bucket, int) else bucket
+
+
+class Catalog:
+    def __init__(self, books=None):
+        self._books = {}      # seq -> Book, kept in insertion (display) order
+        self._order = array("q")  # seqs in order for paging, removed ones stay until compacted
+        self._dropped = 0
+        self._by_id = {}      # book id -> seq
+        self._by_key = {}     # (title, author) -> seq, or {seq: None} with one seq per copy
+        self._by_title = {}   # title -> seq or {seq: None}
+        self._by_author = {}  # author -> seq or {seq: None}
+        self._by_borrower = {}  # username -> seq or {seq: None}, in the order the books were lent
+        self._borrowed = 0  # counters kept up to date on every change, for stats
+        self._borrowed_by_author = {}  # author -> number of borrowed books
+        self._due = DueQueue()  # seqs of the lent books with a due date, by due date
+        self._holds = {}  # (title, author) -> deque of the usernames waiting for a copy, once someone waited
+        self._hold_expiry = DueQueue()  # seqs of the copies set aside for a reader, by hold_until
+        self._title_grams = NgramIndex()
+        self._author_grams = NgramIndex()
+        self._next_seq = 0
+        self._next_id = 1
+        if books:
+            for book in books:
+                self.add(book)
+
+    def __len__(self):
+        return len(self._books)
+
+    def __iter__(self):
+        return iter(self._books.values())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    # Method to get limit books in display order, skipping the first offset books
+    def page(self, offset, limit=None):
+        return list(islice(self, offset, None if limit is None else offset + limit))
+
+    # Method to get up to limit books that come after the book at cursor (-1 for the first page),
+    # together with the cursor of the next page. Books are only ever added at the end, so a
+    # reader paging this way never skips or repeats a book while others are added or removed
+    def page_after(self, cursor, limit):
+        books = []
+        position = bisect_right(self._order, cursor)
+        while position < len(self._order) and len(books) < limit:
+            seq = self._order[position]
+            if seq in self._books:
+                books.append(self._books[seq])
+                cursor = seq
+            position += 1
+        return books, cursor
+
+    # Methods that store the books themselves, overridden by ColumnarCatalog
+    def _store(self, seq, book):
+        self._books[seq] = book
+        self._order.append(seq)
+
+    def _get(self, seq):
+        return self._books[seq]
+
+    def _drop(self, seq):
+        del self._books[seq]
+        self._dropped += 1
+        if self._dropped > len(self._order) // 2:
+            self._order = array("q", (seq for seq in self._order if seq in self._books))
+            self._dropped = 0
+
+    # Method to add a book, returns False if the same title and author is already in the
+    # catalog, unless the book is another copy of it. Books without an id are given the
+    # next free one, a book whose id is already taken is not added
+    def add(self, book, copy=False):
+        key = (normalize(book.title), normalize(book.author))
+        if key in self._by_key and not copy:
+            return False
+        if book.book_id is None:
+            book.book_id = self._next_id
+        elif book.book_id in self._by_id:
+            return False
+        self._next_id = max(self._next_id, book.book_id + 1)
+        seq = self._next_seq
+        self._next_seq += 1
+        queue = self._holds.get(key)
+        if queue is None and book.holds:
+            queue = self._holds[key] = deque(book.holds)
+        book.holds = queue  # every copy shares the queue
+        self._store(seq, book)
+        self._by_id[book.book_id] = seq
+        _index_add(self._by_key, key, seq)
+        _index_add(self._by_title, key[0], seq)
+        _index_add(self._by_author, key[1], seq)
+        if book.borrowed_by is not None:
+            _index_add(self._by_borrower, book.borrowed_by, seq)
+        if not book.status:
+            self._count_loan(key[1], 1)
+            if book.due_at is not None:
+                self._due.push(seq, book.due_at)
+        if book.held_for is not None and book.hold_until is not None:
+            self._hold_expiry.push(seq, book.hold_until)
+        self._title_grams.add(seq, book.title)
+        self._author_grams.add(seq, book.author)
+        return True
+
+    # Method to remove a book from the catalog and all of its indexes
+    def remove(self, book):
+        # read before the row is dropped
+        title, author, status, borrower, book_id = book.title, book.author, book.status, book.borrowed_by, book.book_id
+        key = (normalize(title), normalize(author))
+        seq = self._by_id.get(book_id)
+        if seq is None or self._get(seq) != book:
+            return False
+        del self._by_id[book_id]
+        self._drop(seq)
+        self._discard(self._by_key, key, seq)
+        self._discard(self._by_title, key[0], seq)
+        self._discard(self._by_author, key[1], seq)
+        self._discard(self._by_borrower, borrower, seq)
+        if not status:
+            self._count_loan(key[1], -1)
+        self._due.discard(seq)
+        self._hold_expiry.discard(seq)
+        if key not in self._by_key:  # the last copy
+            self._holds.pop(key, None)
+        self._title_grams.remove(seq, title)
+        self._author_grams.remove(seq, author)
+        return True
+
+    def clear(self):
+        self.__init__()
+
+    # Method to release anything the catalog holds besides the books, see ShardedCatalog
+    def close(self):
+        pass
+
+    # Method to find a book by its exact title and author, the first copy if there are several
+    def find(self, title, author):
+        seqs = _index_seqs(self._by_key, (normalize(title), normalize(author)))
+        return None if not seqs else self._get(next(iter(seqs)))
+
+    # Method to get every copy of the book with this exact title and author, in catalog order
+    def copies(self, title, author):
+        return [self._get(seq) for seq in _index_seqs(self._by_key, (normalize(title), normalize(author)))]
+
+    # The id the next book added without one is given, ids are never handed out twice
+    @property
+    def next_id(self):
+        return self._next_id
+
+    # Method to make sure no book added later is given an id below next_id, used on load
+    # with the stored high-water mark so the ids of removed books aren't handed out again
+    def reserve_ids(self, next_id):
+        self._next_id = max(self._next_id, next_id)
+
+    # Method to get the book with this id, or None
+    def get(self, book_id):
+        seq = self._by_id.get(book_id)
+        return None if seq is None else self._get(seq)
+
+    # Method to get all books with this exact title, in catalog order
+    def by_title(self, title):
+        return [self._get(seq) for seq in _index_seqs(self._by_title, normalize(title))]
+
+    # Method to get all books by this exact author, in catalog order
+    def by_author(self, author):
+        return [self._get(seq) for seq in _index_seqs(self._by_author, normalize(author))]
+
+    # Method to get the books lent to this user, in the order they were lent
+    def by_borrower(self, username):
+        return [self._get(seq) for seq in _index_seqs(self._by_borrower, username)]
+
+    # Method to get every outstanding loan as a dict of username -> books
+    def loans(self):
+        return {username: self.by_borrower(username) for username in self._by_borrower}
+
+    # Methods to update the borrower index and the counters after a book of the
+    # catalog was lent, or returned by borrower
+    def lent(self, book):
+        seq = self._by_id.get(book.book_id)
+        if seq is None:  # removed meanwhile
+            return
+        if book.borrowed_by is not None:
+            _index_add(self._by_borrower, book.borrowed_by, seq)
+        if book.due_at is not None:
+            self._due.push(seq, book.due_at)
+        self._count_loan(normalize(book.author), 1)
+
+    def returned(self, book, borrower):
+        seq = self._by_id.get(book.book_id)
+        if seq is None:
+            return
+        self._discard(self._by_borrower, borrower, seq)
+        self._due.discard(seq)
+        self._count_loan(normalize(book.author), -1)
+
+    def _count_loan(self, author_key, delta):
+        self._borrowed += delta
+        count = self._borrowed_by_author.get(author_key, 0) + delta
+        if count:
+            self._borrowed_by_author[author_key] = count
+        else:
+            del self._borrowed_by_author[author_key]
+
+    # Methods reading the counters, each takes the same time however many books there are
+    def counts(self):
+        return {"total": len(self), "titles": len(self._by_key), "available": len(self) - self._borrowed,
+                "borrowed": self._borrowed, "borrowers": len(self._by_borrower)}
+
+    def author_counts(self, author):
+        key = normalize(author)
+        return {"books": len(_index_seqs(self._by_author, key)), "borrowed": self._borrowed_by_author.get(key, 0)}
+
+    def loan_count(self, username):
+        return len(_index_seqs(self._by_borrower, username))
+
+    # Method to get the counts of every author, keyed by the author's name as first added
+    def all_author_counts(self):
+        counts = {}
+        for key in self._by_author:
+            seqs = _index_seqs(self._by_author, key)
+            author = self._get(next(iter(seqs))).author
+            counts[author] = {"books": len(seqs), "borrowed": self._borrowed_by_author.get(key, 0)}
+        return counts
+
+    # Method to get the number of books lent to every user with a loan
+    def loan_counts(self):
+        return {username: len(_index_seqs(self._by_borrower, username)) for username in self._by_borrower}
+
+    # Methods to update the hold expiry queue after a copy was set aside for a reader or
+    # stopped being set aside
+    def held(self, book):
+        seq = self._by_id.get(book.book_id)
+        if seq is not None:
+            self._hold_expiry.push(seq, book.hold_until)
+
+    def released(self, book):
+        seq = self._by_id.get(book.book_id)
+        if seq is not None:
+            self._hold_expiry.discard(seq)
+
+    # Method to get the queue of usernames waiting for the book with this title and author,
+    # None if nobody waited for it yet
+    def holds(self, title, author):
+        return self._holds.get((normalize(title), normalize(author)))
+
+    # Method to get the queue for the book with this title and author, made and shared
+    # with every copy when the first reader joins it
+    def hold_queue(self, title, author):
+        key = (normalize(title), normalize(author))
+        queue = self._holds.get(key)
+        if queue is None:
+            queue = self._holds[key] = deque()
+            for seq in _index_seqs(self._by_key, key):
+                self._get(seq).holds = queue
+        return queue
+
+    # Method to get the copies whose hold ran out before now, the oldest first
+    def expired_holds(self, now):
+        return [self._get(seq) for _, seq in self._hold_expiry.due_before(now)]
+
+    # Method to get every copy set aside for a reader, by the time the hold runs out
+    def ready_holds(self):
+        return [self._get(seq) for _, seq in self._hold_expiry.first(len(self._hold_expiry))]
+
+    # Method to get the lent books due before now, the longest overdue first. Only the
+    # overdue books are looked at, in O(k log k) for k of them
+    def overdue(self, now, limit=None):
+        return [self._get(seq) for _, seq in self._due.due_before(now, limit)]
+
+    # Method to get the n lent books that are due back first
+    def next_due(self, n):
+        return [self._get(seq) for _, seq in self._due.first(n)]
+
+    # Method to get the books whose title contains every word of the query, in catalog order
+    def fuzzy_by_title(self, query, limit=None):
+        return self._fuzzy(self._title_grams, query, "title", limit)
+
+    # Method to get the books whose author contains every word of the query, in catalog order
+    def fuzzy_by_author(self, query, limit=None):
+        return self._fuzzy(self._author_grams, query, "author", limit)
+
+    # Method to start a fuzzy search that runs outside this process, see ShardedCatalog.
+    # Returns None when the search is done here, by fuzzy_by_title or fuzzy_by_author
+    def start_fuzzy(self, field, query, limit=None):
+        return None
+
+    # Method to get the k books whose title and/or author are most similar to the query,
+    # as (score, book) pairs with the best match first. field is "title", "author" or "both"
+    def ranked(self, query, k=10, field="both"):
+        scores = {}
+        if field in ("title", "both"):
+            for score, seq in self._title_grams.rank(query, k):
+                scores[seq] = score
+        if field in ("author", "both"):
+            for score, seq in self._author_grams.rank(query, k):
+                scores[seq] = max(score, scores.get(seq, 0))
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self._get(seq)) for seq, score in best]
+
+    def _fuzzy(self, index, query, field, limit):
+        seqs = index.candidates(query)
+        if seqs is None:  # query too short for the index, check every book
+            books = iter(self)
+        else:
+            books = (self._get(seq) for seq in sorted(seqs))
+        matches = []
+        for book in books:
+            if fuzzy_search(query, getattr(book, field)):
+                matches.append(book)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    @staticmethod
+    def _discard(index, key, seq):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        if isinstance(bucket, int):
+            if bucket == seq:
+                del index[key]
+            return
+        bucket.pop(seq, None)
+        if len(bucket) == 1:
+            index[key] = next(iter(bucket))
+
+
+# Bit per row stored in a bytearray. Neighbouring bits share a byte, so writes are locked
+class BitArray:
+    __slots__ = ("_bytes", "_length", "_lock")
+
+    def __init__(self):
+        self._bytes = bytearray()
+        self._length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        return bool(self._bytes[index >> 3] & (1 << (index & 7)))
+
+    def __setitem__(self, index, value):
+        with self._lock:
+            if value:
+                self._bytes[index >> 3] |= 1 << (index & 7)
+            else:
+                self._bytes[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def append(self, value):
+        if self._length & 7 == 0:
+            self._bytes.append(0)
+        self._length += 1
+        self[self._length - 1] = value
+
+
+# Catalog that keeps each field in its own column instead of one object per book.
+# Authors and borrowers are stored once and referenced by integer id, statuses are bits.
+# The indexes are the same as Catalog's, so this saves the Book objects only, about 15%
+# of the memory used for 100,000 books.
+class ColumnarCatalog(Catalog):
+    def __init__(self, books=None):
+        self._titles = []
+        self._ids = array("q")
+        self._author_ids = array("i")
+        self._authors = []        # author id -> name
+        self._author_lookup = {}  # name -> author id
+        self._status = BitArray()
+        self._live = BitArray()
+        self._borrower_ids = array("i")  # -1 when not borrowed
+        self._borrowed_at = array("d")  # 0 when not borrowed
+        self._due_at = array("d")
+        self._held_ids = array("i")  # borrower table id of the reader a copy is set aside for, -1 if none
+        self._hold_until = array("d")
+        self._borrowers = []
+        self._borrower_lookup = {}
+        self._intern_lock = threading.Lock()
+        self._size = 0
+        super().__init__(books)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for row in range(len(self._titles)):
+            if self._live[row]:
+                yield BookView(self, row)
+
+    def page_after(self, cursor, limit):
+        books = []
+        row = cursor + 1
+        while row < len(self._titles) and len(books) < limit:
+            if self._live[row]:
+                books.append(BookView(self, row))
+                cursor = row
+            row += 1
+        return books, cursor
+
+    # rows are appended in seq order so the row number is the seq
+    def _store(self, seq, book):
+        self._titles.append(book.title)
+        self._ids.append(book.book_id)
+        self._author_ids.append(self._intern(self._authors, self._author_lookup, book.author))
+        self._status.append(book.status)
+        self._live.append(True)
+        self._borrower_ids.append(self._borrower_id(book.borrowed_by))
+        self._borrowed_at.append(book.borrowed_at or 0)
+        self._due_at.append(book.due_at or 0)
+        self._held_ids.append(self._borrower_id(book.held_for))
+        self._hold_until.append(book.hold_until or 0)
+        self._size += 1
+
+    def _get(self, seq):
+        return BookView(self, seq)
+
+    def _drop(self, seq):
+        self._live[seq] = False
+        self._borrower_ids[seq] = -1
+        self._size -= 1
+
+    def _borrower_id(self, username):
+        if username is None:
+            return -1
+        with self._intern_lock: # books lent at the same time may add the same new borrower
+            return self._intern(self._borrowers, self._borrower_lookup, username)
+
+    @staticmethod
+    def _intern(table, lookup, value):
+        value_id = lookup.get(value)
+        if value_id is None:
+            value_id = len(table)
+            table.append(value)
+            lookup[value] = value_id
+        return value_id
+
+
+# Lightweight Book backed by one row of a ColumnarCatalog, has the same API as Book
+class BookView(Book):
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    @property
+    def book_id(self):
+        return self._catalog._ids[self._row]
+
+    @property
+    def title(self):
+        return self._catalog._titles[self._row]
+
+    @property
+    def author(self):
+        return self._catalog._authors[self._catalog._author_ids[self._row]]
+
+    @property
+    def status(self):
+        return self._catalog._status[self._row]
+
+    @status.setter
+    def status(self, status):
+        self._catalog._status[self._row] = status
+
+    @property
+    def borrowed_by(self):
+        borrower_id = self._catalog._borrower_ids[self._row]
+        return None if borrower_id < 0 else self._catalog._borrowers[borrower_id]
+
+    @borrowed_by.setter
+    def borrowed_by(self, username):
+        self._catalog._borrower_ids[self._row] = self._catalog._borrower_id(username)
+
+    @property
+    def borrowed_at(self):
+        return self._catalog._borrowed_at[self._row] or None
+
+    @borrowed_at.setter
+    def borrowed_at(self, timestamp):
+        self._catalog._borrowed_at[self._row] = timestamp or 0
+
+    @property
+    def due_at(self):
+        return self._catalog._due_at[self._row] or None
+
+    @due_at.setter
+    def due_at(self, timestamp):
+        self._catalog._due_at[self._row] = timestamp or 0
+
+    # the hold queue is kept by the catalog for all copies of the book
+    @property
+    def holds(self):
+        return self._catalog._holds.get((normalize(self.title), normalize(self.author)))
+
+    @holds.setter
+    def holds(self, queue):
+        pass
+
+    @property
+    def held_for(self):
+        held_id = self._catalog._held_ids[self._row]
+        return None if held_id < 0 else self._catalog._borrowers[held_id]
+
+    @held_for.setter
+    def held_for(self, username):
+        self._catalog._held_ids[self._row] = self._catalog._borrower_id(username)
+
+    @property
+    def hold_until(self):
+        return self._catalog._hold_until[self._row] or None
+
+    @hold_until.setter
+    def hold_until(self, timestamp):
+        self._catalog._hold_until[self._row] = timestamp or 0
+
+    def __eq__(self, other):
+        if isinstance(other, BookView):
+            return self._catalog is other._catalog and self._row == other._row
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._catalog), self._row))
@@ -1,56 +1,184 @@
-import json
+from models.book import DAY, HOLD_DAYS, LOAN_DAYS, Book
 import os
-from models.book import Book
+import threading
+import time
+from functools import partial
+from models.catalog import Catalog, ColumnarCatalog, normalize
+from models.session import Session
 from models.user import User
-from utils.validation import validate_book_input, validate_user_input, fuzzy_search
+from storage.base import CorruptDataError
+from storage.json_storage import JsonStorage
+from utils.instrumentation import PROFILE_ENV, Metrics
+from utils.locks import LockStripes
+from utils.passwords import PasswordHasher
+from utils.query_cache import MISSING, QueryCache
+from utils.validation import validate_book_input, validate_user_input
 
 class Library:
-    def __init__(self, file_path, users_file_path):
-        self.books = []
-        self.users = {}
+    # Books and users are kept in JSON files unless another storage backend is given.
+    # With journal=True every change is appended to a journal next to each data file
+    # and the full JSON files are only rewritten every compact_every records.
+    # With lazy=True the books are only loaded the first time the catalog is used, the users
+    # the first time one is looked up (e.g. at the first login), and
+    # columnar=True keeps them in a ColumnarCatalog, which uses about 15% less memory
+    # (69 instead of 80 MB traced for 100,000 books, most of the rest is the search indexes).
+    # Given a Metrics object the main methods are timed into it, see utils/instrumentation.py;
+    # setting the LIBRARY_PROFILE environment variable turns this on with cProfile capture.
+    # Title and author search results are cached, up to cache_size of them for cache_ttl seconds.
+    # With shards > 1 fuzzy searches that can't use the index scan that many shards of the
+    # books in parallel worker processes, see models/sharded_catalog.py.
+    # Books are lent for loan_days days and kept hold_days days for the next reader in their
+    # hold queue when they come back, clock gives the current Unix time.
+    # Passwords are stored hashed by password_hasher, a PasswordHasher with the default
+    # scheme and work factor unless one is given, see utils/passwords.py
+    def __init__(self, file_path, users_file_path, journal=False, compact_every=1000, storage=None, lazy=False,
+                 columnar=False, metrics=None, cache_size=1024, cache_ttl=60.0, shards=1, loan_days=LOAN_DAYS,
+                 hold_days=HOLD_DAYS, clock=time.time, password_hasher=None):
+        self._catalog = None
+        self.password_hasher = password_hasher or PasswordHasher()
+        self.loan_days = loan_days
+        self.hold_days = hold_days
+        self.clock = clock
+        self.sweeper = None # OverdueSweeper, once start_overdue_sweep is called
+        if shards > 1:
+            if columnar:
+                raise ValueError("A catalog can't be both columnar and sharded.")
+            from models.sharded_catalog import ShardedCatalog # starts no processes until a scan needs them
+            self.catalog_class = partial(ShardedCatalog, shards=shards)
+        else:
+            self.catalog_class = ColumnarCatalog if columnar else Catalog
+        self._users = None
+        self.load_times = {} # seconds taken to load "books" and "users", once they are loaded
         self.file_path = file_path
         self.users_file_path = users_file_path
-        self.current_user = None
-        self.load_books()
-        self.load_users()
+        self.current_user = None # user of the command line interface, other callers use sessions
+        self._catalog_lock = threading.RLock() # held while books are added, removed or looked up
+        self._users_lock = threading.RLock()
+        self._storage_lock = threading.Lock()
+        self._book_locks = LockStripes() # held while a book is lent or returned
+        self._user_locks = LockStripes()
+        self.search_cache = QueryCache(cache_size, cache_ttl)
+        if storage is None:
+            storage = JsonStorage(file_path, users_file_path, journal=journal, compact_every=compact_every)
+        self.storage = storage
+        self.storage.attach(self._snapshot_books, self._snapshot_users, lambda: self.catalog.next_id)
+        if metrics is None and os.environ.get(PROFILE_ENV):
+            metrics = Metrics()
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+        if not lazy:
+            self.load_books()
+            self.load_users()
+
+    # The catalog keeps the title and author indexes, it is loaded on first use
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            with self._catalog_lock:
+                if self._catalog is None:
+                    self.load_books()
+        return self._catalog
+
+    @catalog.setter
+    def catalog(self, catalog):
+        with self._catalog_lock:
+            if self._catalog is not None and self._catalog is not catalog:
+                self._catalog.close()
+            self._catalog = catalog
+            self.search_cache.invalidate()
+
+    # Users are loaded on first use like the catalog
+    @property
+    def users(self):
+        if self._users is None:
+            with self._users_lock:
+                if self._users is None:
+                    self.load_users()
+        return self._users
+
+    @users.setter
+    def users(self, users):
+        self._users = users
+
+    # Copies of the books and users taken under their locks, safe to iterate while other threads change them
+    def _snapshot_books(self):
+        with self._catalog_lock:
+            return list(self.catalog)
 
-    # Method to load books from JSON file
+    def _snapshot_users(self):
+        with self._users_lock:
+            return dict(self.users)
+
+    # Books in display order
+    @property
+    def books(self):
+        return self._snapshot_books()
+
+    @books.setter
+    def books(self, books):
+        self.catalog = self.catalog_class(books)
+
+    # Method to load books from storage, building each book as its record is read.
+    # If the stored books are corrupt the storage's last good copy is loaded instead
     def load_books(self):
+        start = time.perf_counter()
         try:
-            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0: # Check if the file exists and if it is not empty
-                with open(self.file_path, "r") as file:
-                    books_data = json.load(file)
-                    for book_data in books_data:
-                        title = book_data.get("title", "")
-                        author = book_data.get("author", "")
-                        status = book_data.get("status")
-                        borrowed_by = book_data.get("borrowed_by")
-                        if title.strip() and author.strip():  # Only load valid books
-                            self.books.append(Book(title, author, status, borrowed_by))
-            else:
-                with open(self.file_path, "w") as file: # Create empty JSON file with an empty array (fix error with loading empty JSON file)
-                    file.write("[]")
-        except (json.JSONDecodeError, FileNotFoundError):
-            os.makedirs(os.path.dirname(self.file_path), exist_ok=True) # If file is corrupted or doesn't exist a new one is created
-            with open(self.file_path, "w") as file:
-                file.write("[]")
-
-    # Method to add (save) books to the JSON file
+            catalog = self._read_books()
+        except CorruptDataError as e:
+            print(f"Error loading books - {e}")
+            catalog = self.catalog_class() # start with an empty library rather than a partial one
+            if self.storage.recover_books():
+                print("Loading the last good copy of the books instead.")
+                try:
+                    catalog = self._read_books()
+                except CorruptDataError:
+                    self.storage.recover_books()
+        self.catalog = catalog
+        self.load_times["books"] = time.perf_counter() - start
+
+    # Books come back with the ids they were saved with, the catalog numbers any that have none
+    def _read_books(self):
+        catalog = self.catalog_class()
+        for book_data in self.storage.load_books():
+            title = book_data.get("title", "")
+            author = book_data.get("author", "")
+            status = book_data.get("status")
+            borrowed_by = book_data.get("borrowed_by")
+            if title.strip() and author.strip():  # Only load valid books
+                catalog.add(Book(title, author, status, borrowed_by, book_data.get("id"), book_data.get("borrowed_at"),
+                                 book_data.get("due_at"), book_data.get("holds"), book_data.get("held_for"),
+                                 book_data.get("hold_until")), copy=True)
+        catalog.reserve_ids(self.storage.next_book_id() or 1)
+        return catalog
+
+    # Method to add (save) all books to storage
     def add_book_to_file(self):
-        try:
-            books_data = []
-            for book in self.books:
-                books_data.append({
-                    "title": book.title,
-                    "author": book.author,
-                    "status": book.status,
-                    "borrowed_by": book.borrowed_by
-                })
-            json_str = json.dumps(books_data, indent=4) # Convert to JSON string then you write to file
-            with open(self.file_path, "w") as file:
-                file.write(json_str)
-        except Exception as e:
-            print(f"Error saving books to file - {e}")
+        with self._storage_lock:
+            self.storage.save_books(self._snapshot_books())
+
+    # Method to write the books to a binary catalog file that read-only worker processes
+    # can map into memory, see storage/mmap_catalog.py
+    def export_catalog(self, path):
+        from storage.mmap_catalog import write_catalog # only needed here, kept out of startup
+        return write_catalog(path, self._snapshot_books())
+
+    # Method to fold any journaled changes back into the stored snapshots
+    def compact(self):
+        with self._storage_lock:
+            self.storage.compact()
+
+    # Method to wait until every change is written, for storage that writes in the background
+    def flush(self):
+        self.storage.flush()
+
+    # Method to write anything still pending and release the storage and the catalog
+    def close(self):
+        if self.sweeper is not None:
+            self.sweeper.stop()
+        self.storage.close()
+        if self._catalog is not None:
+            self._catalog.close()
 
     # Method to add books in library
     def add_book(self, title, author):
@@ -62,143 +190,523 @@ class Library:
         title = title.strip()
         author = author.strip()
         
-        for book in self.books:
-            if book.title.lower() == title.lower() and book.author.lower() == author.lower(): # check if the book already exists
-                return f"{title} by {author} is already in this library."
         try:
             new_book = Book(title, author, status=True)
-            self.books.append(new_book)
-            self.add_book_to_file() # add new book to the text file
+            with self._catalog_lock:
+                if not self.catalog.add(new_book): # check if the book already exists
+                    return f"{title} by {author} is already in this library."
+                self.search_cache.invalidate()
+            with self._storage_lock:
+                self.storage.put_book(new_book) # add new book to the text file
             return f"{title} by {author} has been successfully added to the Library."
         except ValueError as e:
             return f"Error adding book to the library: {e}"
 
-    # method to remove books from library
+    # Method to add many books at once, records are (title, author) pairs or dicts with
+    # "title" and "author". Storage is only written once at the end, even if reading the
+    # records fails part way. Returns one result dict per record with the record number,
+    # title, author, status and message, records that aren't a title and an author are "invalid"
+    def add_books(self, records):
+        report = []
+        added = []
+        try:
+            for number, record in enumerate(records, 1):
+                result = self._add_record(number, record)
+                report.append(result)
+                if result["status"] == "added":
+                    added.append(result.pop("book"))
+        finally:
+            if added:
+                with self._storage_lock:
+                    self.storage.put_books(added)
+        return report
+
+    def _add_record(self, number, record):
+        if isinstance(record, dict):
+            title, author = record.get("title"), record.get("author")
+        else:
+            try:
+                title, author = record
+            except (TypeError, ValueError):
+                return {"record": number, "title": None, "author": None, "status": "invalid",
+                        "message": "Error: A record must have a title and an author"}
+        result = {"record": number, "title": title, "author": author}
+        if not all(field is None or isinstance(field, str) for field in (title, author)):
+            result.update(status="invalid", message="Error: Book title and author must be text")
+            return result
+
+        is_valid, message = validate_book_input(title, author)
+        if not is_valid:
+            result.update(status="invalid", message=f"Error: {message}")
+            return result
+        title = title.strip()
+        author = author.strip()
+        new_book = Book(title, author, status=True)
+        with self._catalog_lock:
+            is_new = self.catalog.add(new_book) # the catalog rejects books it already has
+            if is_new:
+                self.search_cache.invalidate()
+        if not is_new:
+            result.update(status="duplicate", message=f"{title} by {author} is already in this library.")
+            return result
+        result.update(status="added", message=f"{title} by {author} has been successfully added to the Library.",
+                      book=new_book)
+        return result
+
+    # Method to add more copies of a book, the book is added first if the library doesn't have it
+    def add_copies(self, title, author, count=1):
+        is_valid, message = validate_book_input(title, author)
+        if not is_valid:
+            return f"Error: {message}"
+        if count < 1:
+            return "Error: The number of copies must be at least 1."
+
+        title = title.strip()
+        author = author.strip()
+        new_books = [Book(title, author, status=True) for _ in range(count)]
+        with self._catalog_lock:
+            for new_book in new_books:
+                self.catalog.add(new_book, copy=True)
+            # the catalog's own entries, a columnar catalog keeps copies of the books it is given
+            new_books = [self.catalog.get(new_book.book_id) for new_book in new_books]
+            total = len(self.catalog.copies(title, author))
+            self.search_cache.invalidate()
+        with self._book_lock(new_books[0]):
+            handed_off = [new_book for new_book in new_books if new_book.holds and self._hand_off(new_book)]
+        with self._storage_lock:
+            self.storage.put_books(new_books)
+        if handed_off:
+            self._persist_holds(new_books[0])
+        return f"{count} {'copy' if count == 1 else 'copies'} of {title} by {author} added, the Library has {total}."
+
+    # Method to get the number of copies of a book and how many of them are available
+    def inventory(self, title, author):
+        with self._catalog_lock:
+            copies = self.catalog.copies(title, author)
+            return {"copies": len(copies), "available": sum(1 for book in copies if book.status)}
+
+    # Method to get a book by its id, or None
+    def get_book(self, book_id):
+        with self._catalog_lock:
+            return self.catalog.get(book_id)
+
+    # method to remove books from library. When there are several copies of the title
+    # one is removed, one that is available and not held for a reader if there is any
     def remove_book(self,title):
-        for book in self.books:
-            if book.title.lower() == title.lower(): # change to lower case in to match better
-                self.books.remove(book)
-                self.add_book_to_file() # remove book from text file
-                return f"{title} has been successfully removed from the Library."
+        with self._catalog_lock:
+            matches = self.catalog.by_title(title) # title index is case insensitive
+            if matches:
+                book = next((match for match in matches if match.can_lend_to(None)), matches[0])
+                self.catalog.remove(book)
+                self.search_cache.invalidate()
+        if matches:
+            with self._storage_lock:
+                self.storage.delete_book(book) # remove book from text file
+            return f"{title} has been successfully removed from the Library."
 
         return "Book not found in the Library."
 
-    # method to search by title with fuzzy search
+    # Method to remove one copy by its id
+    def remove_copy(self, book_id):
+        with self._catalog_lock:
+            book = self.catalog.get(book_id)
+            if book is not None:
+                self.catalog.remove(book)
+                self.search_cache.invalidate()
+        if book is None:
+            return "Book not found in the Library."
+        with self._storage_lock:
+            self.storage.delete_book(book)
+        return f"Copy {book_id} of {book.title} has been successfully removed from the Library."
+
+    # method to search by title with fuzzy search.
+    # Results are cached until a book is added or removed. Borrowing and returning don't
+    # change which books match and the cached books are the live ones, so the cache is kept
     def search_by_title(self, title):
         title = title.strip()
-        # Exact match first
-        for book in self.books:
-            if book.title.lower() == title.lower():
+        key = ("title", title.lower())
+        with self._catalog_lock:
+            book = self.search_cache.get(key)
+            if book is not MISSING:
                 return book
+            generation = self.search_cache.generation
+            # Exact match first
+            matches = self.catalog.by_title(title)
         # Fuzzy search if no exact match
-        for book in self.books:
-            if fuzzy_search(title, book.title):
-                return book
-        return None
+        if not matches:
+            matches = self._fuzzy("title", title, limit=1)
+        book = matches[0] if matches else None
+        self.search_cache.put(key, book, generation) # not kept if a book was added or removed meanwhile
+        return book
 
     # method to search by author with fuzzy search
     def search_by_author(self, author):
         author = author.strip()
-        book_list = []
-        # Exact match first
-        for book in self.books:
-            if book.author.lower() == author.lower():
-                book_list.append(book)
-        
-        # Fuzzy search if no exact matches
-        if not book_list:
-            for book in self.books:
-                if fuzzy_search(author, book.author):
-                    book_list.append(book)
+        key = ("author", author.lower())
+        with self._catalog_lock:
+            book_list = self.search_cache.get(key)
+            cached = book_list is not MISSING
+            if not cached:
+                generation = self.search_cache.generation
+                # Exact match first
+                book_list = self.catalog.by_author(author)
+        if not cached:
+            # Fuzzy search if no exact matches
+            if not book_list:
+                book_list = self._fuzzy("author", author)
+            self.search_cache.put(key, book_list, generation)
 
         if not book_list:
             return "There are no books by this author in this library."
 
-        return book_list
+        return list(book_list) # a copy, callers may change it
+
+    # Method to search titles and/or authors allowing typos, returns up to k (book, score)
+    # pairs with the best match first, scores go from 0 to 1
+    def search_ranked(self, query, k=10, field="both"):
+        if field not in ("title", "author", "both"):
+            raise ValueError(f"Unknown search field: {field}")
+        with self._catalog_lock:
+            results = self.catalog.ranked(query.strip(), k, field)
+        return [(book, round(score, 3)) for score, book in results]
+
+    # Method to run a fuzzy search of the catalog. A ShardedCatalog scans in its worker
+    # processes, the catalog lock is only held to start the scan and to look up the matches
+    def _fuzzy(self, field, query, limit=None):
+        with self._catalog_lock:
+            scan = self.catalog.start_fuzzy(field, query, limit)
+            if scan is None:
+                search = self.catalog.fuzzy_by_title if field == "title" else self.catalog.fuzzy_by_author
+                return search(query, limit)
+        seqs = scan()
+        with self._catalog_lock:
+            return self.catalog.scanned_books(seqs, limit)
+
+    # Lock guarding a book while it is lent or returned, keyed by its title and author so
+    # every copy of the book shares it
+    def _book_lock(self, book):
+        return self._book_locks.for_key(normalize(book.title) + "\0" + normalize(book.author))
 
+    # Method to store a lent or returned book together with its user, in one write so
+    # a crash can't keep the loan on one side only
+    def _persist_loan(self, book, user):
+        with self._storage_lock:
+            self.storage.write_batch([book], [], [user])
 
-    # method to borrow book
-    def borrow_book(self, title):
-        if not self.current_user:
+    # method to borrow book, as the given user or the logged in user. A copy held for the user
+    # is lent first, otherwise the first available copy that isn't held for another reader.
+    # It is picked and lent under the book's lock so two sessions can't borrow the same copy
+    def borrow_book(self, title, user=None):
+        user = user or self.current_user
+        if not user:
             return "Please login to borrow books."
         
         book = self.search_by_title(title)
         if book is None:
             return "Book not found in the library."
-        elif book.status:
-            message = book.borrow(self.current_user.username)
-            self.current_user.add_borrowed_book(title)
-            self.add_book_to_file()
-            self.save_users()
-            return message
-        elif not book.status:
-            return f"{title} is currently borrowed by {book.borrowed_by}"
-
-
-    # method to return a book
-    def return_book(self, title):
-        if not self.current_user:
+        self.expire_holds()
+        with self._book_lock(book):
+            with self._catalog_lock:
+                copies = self.catalog.copies(book.title, book.author)
+            if not copies: # removed since it was found
+                return "Book not found in the library."
+            lendable = [copy for copy in copies if copy.can_lend_to(user.username)]
+            copy = next((copy for copy in lendable if copy.held_for == user.username), lendable[0] if lendable else None)
+            if copy is None:
+                if any(copy.status for copy in copies):
+                    return f"{title} is held for another reader, you can place a hold to join the queue."
+                if len(copies) > 1:
+                    return f"All {len(copies)} copies of {title} are currently borrowed."
+                return f"{title} is currently borrowed by {book.borrowed_by}"
+            with self._catalog_lock:
+                if self.catalog.get(copy.book_id) is None: # the copy was removed meanwhile
+                    return "Book not found in the library."
+                message = copy.borrow(user.username, now=self.clock(), loan_days=self.loan_days)
+                if copy.held_for is not None: # collected by the reader it was held for
+                    copy.held_for = copy.hold_until = None
+                    self.catalog.released(copy)
+                self.catalog.lent(copy)
+            with self._user_locks.for_key(user.username):
+                user.add_borrowed_book(copy.title, copy.book_id)
+        self._persist_loan(copy, user)
+        return message
+
+
+    # method to return a book, as the given user or the logged in user
+    def return_book(self, title, user=None):
+        user = user or self.current_user
+        if not user:
             return "Please login to return books."
             
         book = self.search_by_title(title)
         if book is None:
             return f"The book {title} was not found."
-        elif not book.status and book.borrowed_by == self.current_user.username:
-            message = book.return_book()
-            self.current_user.remove_borrowed_book(title)
-            self.add_book_to_file()
-            self.save_users()
-            return message
-        elif not book.status and book.borrowed_by != self.current_user.username:
-            return f"You cannot return {title} as it was borrowed by {book.borrowed_by}."
+        with self._book_lock(book):
+            with self._catalog_lock:
+                copies = self.catalog.copies(book.title, book.author)
+            if not copies:
+                return f"The book {title} was not found."
+            lent = [copy for copy in copies if not copy.status]
+            if not lent:
+                return f"The book {title} was not borrowed."
+            copy = next((copy for copy in lent if copy.borrowed_by == user.username), None)
+            if copy is None:
+                return f"You cannot return {title} as it was borrowed by {lent[0].borrowed_by}."
+            with self._catalog_lock:
+                if self.catalog.get(copy.book_id) is None:
+                    return f"The book {title} was not found."
+                message = copy.return_book()
+                self.catalog.returned(copy, user.username)
+            with self._user_locks.for_key(user.username):
+                user.remove_borrowed_book(copy.title, copy.book_id)
+            holder = self._hand_off(copy) if copy.holds else None
+        self._persist_loan(copy, user)
+        if holder is not None:
+            self._persist_holds(copy)
+            message += f" It is now held for {holder}."
+        return message
+
+    # Method to join the queue for a book that has no copy to lend, as the given user or the
+    # logged in user. When a copy comes back it is held for the first reader in the queue
+    def place_hold(self, title, user=None):
+        user = user or self.current_user
+        if not user:
+            return "Please login to place a hold."
+
+        book = self.search_by_title(title)
+        if book is None:
+            return "Book not found in the library."
+        self.expire_holds()
+        with self._book_lock(book):
+            with self._catalog_lock:
+                copies = self.catalog.copies(book.title, book.author)
+            if not copies:
+                return "Book not found in the library."
+            if any(copy.can_lend_to(user.username) for copy in copies):
+                return f"{book.title} is available, you can borrow it now."
+            if any(copy.borrowed_by == user.username for copy in copies):
+                return f"You have already borrowed {book.title}."
+            with self._catalog_lock:
+                if not self.catalog.copies(book.title, book.author):
+                    return "Book not found in the library."
+                queue = self.catalog.hold_queue(book.title, book.author)
+            if user.username in queue:
+                return f"You are already number {queue.index(user.username) + 1} in the queue for {book.title}."
+            queue.append(user.username)
+            position = len(queue)
+        self._persist_holds(book)
+        return f"You are number {position} in the queue for {book.title}."
+
+    # Method to leave the queue for a book, or give up the copy held for the user
+    def cancel_hold(self, title, user=None):
+        user = user or self.current_user
+        if not user:
+            return "Please login to cancel a hold."
+
+        book = self.search_by_title(title)
+        if book is None:
+            return "Book not found in the library."
+        with self._book_lock(book):
+            with self._catalog_lock:
+                copies = self.catalog.copies(book.title, book.author)
+            if not copies:
+                return "Book not found in the library."
+            held = next((copy for copy in copies if copy.held_for == user.username), None)
+            if held is not None:
+                self._hand_off(held) # to the next reader in the queue
+            elif user.username in (copies[0].holds or ()):
+                copies[0].holds.remove(user.username)
+            else:
+                return f"You have no hold on {book.title}."
+        self._persist_holds(book)
+        return f"Your hold on {book.title} has been cancelled."
+
+    # Method to get the usernames waiting for a book, the next one first
+    def hold_queue(self, title):
+        book = self.search_by_title(title)
+        if book is None:
+            return []
+        with self._catalog_lock:
+            return list(self.catalog.holds(book.title, book.author) or ())
+
+    # Method to get the copies set aside for readers, the one whose hold runs out first first
+    def ready_holds(self):
+        with self._catalog_lock:
+            return self.catalog.ready_holds()
+
+    # Method to pass the copies that weren't collected before their hold ran out on to the
+    # next reader in the queue, or make them available. Finding them takes O(1) when no hold
+    # has run out, so this is called before every borrow. Returns the number of expired holds
+    def expire_holds(self, now=None):
+        now = self.clock() if now is None else now
+        with self._catalog_lock:
+            expired = self.catalog.expired_holds(now)
+        for copy in expired:
+            with self._book_lock(copy):
+                if copy.held_for is None or copy.hold_until > now: # collected or handed on meanwhile
+                    continue
+                self._hand_off(copy)
+            self._persist_holds(copy)
+        return len(expired)
+
+    # Method to hold an available copy for the next reader in its queue, called with the
+    # book's lock held. Any earlier hold on the copy ends. Returns the reader, or None
+    def _hand_off(self, copy):
+        with self._catalog_lock:
+            if copy.held_for is not None:
+                copy.held_for = copy.hold_until = None
+                self.catalog.released(copy)
+            if copy.holds:
+                copy.held_for = copy.holds.popleft()
+                copy.hold_until = self.clock() + self.hold_days * DAY
+                self.catalog.held(copy)
+        return copy.held_for
+
+    # Method to store every copy of a book after its hold queue changed, as each of them
+    # is stored with the queue
+    def _persist_holds(self, book):
+        with self._catalog_lock:
+            copies = self.catalog.copies(book.title, book.author)
+        with self._storage_lock:
+            self.storage.put_books(copies)
+
+    # Method to get the books lent to a user, from the borrower index kept by the catalog
+    def loans_for_user(self, username):
+        with self._catalog_lock:
+            return self.catalog.by_borrower(username)
+
+    # Method to get the lent books that are overdue at now (by default the current time),
+    # the longest overdue first, from the due date queue kept by the catalog
+    def overdue_books(self, now=None, limit=None):
+        now = self.clock() if now is None else now
+        with self._catalog_lock:
+            return self.catalog.overdue(now, limit)
+
+    # Method to get the n lent books that are due back first
+    def next_due(self, n=10):
+        with self._catalog_lock:
+            return self.catalog.next_due(n)
+
+    # Method to start writing overdue notices to outbox_path every interval seconds
+    # on a background thread, see models/overdue.py. close() stops it
+    def start_overdue_sweep(self, outbox_path, interval=3600.0):
+        from models.overdue import OverdueSweeper # only needed once sweeping starts
+        if self.sweeper is None:
+            self.sweeper = OverdueSweeper(self, outbox_path, interval).start()
+        return self.sweeper
+
+    # Method to get every outstanding loan as a dict of username -> books
+    def all_loans(self):
+        with self._catalog_lock:
+            return self.catalog.loans()
+
+    # Method to get the circulation counters: total, available and borrowed books, users with
+    # loans and registered users. They are kept up to date as books change so this doesn't
+    # look at the books, details=True adds the counts of every author and every borrower
+    def stats(self, details=False):
+        with self._catalog_lock:
+            stats = self.catalog.counts()
+            if details:
+                stats["authors"] = self.catalog.all_author_counts()
+                stats["loans_per_user"] = self.catalog.loan_counts()
+        stats["users"] = len(self.users)
+        return stats
+
+    # Method to get the number of books and borrowed books of one author
+    def author_stats(self, author):
+        with self._catalog_lock:
+            return self.catalog.author_counts(author.strip())
+
+    # Method to get the number of books lent to one user
+    def loan_count(self, username):
+        with self._catalog_lock:
+            return self.catalog.loan_count(username)
+
+    # Method to get the display rows of the books as one string, or only the rows of
+    # limit books starting after the first offset ones
+    def display_books(self, offset=0, limit=None):
+        if offset or limit is not None:
+            books = self.books_page(offset, limit)
+            book_list = [self.format_book(idx, book) for idx, book in enumerate(books, offset + 1)]
         else:
-            return f"The book {title} was not borrowed."
-
-    # method to display all books in library
-    def display_books(self):
-        if self.books:
-            book_list = []
-            for idx, book in enumerate(self.books, 1):
-                if book.status:
-                    status_text = "Available"
-                else:
-                    status_text = f"Borrowed by {book.borrowed_by}"
-                book_list.append(f"{idx}. {book.title} by {book.author} - {status_text}")
+            book_list = list(self.iter_display_books())
+        if book_list:
             return "\n".join(book_list)
+        elif offset:
+            return "There are no more books to display."
         else:
             return "There are no books in this library."
+
+    # Method to yield the display rows of every book one at a time. Books are read
+    # page_size at a time so the catalog lock is never held for long
+    def iter_display_books(self, page_size=500):
+        cursor, idx = -1, 0
+        while True:
+            with self._catalog_lock:
+                page, cursor = self.catalog.page_after(cursor, page_size)
+            for book in page:
+                idx += 1
+                yield self.format_book(idx, book)
+            if len(page) < page_size:
+                return
+
+    # Method to get one page of books in display order, offset counts from 0
+    def books_page(self, offset=0, limit=20):
+        with self._catalog_lock:
+            return self.catalog.page(offset, limit)
+
+    def count_books(self):
+        with self._catalog_lock:
+            return len(self.catalog)
+
+    @staticmethod
+    def format_book(idx, book):
+        if book.status:
+            status_text = "Available"
+        else:
+            status_text = f"Borrowed by {book.borrowed_by}"
+        return f"{idx}. {book.title} by {book.author} - {status_text}"
     
     # User management methods
     def load_users(self):
-        try:
-            if os.path.exists(self.users_file_path) and os.path.getsize(self.users_file_path) > 0:
-                with open(self.users_file_path, "r") as file:
-                    users_data = json.load(file)
-                    for username, user_data in users_data.items():
-                        user = User(username, user_data["password"], user_data["role"])
-                        user.borrowed_books = user_data.get("borrowed_books", [])
-                        self.users[username] = user
-            else:
-                with open(self.users_file_path, "w") as file:
-                    file.write("{}")
-        except (json.JSONDecodeError, FileNotFoundError):
-            os.makedirs(os.path.dirname(self.users_file_path), exist_ok=True)
-            with open(self.users_file_path, "w") as file:
-                file.write("{}")
+        start = time.perf_counter()
+        users = {}
+        for username, user_data in self.storage.load_users().items():
+            user = User(username, user_data["password"], user_data["role"])
+            for loan in user_data.get("borrowed_books", []):
+                if isinstance(loan, dict):
+                    user.add_borrowed_book(loan.get("title", ""), loan.get("id"))
+                else: # stored before books had ids
+                    user.add_borrowed_book(loan)
+            users[username] = user
+        with self._users_lock:
+            self._users = users
+        self.load_times["users"] = time.perf_counter() - start
     
     def save_users(self):
-        try:
-            users_data = {}
-            for username, user in self.users.items():
-                users_data[username] = {
-                    "password": user.password,
-                    "role": user.role,
-                    "borrowed_books": user.borrowed_books
-                }
-            with open(self.users_file_path, "w") as file:
-                json.dump(users_data, file, indent=4)
-        except Exception as e:
-            print(f"Error saving users: {e}")
+        with self._storage_lock:
+            self.storage.save_users(self._snapshot_users())
+
+    # Method to key the loans users have kept by title since before books had ids by the
+    # id of the book instead, found through the borrower index. Returns how many were linked
+    def link_loans(self):
+        linked = 0
+        with self._users_lock:
+            users = list(self.users.values())
+        for user in users:
+            titles = [title for key, title in user.loans() if not isinstance(key, int)]
+            if not titles:
+                continue
+            with self._catalog_lock:
+                lent = [book for book in self.catalog.by_borrower(user.username) if book.book_id not in user.book_ids()]
+            with self._user_locks.for_key(user.username):
+                for title in titles:
+                    book = next((book for book in lent if normalize(book.title) == normalize(title)), None)
+                    if book is not None:
+                        user.link_loan(title, book.book_id)
+                        lent.remove(book)
+                        linked += 1
+        return linked
     
     
     def register_user(self, username, password):
@@ -207,19 +715,51 @@ class Library:
             return False, message
         
         username = username.strip()
-        if username in self.users or username.lower() == "admin":
-            return False, "Username already exists or is reserved"
-        
-        self.users[username] = User(username, password, "reader")
-        self.save_users()
+        password_hash = self.password_hasher.hash(password) # slow on purpose, so outside the lock
+        with self._users_lock:
+            if username in self.users or username.lower() == "admin":
+                return False, "Username already exists or is reserved"
+            user = User(username, password_hash, "reader")
+            self.users[username] = user
+        with self._storage_lock:
+            self.storage.put_user(user)
         return True, "User registered successfully"
+
+    # Method to get the user with these credentials, or None. A password stored in plain text
+    # or hashed with other settings than password_hasher's is hashed again once it matched.
+    # Unknown users take as long as wrong passwords so they can't be told apart by timing
+    def _authenticate(self, username, password):
+        user = self.users.get(username.strip())
+        if user is None:
+            self.password_hasher.hash(password)
+            return None
+        stored = user.password
+        if not self.password_hasher.verify(password, stored):
+            return None
+        if self.password_hasher.needs_rehash(stored):
+            password_hash = self.password_hasher.hash(password)
+            with self._user_locks.for_key(user.username):
+                if user.password != stored: # changed meanwhile
+                    return user
+                user.password = password_hash
+            with self._storage_lock:
+                self.storage.put_user(user)
+        return user
     
     def login(self, username, password):
-        username = username.strip()
-        if username in self.users and self.users[username].password == password:
-            self.current_user = self.users[username]
-            return True, f"Welcome {username}!"
+        user = self._authenticate(username, password)
+        if user is not None:
+            self.current_user = user
+            return True, f"Welcome {user.username}!"
         return False, "Invalid username or password"
+
+    # Method to open a separate session for a user, so several users can use the
+    # library at the same time without sharing current_user
+    def create_session(self, username, password):
+        user = self._authenticate(username, password)
+        if user is None:
+            return False, "Invalid username or password"
+        return True, Session(self, user)
     
     def logout(self):
         if self.current_user:
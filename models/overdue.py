@@ -0,0 +1,95 @@
+# Background sweep that writes a notice for every overdue loan and every copy set aside
+# for a reader to an outbox file.
+# The outbox is a journal of JSON records, one per line, for whatever sends the notices
+# (email, SMS, ...) to read and deliver
+
+import threading
+from models.book import DAY
+from utils.journal import Journal
+
+
+class OverdueSweeper:
+    # Every interval seconds the library's overdue books are looked up and a notice is
+    # appended for each loan that didn't get one yet. A loan gets one notice per due date.
+    # Holds that ran out are passed on first, then each reader a copy is held for gets one
+    # notice per hold
+    def __init__(self, library, outbox_path, interval=3600.0):
+        self.library = library
+        self.outbox = Journal(outbox_path)
+        self.interval = interval
+        self.last_error = None
+        self._notified = set()  # (book id, borrower, due date) of the overdue loans already noticed
+        self._ready = set()  # (book id, reader, hold end) of the holds already noticed
+        for record in self.outbox.replay():  # don't send the notices of an earlier run again
+            if record.get("type") == "hold_ready":
+                self._ready.add((record.get("book_id"), record.get("username"), record.get("hold_until")))
+            else:
+                self._notified.add((record.get("book_id"), record.get("username"), record.get("due_at")))
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Method to write the notices of the loans overdue at now and of the held copies, returns
+    # how many were written. Only the overdue loans and held copies are looked at, and only
+    # they are remembered afterwards
+    def sweep(self, now=None):
+        now = self.library.clock() if now is None else now
+        overdue = set()
+        notices = []
+        for book in self.library.overdue_books(now):
+            key = (book.book_id, book.borrowed_by, book.due_at)
+            overdue.add(key)
+            if key in self._notified:
+                continue
+            notices.append({
+                "type": "overdue",
+                "book_id": book.book_id,
+                "title": book.title,
+                "author": book.author,
+                "username": book.borrowed_by,
+                "due_at": book.due_at,
+                "days_overdue": int((now - book.due_at) // DAY),
+                "sent_at": now
+            })
+        self.library.expire_holds(now)
+        ready = set()
+        for book in self.library.ready_holds():
+            key = (book.book_id, book.held_for, book.hold_until)
+            ready.add(key)
+            if key in self._ready:
+                continue
+            notices.append({
+                "type": "hold_ready",
+                "book_id": book.book_id,
+                "title": book.title,
+                "author": book.author,
+                "username": book.held_for,
+                "hold_until": book.hold_until,
+                "sent_at": now
+            })
+        self.outbox.extend(notices)
+        self._notified = overdue
+        self._ready = ready
+        return len(notices)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="overdue-sweep", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                self.last_error = e
+                print(f"Error sweeping overdue loans - {e}")
+            if self._stop.wait(self.interval):
+                return
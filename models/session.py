@@ -0,0 +1,35 @@
+# Class representing one logged in user's session with the library
+
+class Session:
+    __slots__ = ("library", "user")
+
+    def __init__(self, library, user):
+        self.library = library
+        self.user = user
+
+    @property
+    def username(self):
+        return self.user.username
+
+    @property
+    def borrowed_books(self):
+        return self.user.borrowed_books
+
+    # Method to borrow a book as this session's user
+    def borrow_book(self, title):
+        return self.library.borrow_book(title, user=self.user)
+
+    # Method to return a book as this session's user
+    def return_book(self, title):
+        return self.library.return_book(title, user=self.user)
+
+    # Method to join the queue for a book as this session's user
+    def place_hold(self, title):
+        return self.library.place_hold(title, user=self.user)
+
+    # Method to leave the queue for a book as this session's user
+    def cancel_hold(self, title):
+        return self.library.cancel_hold(title, user=self.user)
+
+    def __str__(self):
+        return f"Session: {self.user.username}"
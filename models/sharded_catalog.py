@@ -0,0 +1,128 @@
+# Catalog split into shards by a hash of the normalized title. Every shard has a worker
+# process of its own holding the shard's titles and authors, so fuzzy searches that
+# can't use the n-gram index scan all shards at the same time on different cores
+
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from models.catalog import Catalog, normalize
+
+# State of a worker process: seq -> (lowercase title, lowercase author) of its shard
+_rows = {}
+
+
+# Functions run in the worker processes. A shard's executor has a single process, so
+# they run in the order they were submitted
+def _add_rows(rows):
+    _rows.update(rows)
+
+
+def _remove_rows(seqs):
+    for seq in seqs:
+        _rows.pop(seq, None)
+
+
+# Same matching as fuzzy_search, the text is already lowercase. Returns the seqs of the
+# first limit matches of the shard, which are in catalog order since seqs only grow
+def _scan(query, field, limit):
+    words = query.lower().split()
+    column = 0 if field == "title" else 1
+    matches = []
+    for seq, row in _rows.items():
+        text = row[column]
+        if all(word in text for word in words):
+            matches.append(seq)
+            if limit is not None and len(matches) >= limit:
+                break
+    return matches
+
+
+def shard_of(title, shards):
+    return zlib.crc32(normalize(title).encode("utf-8")) % shards
+
+
+class ShardedCatalog(Catalog):
+    # The catalog itself and its indexes stay in this process, the workers only get what
+    # scans need. Changes are sent to them in one batch per shard before the next scan.
+    # Catalogs smaller than parallel_min books are scanned here, the workers aren't worth it
+    def __init__(self, books=None, shards=4, parallel_min=10000):
+        self.shards = shards
+        self.parallel_min = parallel_min
+        self._executors = None  # started by the first parallel scan
+        self._pending_adds = [{} for _ in range(shards)]
+        self._pending_removes = [[] for _ in range(shards)]
+        self._shard_sizes = [0] * shards
+        super().__init__(books)
+
+    def _store(self, seq, book):
+        super()._store(seq, book)
+        shard = shard_of(book.title, self.shards)
+        self._pending_adds[shard][seq] = (book.title.lower(), book.author.lower())
+        self._shard_sizes[shard] += 1
+
+    def _drop(self, seq):
+        shard = shard_of(self._get(seq).title, self.shards)
+        super()._drop(seq)
+        if self._pending_adds[shard].pop(seq, None) is None:  # already sent to the worker
+            self._pending_removes[shard].append(seq)
+        self._shard_sizes[shard] -= 1
+
+    def shard_sizes(self):
+        return list(self._shard_sizes)
+
+    def clear(self):
+        self._stop_workers()
+        self.__init__(shards=self.shards, parallel_min=self.parallel_min)
+
+    def _fuzzy(self, index, query, field, limit):
+        scan = self.start_fuzzy(field, query, limit)
+        if scan is None:
+            return super()._fuzzy(index, query, field, limit)
+        return self.scanned_books(scan(), limit)
+
+    # Method to send a scan to every shard's worker. Returns a function waiting for the
+    # matching seqs merged back into catalog order, which doesn't touch the catalog, so
+    # callers can release their lock while it waits and look the seqs up with scanned_books
+    # afterwards. Returns None when the scan is better done here
+    def start_fuzzy(self, field, query, limit=None):
+        index = self._title_grams if field == "title" else self._author_grams
+        if self.shards < 2 or len(self) < self.parallel_min or index.candidates(query) is not None:
+            return None
+        self._sync()
+        futures = [executor.submit(_scan, query, field, limit) for executor in self._executors]
+        return lambda: sorted(seq for future in futures for seq in future.result())
+
+    # Method to get the books of scanned seqs, skipping the ones removed since the scan started
+    def scanned_books(self, seqs, limit=None):
+        books = [self._books[seq] for seq in seqs if seq in self._books]
+        return books if limit is None else books[:limit]
+
+    # Method to start the workers if needed and send them the changes made since the last scan
+    def _sync(self):
+        if self._executors is None:
+            context = multiprocessing.get_context("spawn")  # forking a threaded process isn't safe
+            self._executors = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(self.shards)]
+        for shard, executor in enumerate(self._executors):
+            if self._pending_adds[shard]:
+                executor.submit(_add_rows, self._pending_adds[shard])
+                self._pending_adds[shard] = {}
+            if self._pending_removes[shard]:
+                executor.submit(_remove_rows, self._pending_removes[shard])
+                self._pending_removes[shard] = []
+
+    # Method to stop the worker processes, the next parallel scan starts them again
+    def close(self):
+        if self._executors is None:
+            return
+        self._stop_workers()
+        for shard in range(self.shards):  # new workers start empty, so everything is sent again
+            self._pending_removes[shard] = []
+            self._pending_adds[shard] = {}
+        for seq, book in self._books.items():
+            self._pending_adds[shard_of(book.title, self.shards)][seq] = (book.title.lower(), book.author.lower())
+
+    def _stop_workers(self):
+        if self._executors is not None:
+            for executor in self._executors:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._executors = None
@@ -1,19 +1,70 @@
 # Class representing a user in the library system
 
 class User:
+    __slots__ = ("username", "password", "role", "_borrowed", "_titles")
+
     def __init__(self, username, password, role="reader"):
         self.username = username.strip()
         self.password = password
         self.role = role  # "reader" or "librarian"
-        self.borrowed_books = []
+        # book id -> title of the borrowed books, in the order they were borrowed. Loans
+        # stored before books had ids are keyed by their title until link_loans runs
+        self._borrowed = {}
+        self._titles = {}  # title -> {key in _borrowed: None}, so loans are found by title without a scan
+
+    # Titles of the borrowed books in the order they were borrowed
+    @property
+    def borrowed_books(self):
+        return list(self._borrowed.values())
+
+    @borrowed_books.setter
+    def borrowed_books(self, titles):
+        self._borrowed = {}
+        self._titles = {}
+        for title in titles:
+            self.add_borrowed_book(title)
+
+    # Method to get the loans as (book id, title) pairs, the id is the title for old loans
+    def loans(self):
+        return list(self._borrowed.items())
+
+    # Method to get the ids of the borrowed books
+    def book_ids(self):
+        return [key for key in self._borrowed if isinstance(key, int)]
+
+    # book is a book id or a title
+    def has_borrowed(self, book):
+        return book in self._borrowed or book in self._titles
+
+    def add_borrowed_book(self, book_title, book_id=None):
+        key = book_title if book_id is None else book_id
+        if key not in self._borrowed:
+            self._borrowed[key] = book_title
+            self._titles.setdefault(book_title, {})[key] = None
+
+    def remove_borrowed_book(self, book_title, book_id=None):
+        if book_id in self._borrowed:
+            key = book_id
+        elif book_title in self._borrowed:
+            key = book_title
+        elif book_title in self._titles:
+            key = next(iter(self._titles[book_title]))  # the first one borrowed
+        else:
+            return
+        self._forget(key, self._borrowed.pop(key))
 
-    def add_borrowed_book(self, book_title):
-        if book_title not in self.borrowed_books:
-            self.borrowed_books.append(book_title)
+    def _forget(self, key, title):
+        keys = self._titles[title]
+        del keys[key]
+        if not keys:
+            del self._titles[title]
 
-    def remove_borrowed_book(self, book_title):
-        if book_title in self.borrowed_books:
-            self.borrowed_books.remove(book_title)
+    # Method to key a loan kept by title by the id of the book instead
+    def link_loan(self, book_title, book_id):
+        if book_title in self._borrowed:
+            self._borrowed = {book_id if key == book_title else key: title for key, title in self._borrowed.items()}
+            self._forget(book_title, book_title)
+            self._titles.setdefault(book_title, {})[book_id] = None
 
     def __str__(self):
         return f"User: {self.username} ({self.role})"
\ No newline at end of file
@@ -0,0 +1,113 @@
+# Base class for the places a library can keep its books and users
+
+
+# Method to turn a book into the record stored by every backend
+def book_record(book):
+    return {
+        "id": book.book_id,
+        "title": book.title,
+        "author": book.author,
+        "status": book.status,
+        "borrowed_by": book.borrowed_by,
+        "borrowed_at": book.borrowed_at,
+        "due_at": book.due_at,
+        "holds": list(book.holds or ()),
+        "held_for": book.held_for,
+        "hold_until": book.hold_until
+    }
+
+
+# Method to turn a user into the record stored by every backend. Loans are stored with
+# the id of the book, loans kept from before books had ids only have their title
+def user_record(user):
+    return {
+        "password": user.password,
+        "role": user.role,
+        "borrowed_books": [{"id": key, "title": title} if isinstance(key, int) else title
+                           for key, title in user.loans()]
+    }
+
+
+# Raised while loading when the stored data can't be read
+class CorruptDataError(Exception):
+    pass
+
+
+class StorageBackend:
+    def __init__(self):
+        self._books = lambda: []
+        self._users = lambda: {}
+        self._next_id = lambda: 1
+
+    # Method to give the backend access to the library's current books and users,
+    # used by backends that can only save everything at once, and to the id the next
+    # new book will be given, which is saved with the books
+    def attach(self, books_provider, users_provider, next_id_provider=None):
+        self._books = books_provider
+        self._users = users_provider
+        if next_id_provider is not None:
+            self._next_id = next_id_provider
+
+    # Method to get the stored book records in catalog order, may be a generator
+    def load_books(self):
+        raise NotImplementedError
+
+    # Method to restore the last good copy of the books after load_books raised
+    # CorruptDataError, returns True if there was one to restore
+    def recover_books(self):
+        return False
+
+    # Method to get the stored id the next new book will be given, so the ids of removed
+    # books aren't handed out again. Read once load_books has been iterated; None if the
+    # backend doesn't store it
+    def next_book_id(self):
+        return None
+
+    # Method to get the stored user records as a dict keyed by username
+    def load_users(self):
+        raise NotImplementedError
+
+    # Methods to replace everything that is stored
+    def save_books(self, books):
+        raise NotImplementedError
+
+    def save_users(self, users):
+        raise NotImplementedError
+
+    # Methods to store a single change, by default everything is saved again
+    def put_book(self, book):
+        self.save_books(self._books())
+
+    def delete_book(self, book):
+        self.save_books(self._books())
+
+    # Method to store a batch of new or changed books, by default with one full save
+    def put_books(self, books):
+        self.save_books(self._books())
+
+    def put_user(self, user):
+        self.save_users(self._users())
+
+    # Method to store a group of changes at once, used by GroupCommitStorage.
+    # By default books and users are each saved once, however many of them changed
+    def write_batch(self, puts, deletes, users):
+        if puts or deletes:
+            self.save_books(self._books())
+        if users:
+            self.save_users(self._users())
+
+    # Method to fold any pending incremental changes into the main store
+    def compact(self):
+        self.save_books(self._books())
+        self.save_users(self._users())
+
+    # Method to get how much data the backend wrote so far, 0 if it can't tell
+    def written_bytes(self):
+        return 0
+
+    # Method to wait until every change handed to the backend is written
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
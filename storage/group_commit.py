@@ -0,0 +1,163 @@
+# Storage wrapper that collects changes and writes them in groups on a background thread
+
+import atexit
+import threading
+import time
+from storage.base import StorageBackend
+
+
+class GroupCommitStorage(StorageBackend):
+    # Changes are written when batch_size of them are waiting or interval seconds after
+    # the first one, whichever comes first. flush() waits until they are written.
+    def __init__(self, inner, interval=0.05, batch_size=500):
+        super().__init__()
+        self.inner = inner
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_error = None
+        self._books_pending = {}  # book id -> ("put" or "del", book), the last change wins
+        self._users_pending = {}  # username -> user
+        self._first_pending = None
+        self._queued = 0  # number of changes handed over so far
+        self._written = 0  # number of those changes that are written
+        self._flush_requested = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # one write to the inner backend at a time
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="group-commit", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def attach(self, books_provider, users_provider, next_id_provider=None):
+        super().attach(books_provider, users_provider, next_id_provider)
+        self.inner.attach(books_provider, users_provider, next_id_provider)
+
+    def load_books(self):
+        return self.inner.load_books()
+
+    def next_book_id(self):
+        return self.inner.next_book_id()
+
+    def recover_books(self):
+        return self.inner.recover_books()
+
+    def load_users(self):
+        return self.inner.load_users()
+
+    # Full saves go straight through, anything still queued is simply written again afterwards
+    def save_books(self, books):
+        with self._write_lock:
+            self.inner.save_books(books)
+
+    def save_users(self, users):
+        with self._write_lock:
+            self.inner.save_users(users)
+
+    def compact(self):
+        self.flush()
+        with self._write_lock:
+            self.inner.compact()
+
+    def written_bytes(self):
+        return self.inner.written_bytes()
+
+    # Methods that only queue a change for the writer thread
+    def put_book(self, book):
+        self._queue_book("put", book)
+
+    def put_books(self, books):
+        for book in books:
+            self._queue_book("put", book)
+
+    def delete_book(self, book):
+        self._queue_book("del", book)
+
+    def put_user(self, user):
+        with self._condition:
+            self._users_pending[user.username] = user
+            self._queued_change()
+
+    # Method to queue a group of changes at once, so they all go in the same write
+    def write_batch(self, puts, deletes, users):
+        with self._condition:
+            for op, books in (("put", puts), ("del", deletes)):
+                for book in books:
+                    self._books_pending[book.book_id] = (op, book)
+                    self._queued_change()
+            for user in users:
+                self._users_pending[user.username] = user
+                self._queued_change()
+
+    def _queue_book(self, op, book):
+        with self._condition:
+            self._books_pending[book.book_id] = (op, book)
+            self._queued_change()
+
+    def _queued_change(self):
+        self._queued += 1
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+            self._condition.notify_all()
+        elif len(self._books_pending) + len(self._users_pending) >= self.batch_size:
+            self._condition.notify_all()
+
+    # Method to block until every change queued before the call has been written.
+    # This is the durability barrier for callers that can't accept losing recent changes
+    def flush(self):
+        with self._condition:
+            target = self._queued
+            if self._closed:
+                self._write_pending()
+                return
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._written < target:
+                self._condition.wait()
+
+    # Method to stop the writer thread after writing everything still pending
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+        self.inner.close()
+
+    # Writer thread: wait for a full batch, the interval, a flush or close, then write
+    def _run(self):
+        with self._condition:
+            while True:
+                pending = len(self._books_pending) + len(self._users_pending)
+                if pending == 0:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    continue
+                waited = time.monotonic() - self._first_pending
+                if not (self._closed or self._flush_requested or pending >= self.batch_size or waited >= self.interval):
+                    self._condition.wait(self.interval - waited)
+                    continue
+                self._write_pending()
+
+    # Method to write everything queued so far, called with the condition held.
+    # The condition is released while writing so new changes can be queued meanwhile
+    def _write_pending(self):
+        books, users = self._books_pending, self._users_pending
+        self._books_pending, self._users_pending = {}, {}
+        target = self._queued
+        self._first_pending = None
+        self._flush_requested = False
+        self._condition.release()
+        try:
+            puts = [book for op, book in books.values() if op == "put"]
+            deletes = [book for op, book in books.values() if op == "del"]
+            with self._write_lock:
+                self.inner.write_batch(puts, deletes, list(users.values()))
+        except Exception as e:
+            self.last_error = e
+            print(f"Error writing changes - {e}")
+        finally:
+            self._condition.acquire()
+        self._written = max(self._written, target)
+        self._condition.notify_all()
@@ -0,0 +1,258 @@
+# Storage backend keeping books and users in JSON files, optionally with a journal
+
+import json
+import os
+import shutil
+from models.catalog import normalize
+from storage.base import CorruptDataError, StorageBackend, book_record, user_record
+from utils.atomic import atomic_write, backup_path
+from utils.journal import Journal
+from utils.json_stream import iter_json_object_array
+
+EMPTY_BOOKS = '{"next_id": 1, "books": []}'
+
+
+class JsonStorage(StorageBackend):
+    # With journal=True every change is appended to a journal next to each data file
+    # and the full JSON files are only rewritten every compact_every records. A journal
+    # left behind is replayed whatever the flag, and emptied by the next full save.
+    # Files are replaced atomically; fsync=False skips waiting for the disk on each write.
+    # The books file is an object holding the next book id and the "books" array, files
+    # holding just the array are still read
+    def __init__(self, file_path, users_file_path, journal=False, compact_every=1000, chunk_size=65536, fsync=True):
+        super().__init__()
+        self.file_path = file_path
+        self.users_file_path = users_file_path
+        self.fsync = fsync
+        self._restored = set() # files already replaced by their backup
+        self._bytes_written = 0
+        self.compact_every = compact_every
+        self.chunk_size = chunk_size
+        self._stored_next_id = 1 # the next book id as of the last load or save
+        self.journal = journal
+        self.books_journal = Journal(file_path + ".journal", fsync=fsync)
+        self.users_journal = Journal(users_file_path + ".journal", fsync=fsync)
+
+    # Method to load book records from the JSON file and apply the journal on top, if there
+    # is one. The file is parsed one record at a time so the whole array is never held in memory.
+    def load_books(self):
+        if not self.books_journal.exists():
+            return self._stream_books()
+        return self._replay_books(self._stream_books())
+
+    def _stream_books(self):
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > 0: # Check if the file exists and if it is not empty
+                with open(self.file_path, "r") as file:
+                    header = {}
+                    books = iter_json_object_array(file, "books", header, self.chunk_size)
+                    for position, book_data in enumerate(books, 1):
+                        book_data.setdefault("id", position) # saved before books had ids
+                        yield book_data
+                    self._stored_next_id = header.get("next_id", 1)
+            else:
+                self._create(self.file_path, EMPTY_BOOKS) # Create empty JSON file with no books (fix error with loading empty JSON file)
+        except json.JSONDecodeError as e:
+            raise CorruptDataError(f"{self.file_path} is not a valid books file - {e}") from e
+        except FileNotFoundError:
+            self._create(self.file_path, EMPTY_BOOKS)
+
+    # Method to put the last good books file back after a corrupt one was found.
+    # The corrupt file is kept next to it with a .corrupt suffix. If the backup turns
+    # out to be corrupt as well, the next call starts an empty file
+    def recover_books(self):
+        return self._recover(self.file_path, EMPTY_BOOKS)
+
+    def _recover(self, path, empty):
+        if path in self._restored: # the backup itself was corrupt
+            self._create(path, empty)
+            return False
+        if os.path.exists(path):
+            os.replace(path, path + ".corrupt")
+        if os.path.exists(backup_path(path)):
+            shutil.copy2(backup_path(path), path)
+            self._restored.add(path)
+            return True
+        self._create(path, empty)
+        return False
+
+    @staticmethod
+    def _create(path, empty):
+        if os.path.dirname(path): # If the file doesn't exist a new one is created
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            file.write(empty)
+
+    # Method to apply the changes recorded in the books journal after the last snapshot.
+    # The journal, at most compact_every records, is read first and the snapshot is then
+    # streamed with each book's changes applied as it goes by, books added after the
+    # snapshot come last. Every id in the journal, deleted ones too, counts towards the
+    # next book id
+    def _replay_books(self, books_data):
+        journal = list(self.books_journal.replay())
+        if any(record.get("book", {}).get("id") is None for record in journal):
+            yield from self._replay_by_title(books_data, journal)
+            return
+        changes = {}  # book id -> its journal records, in order
+        next_id = 1
+        for record in journal:
+            book_id = record["book"]["id"]
+            changes.setdefault(book_id, []).append(record)
+            next_id = max(next_id, book_id + 1)
+        for book_data in books_data:
+            book_changes = changes.pop(book_data["id"], None)
+            if book_changes is not None:
+                book_data = self._apply(book_data, book_changes)
+            if book_data is not None:
+                yield book_data
+        for book_changes in changes.values():
+            book_data = self._apply(None, book_changes)
+            if book_data is not None:
+                yield book_data
+        self._stored_next_id = max(self._stored_next_id, next_id)
+
+    @staticmethod
+    def _apply(book_data, records):
+        for record in records:
+            if record.get("op") == "put":
+                # put records hold the whole book
+                book_data = record["book"] if book_data is None else {**book_data, **record["book"]}
+            elif record.get("op") == "del":
+                book_data = None
+        return book_data
+
+    # Method to replay a journal written before books had ids. Its records are matched by
+    # title and author, there was only one copy of each book then, which needs the whole
+    # snapshot at once
+    def _replay_by_title(self, books_data, journal):
+        records = {}
+        ids = {}  # (title, author) -> book id
+        for book_data in books_data:
+            records.setdefault(book_data["id"], book_data)
+            ids.setdefault(self._title_key(book_data), book_data["id"])
+        for record in journal:
+            data = record.get("book", {})
+            book_id = data.get("id")
+            if book_id is None:
+                book_id = ids.get(self._title_key(data))
+            if book_id is not None:
+                self._stored_next_id = max(self._stored_next_id, book_id + 1)
+            if record.get("op") == "put":
+                if book_id in records:
+                    records[book_id].update(data) # put records hold the whole book
+                else:
+                    if book_id is None:
+                        book_id = data["id"] = max(records, default=0) + 1
+                    records[book_id] = data
+                    ids.setdefault(self._title_key(data), book_id)
+            elif record.get("op") == "del":
+                records.pop(book_id, None)
+        yield from records.values()
+
+    def next_book_id(self):
+        return self._stored_next_id
+
+    @staticmethod
+    def _title_key(book_data):
+        return (normalize(book_data.get("title", "")), normalize(book_data.get("author", "")))
+
+    # Method to load user records from the JSON file and apply the journal on top.
+    # If the file is corrupt the last good version is used instead
+    def load_users(self):
+        users_data = {}
+        try:
+            users_data = self._read_users()
+        except json.JSONDecodeError as e:
+            print(f"Error loading users - {self.users_file_path} is not valid JSON - {e}")
+            if self._recover(self.users_file_path, "{}"):
+                try:
+                    users_data = self._read_users()
+                except json.JSONDecodeError:
+                    self._recover(self.users_file_path, "{}")
+        for record in self.users_journal.replay(): # apply changes made after the last snapshot
+            if record.get("op") == "put":
+                users_data[record["username"]] = record["user"]
+        return users_data
+
+    def _read_users(self):
+        if os.path.exists(self.users_file_path) and os.path.getsize(self.users_file_path) > 0:
+            with open(self.users_file_path, "r") as file:
+                return json.load(file)
+        self._create(self.users_file_path, "{}")
+        return {}
+
+    # Method to write every book to the JSON file, after the id the next new book will be given
+    def save_books(self, books):
+        try:
+            books_data = []
+            for book in books:
+                books_data.append(book_record(book))
+            next_id = max(self._next_id(), self._stored_next_id)
+            json_str = json.dumps({"next_id": next_id, "books": books_data}, indent=4) # Convert to JSON string then you write to file
+            self._bytes_written += atomic_write(self.file_path, json_str, fsync=self.fsync)
+            self._stored_next_id = next_id
+            self.books_journal.truncate() # the snapshot now holds every journaled change
+        except Exception as e:
+            print(f"Error saving books to file - {e}")
+
+    # Method to write every user to the JSON file
+    def save_users(self, users):
+        try:
+            users_data = {}
+            for username, user in users.items():
+                users_data[username] = user_record(user)
+            self._bytes_written += atomic_write(self.users_file_path, json.dumps(users_data, indent=4), fsync=self.fsync)
+            self.users_journal.truncate()
+        except Exception as e:
+            print(f"Error saving users: {e}")
+
+    def written_bytes(self):
+        return self._bytes_written
+
+    # Methods to persist a single change, either as a journal record or by rewriting the whole file
+    def put_book(self, book):
+        if not self.journal:
+            return super().put_book(book)
+        self._bytes_written += self.books_journal.append({"op": "put", "book": book_record(book)})
+        if len(self.books_journal) >= self.compact_every:
+            self.save_books(self._books())
+
+    # Method to journal a batch of changed books, e.g. every copy sharing a hold queue,
+    # with a single write
+    def put_books(self, books):
+        if not self.journal:
+            return super().put_books(books)
+        self._bytes_written += self.books_journal.extend([{"op": "put", "book": book_record(book)} for book in books])
+        if len(self.books_journal) >= self.compact_every:
+            self.save_books(self._books())
+
+    def delete_book(self, book):
+        if not self.journal:
+            return super().delete_book(book)
+        self._bytes_written += self.books_journal.append({"op": "del", "book": self._deleted_record(book)})
+        if len(self.books_journal) >= self.compact_every:
+            self.save_books(self._books())
+
+    @staticmethod
+    def _deleted_record(book):
+        return {"id": book.book_id, "title": book.title, "author": book.author}
+
+    def put_user(self, user):
+        if not self.journal:
+            return super().put_user(user)
+        self._bytes_written += self.users_journal.append({"op": "put", "username": user.username, "user": user_record(user)})
+        if len(self.users_journal) >= self.compact_every:
+            self.save_users(self._users())
+
+    # Method to append a whole group of changes to the journals with one write each
+    def write_batch(self, puts, deletes, users):
+        if not self.journal:
+            return super().write_batch(puts, deletes, users)
+        records = [{"op": "put", "book": book_record(book)} for book in puts]
+        records += [{"op": "del", "book": self._deleted_record(book)} for book in deletes]
+        self._bytes_written += self.books_journal.extend(records)
+        self._bytes_written += self.users_journal.extend([{"op": "put", "username": user.username, "user": user_record(user)} for user in users])
+        if len(self.books_journal) >= self.compact_every:
+            self.save_books(self._books())
+        if len(self.users_journal) >= self.compact_every:
+            self.save_users(self._users())
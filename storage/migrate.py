@@ -0,0 +1,44 @@
+# Command line tool to copy the JSON data files into an SQLite database
+# Usage: python -m storage.migrate [--books PATH] [--users PATH] [--db PATH]
+
+import argparse
+import os
+import sys
+from models.library import Library
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+# Method to copy every book and user from the JSON files into the database
+def migrate(books_path, users_path, db_path):
+    library = Library(books_path, users_path, storage=JsonStorage(books_path, users_path))
+    library.link_loans() # loans saved before books had ids
+    target = SqliteStorage(db_path)
+    target.attach(lambda: list(library.catalog), lambda: library.users, lambda: library.catalog.next_id)
+    try:
+        target.save_books(library.catalog)
+        target.save_users(library.users)
+    finally:
+        target.close()
+    return len(library.catalog), len(library.users)
+
+
+def main(argv=None):
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_path = os.path.join(base_path, "data")
+    parser = argparse.ArgumentParser(description="Import the JSON data files into an SQLite database.")
+    parser.add_argument("--books", default=os.path.join(data_path, "library_data.json"))
+    parser.add_argument("--users", default=os.path.join(data_path, "users_data.json"))
+    parser.add_argument("--db", default=os.path.join(data_path, "library.db"))
+    args = parser.parse_args(argv)
+
+    for path in [args.books, args.users]:
+        if not os.path.exists(path):
+            print(f"Error: {path} does not exist.")
+            return 1
+    books, users = migrate(args.books, args.users, args.db)
+    print(f"Imported {books} books and {users} users into {args.db}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# Command line tool to give the books in the JSON data files their ids and key the users'
+# loans by book id, for files saved before books had ids. Running it again changes nothing.
+# Usage: python -m storage.migrate_ids [--books PATH] [--users PATH]
+
+import argparse
+import os
+import sys
+from models.library import Library
+from storage.json_storage import JsonStorage
+
+
+# Method to store the id of every book and link every loan kept by title to its book.
+# Returns the number of books and the number of loans that were linked
+def migrate_ids(books_path, users_path):
+    library = Library(books_path, users_path, storage=JsonStorage(books_path, users_path))
+    linked = library.link_loans()
+    library.add_book_to_file()
+    library.save_users()
+    return len(library.catalog), linked
+
+
+def main(argv=None):
+    base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_path = os.path.join(base_path, "data")
+    parser = argparse.ArgumentParser(description="Store book ids in the JSON data files.")
+    parser.add_argument("--books", default=os.path.join(data_path, "library_data.json"))
+    parser.add_argument("--users", default=os.path.join(data_path, "users_data.json"))
+    args = parser.parse_args(argv)
+
+    for path in [args.books, args.users]:
+        if not os.path.exists(path):
+            print(f"Error: {path} does not exist.")
+            return 1
+    books, linked = migrate_ids(args.books, args.users)
+    print(f"Stored the ids of {books} books and linked {linked} loans to their books.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
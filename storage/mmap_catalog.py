@@ -0,0 +1,218 @@
+# Compact binary copy of the catalog that read-only worker processes open with mmap.
+# Every process maps the same file, so the operating system keeps one copy of it in
+# memory however many workers there are, and strings are only decoded when read.
+#
+# Layout, little endian:
+#   header   magic b"LMSCAT02", count u32, reserved u32, generation u64
+#   offsets  title, author and borrower tables of count + 1 u64 each, string i of a
+#            column is data[table[i]:table[i + 1]]
+#   ids      count u64 book ids
+#   sorted   count u32 row numbers sorted by normalized title, then the same by author
+#   flags    count bytes, bit 0 = available, bit 1 = has a borrower
+#   data     the UTF-8 strings of each column one after the other
+#
+# The writer replaces the file atomically and tells the workers with SIGHUP (see
+# publish_catalog); a MappedCatalog then maps the new file before its next lookup.
+
+import mmap
+import os
+import signal
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from models.book import Book
+from models.catalog import normalize
+from storage.base import CorruptDataError
+from utils.atomic import atomic_write
+from utils.validation import fuzzy_search
+
+MAGIC = b"LMSCAT02"
+HEADER = struct.Struct("<8sIIQ")
+AVAILABLE = 1
+HAS_BORROWER = 2
+COLUMNS = ("title", "author", "borrowed_by")
+
+
+# Method to get the generation of the catalog file at path, 0 if there is none
+def read_generation(path):
+    try:
+        with open(path, "rb") as file:
+            magic, _, _, generation = HEADER.unpack(file.read(HEADER.size))
+    except (OSError, struct.error):
+        return 0
+    return generation if magic == MAGIC else 0
+
+
+# Method to write books to path in the binary format, replacing the file atomically.
+# The generation goes up by one with every write so readers can tell versions apart
+def write_catalog(path, books, fsync=True):
+    books = list(books)
+    count = len(books)
+    blobs = []
+    tables = []
+    position = 0
+    for column in COLUMNS:
+        offsets = array("Q", [position])
+        blob = bytearray()
+        for book in books:
+            blob += (getattr(book, column) or "").encode("utf-8")
+            offsets.append(position + len(blob))
+        position += len(blob)
+        blobs.append(blob)
+        tables.append(offsets)
+
+    by_title = sorted(range(count), key=lambda row: normalize(books[row].title))
+    by_author = sorted(range(count), key=lambda row: normalize(books[row].author))
+    flags = bytes((AVAILABLE if book.status else 0) | (HAS_BORROWER if book.borrowed_by is not None else 0)
+                  for book in books)
+
+    parts = [HEADER.pack(MAGIC, count, 0, read_generation(path) + 1)]
+    parts += [table.tobytes() for table in tables]
+    parts.append(array("Q", (book.book_id or 0 for book in books)).tobytes())
+    parts += [array("I", by_title).tobytes(), array("I", by_author).tobytes(), flags]
+    parts += blobs
+    return atomic_write(path, b"".join(parts), fsync=fsync, backup=False)
+
+
+class MappedCatalog:
+    def __init__(self, path):
+        self.path = path
+        self._reload_requested = False
+        self._lock = threading.Lock()
+        self._open()
+
+    # Method to map the file, the previous mapping is freed once nothing uses it any more
+    def _open(self):
+        with open(self.path, "rb") as file:
+            self._inode = os.fstat(file.fileno()).st_ino
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        try:
+            magic, count, _, generation = HEADER.unpack_from(view)
+        except struct.error:
+            raise CorruptDataError(f"{self.path} is too short to be a catalog file")
+        if magic != MAGIC:
+            raise CorruptDataError(f"{self.path} is not a catalog file")
+
+        position = HEADER.size
+        tables = []
+        for _ in COLUMNS:
+            tables.append(view[position:position + 8 * (count + 1)].cast("Q"))
+            position += 8 * (count + 1)
+        self._ids = view[position:position + 8 * count].cast("Q")
+        position += 8 * count
+        self._by_title = view[position:position + 4 * count].cast("I")
+        position += 4 * count
+        self._by_author = view[position:position + 4 * count].cast("I")
+        position += 4 * count
+        self._flags = view[position:position + count]
+        self._data = view[position + count:]
+        if len(self._data) != tables[-1][count]:
+            raise CorruptDataError(f"{self.path} is truncated")
+        self._titles, self._authors, self._borrowers = tables
+        self.count = count
+        self.generation = generation
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.book(row)
+
+    # Method to get a string of the mapped file without copying it
+    def string_bytes(self, table, row):
+        return self._data[table[row]:table[row + 1]]
+
+    def title(self, row):
+        return str(self.string_bytes(self._titles, row), "utf-8")
+
+    def author(self, row):
+        return str(self.string_bytes(self._authors, row), "utf-8")
+
+    def status(self, row):
+        return bool(self._flags[row] & AVAILABLE)
+
+    def borrowed_by(self, row):
+        if self._flags[row] & HAS_BORROWER:
+            return str(self.string_bytes(self._borrowers, row), "utf-8")
+        return None
+
+    def book_id(self, row):
+        return self._ids[row]
+
+    # Method to build a Book from one row, a copy that doesn't change with the file
+    def book(self, row):
+        return Book(self.title(row), self.author(row), self.status(row), self.borrowed_by(row), self.book_id(row))
+
+    # Methods to get the rows with this exact title or author with a binary search
+    # of the sorted tables, in catalog order
+    def rows_by_title(self, title):
+        return self._rows(self._by_title, self.title, title)
+
+    def rows_by_author(self, author):
+        return self._rows(self._by_author, self.author, author)
+
+    @staticmethod
+    def _rows(table, column, value):
+        key = normalize(value)
+        start = bisect_left(table, key, key=lambda row: normalize(column(row)))
+        end = bisect_right(table, key, lo=start, key=lambda row: normalize(column(row)))
+        return sorted(table[start:end])
+
+    # Methods searching the same way as Library.search_by_title and search_by_author:
+    # exact matches first, otherwise every book whose field contains the query words
+    def search_by_title(self, title):
+        self.reload_if_requested()
+        title = title.strip()
+        rows = self.rows_by_title(title)
+        if rows:
+            return self.book(rows[0])
+        for row in range(self.count):
+            if fuzzy_search(title, self.title(row)):
+                return self.book(row)
+        return None
+
+    def search_by_author(self, author):
+        self.reload_if_requested()
+        author = author.strip()
+        rows = self.rows_by_author(author)
+        if not rows:
+            rows = [row for row in range(self.count) if fuzzy_search(author, self.author(row))]
+        return [self.book(row) for row in rows]
+
+    # Method to ask for the file to be mapped again before the next search, safe to call
+    # from a signal handler
+    def request_reload(self):
+        self._reload_requested = True
+
+    def reload_if_requested(self):
+        if self._reload_requested:
+            with self._lock:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+
+    # Method to map the file again if the writer replaced it, returns True if it did
+    def reload(self):
+        if os.stat(self.path).st_ino == self._inode:
+            return False
+        self._open()
+        return True
+
+
+# Method to reload the catalog whenever the process gets signum, SIGHUP by default
+def install_reload_signal(catalog, signum=None):
+    signum = signum or signal.SIGHUP
+    signal.signal(signum, lambda received, frame: catalog.request_reload())
+
+
+# Method to write the library's books to path and tell the worker processes to reload it
+def publish_catalog(library, path, worker_pids=(), signum=None):
+    library.export_catalog(path)
+    for pid in worker_pids:
+        try:
+            os.kill(pid, signum or signal.SIGHUP)
+        except ProcessLookupError:
+            pass # the worker has exited
@@ -0,0 +1,233 @@
+# Storage backend keeping books and users in an SQLite database
+
+import json
+import os
+import sqlite3
+from models.catalog import normalize
+from storage.base import StorageBackend, user_record
+
+# Version of the schema below, kept in PRAGMA user_version. Version 0 databases had one row
+# per title and author, enforced with a UNIQUE constraint, version 1 has a row per copy,
+# version 2 adds the loan times, version 3 the holds and version 4 the meta table
+SCHEMA_VERSION = 4
+
+# columns added after version 1, with the version that added them
+ADDED_COLUMNS = [
+    (2, "borrowed_at REAL"),
+    (2, "due_at REAL"),
+    (3, "holds TEXT NOT NULL DEFAULT '[]'"),
+    (3, "held_for TEXT"),
+    (3, "hold_until REAL"),
+]
+
+# the id column is the book id
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    author_key TEXT NOT NULL,
+    status INTEGER,
+    borrowed_by TEXT,
+    borrowed_at REAL,
+    due_at REAL,
+    holds TEXT NOT NULL DEFAULT '[]',
+    held_for TEXT,
+    hold_until REAL
+);
+CREATE INDEX IF NOT EXISTS books_key ON books (title_key, author_key);
+CREATE INDEX IF NOT EXISTS books_author ON books (author_key);
+CREATE INDEX IF NOT EXISTS books_borrower ON books (borrowed_by);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL,
+    borrowed_books TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+INSERT OR IGNORE INTO meta (key, value) SELECT 'next_id', coalesce(max(id), 0) + 1 FROM books;
+CREATE TRIGGER IF NOT EXISTS books_next_id AFTER INSERT ON books BEGIN
+    UPDATE meta SET value = max(value, NEW.id + 1) WHERE key = 'next_id';
+END;
+"""
+
+# the next book id is only ever raised, by the trigger above as books are inserted and
+# by full saves, so the ids of removed books are never handed out again
+RAISE_NEXT_ID = "UPDATE meta SET value = max(value, ?) WHERE key = 'next_id'"
+
+# the (title_key, author_key) index also serves lookups by title alone
+UPSERT_BOOK = """
+INSERT INTO books (id, title, author, title_key, author_key, status, borrowed_by, borrowed_at, due_at, holds,
+    held_for, hold_until)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET status = excluded.status, borrowed_by = excluded.borrowed_by,
+    borrowed_at = excluded.borrowed_at, due_at = excluded.due_at, holds = excluded.holds,
+    held_for = excluded.held_for, hold_until = excluded.hold_until
+"""
+
+# Statements copying a version 0 books table into the current one, the ids are kept
+UPGRADE_BOOKS = """
+ALTER TABLE books RENAME TO books_v0;
+DROP INDEX IF EXISTS books_author;
+DROP INDEX IF EXISTS books_borrower;
+""" + SCHEMA + """
+INSERT INTO books (id, title, author, title_key, author_key, status, borrowed_by)
+SELECT id, title, author, title_key, author_key, status, borrowed_by FROM books_v0;
+DROP TABLE books_v0;
+"""
+
+# columns read back into book records
+BOOK_COLUMNS = "id, title, author, status, borrowed_by, borrowed_at, due_at, holds, held_for, hold_until"
+
+UPSERT_USER = """
+INSERT INTO users (username, password, role, borrowed_books) VALUES (?, ?, ?, ?)
+ON CONFLICT (username) DO UPDATE SET password = excluded.password, role = excluded.role,
+    borrowed_books = excluded.borrowed_books
+"""
+
+
+class SqliteStorage(StorageBackend):
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self._bytes_written = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(db_path, check_same_thread=False) # Library serializes access with a lock
+        self.connection.row_factory = sqlite3.Row
+        self._upgrade()
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # Method to bring a database made by an older version up to the current schema
+    def _upgrade(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        has_books = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books'").fetchone()
+        if has_books and version < 1:
+            self.connection.executescript("BEGIN;" + UPGRADE_BOOKS + "COMMIT;")
+        elif has_books:
+            added = [f"ALTER TABLE books ADD COLUMN {column};" for since, column in ADDED_COLUMNS if since > version]
+            if added:
+                self.connection.executescript("BEGIN;" + "".join(added) + "COMMIT;")
+
+    # Method to count the data of a row handed to SQLite, reported by written_bytes: text as
+    # UTF-8 and 8 bytes per number. SQLite writes whole pages, so this is the size of the
+    # data stored, not of the disk writes
+    def _counted(self, row):
+        self._bytes_written += sum(len(value.encode("utf-8")) if isinstance(value, str) else 8
+                                   for value in row if value is not None)
+        return row
+
+    def written_bytes(self):
+        return self._bytes_written
+
+    @staticmethod
+    def _book_row(book):
+        return (book.book_id, book.title, book.author, normalize(book.title), normalize(book.author), book.status,
+                book.borrowed_by, book.borrowed_at, book.due_at, json.dumps(list(book.holds or ())), book.held_for,
+                book.hold_until)
+
+    @staticmethod
+    def _user_row(user):
+        return (user.username, user.password, user.role, json.dumps(user_record(user)["borrowed_books"]))
+
+    @staticmethod
+    def _book_data(row):
+        status = row["status"]
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "author": row["author"],
+            "status": None if status is None else bool(status),
+            "borrowed_by": row["borrowed_by"],
+            "borrowed_at": row["borrowed_at"],
+            "due_at": row["due_at"],
+            "holds": json.loads(row["holds"]),
+            "held_for": row["held_for"],
+            "hold_until": row["hold_until"]
+        }
+
+    # Method to load book records in the order they were added, one row at a time
+    def load_books(self):
+        rows = self.connection.execute(f"SELECT {BOOK_COLUMNS} FROM books ORDER BY id")
+        return (self._book_data(row) for row in rows)
+
+    # Method to load user records keyed by username
+    def load_users(self):
+        users_data = {}
+        for row in self.connection.execute("SELECT username, password, role, borrowed_books FROM users"):
+            users_data[row["username"]] = {
+                "password": row["password"],
+                "role": row["role"],
+                "borrowed_books": json.loads(row["borrowed_books"])
+            }
+        return users_data
+
+    def next_book_id(self):
+        return self.connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()[0]
+
+    # Method to replace every stored book
+    def save_books(self, books):
+        with self.connection:
+            self.connection.execute(RAISE_NEXT_ID, (self._next_id(),))
+            self.connection.execute("DELETE FROM books")
+            self.connection.executemany(UPSERT_BOOK, (self._counted(self._book_row(book)) for book in books))
+
+    # Method to replace every stored user
+    def save_users(self, users):
+        with self.connection:
+            self.connection.execute("DELETE FROM users")
+            self.connection.executemany(UPSERT_USER, (self._counted(self._user_row(user)) for user in users.values()))
+
+    # Methods to store a single change with one statement
+    def put_book(self, book):
+        with self.connection:
+            self.connection.execute(UPSERT_BOOK, self._counted(self._book_row(book)))
+
+    def put_books(self, books):
+        with self.connection:
+            self.connection.executemany(UPSERT_BOOK, (self._counted(self._book_row(book)) for book in books))
+
+    def delete_book(self, book):
+        with self.connection:
+            self.connection.execute("DELETE FROM books WHERE id = ?", (book.book_id,))
+
+    def put_user(self, user):
+        with self.connection:
+            self.connection.execute(UPSERT_USER, self._counted(self._user_row(user)))
+
+    # Method to write a group of changes in a single transaction
+    def write_batch(self, puts, deletes, users):
+        with self.connection:
+            self.connection.executemany(UPSERT_BOOK, (self._counted(self._book_row(book)) for book in puts))
+            self.connection.executemany("DELETE FROM books WHERE id = ?", ((book.book_id,) for book in deletes))
+            self.connection.executemany(UPSERT_USER, (self._counted(self._user_row(user)) for user in users))
+
+    def compact(self):
+        pass  # every change is already written in place
+
+    # Methods to query the database directly through its indexes, for tools reading the
+    # database. Library answers its lookups from the catalog it keeps in memory
+    def find_by_title(self, title):
+        rows = self.connection.execute(
+            f"SELECT {BOOK_COLUMNS} FROM books WHERE title_key = ? ORDER BY id", (normalize(title),))
+        return [self._book_data(row) for row in rows]
+
+    def find_by_author(self, author):
+        rows = self.connection.execute(
+            f"SELECT {BOOK_COLUMNS} FROM books WHERE author_key = ? ORDER BY id", (normalize(author),))
+        return [self._book_data(row) for row in rows]
+
+    def loans_for(self, username):
+        rows = self.connection.execute(
+            f"SELECT {BOOK_COLUMNS} FROM books WHERE borrowed_by = ? ORDER BY id", (username,))
+        return [self._book_data(row) for row in rows]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,79 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+from models.library import Library
+from utils.atomic import atomic_write, backup_path
+
+#Tests for atomic snapshot writes and recovery from corrupt files
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.books_path = os.path.join(self.temp_dir.name, "library_data.json")
+        self.users_path = os.path.join(self.temp_dir.name, "users_data.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # testing the new contents replace the file and the old ones become the backup
+    def test_atomic_write_keeps_backup(self):
+        atomic_write(self.books_path, "first")
+        atomic_write(self.books_path, "second", fsync=False)
+        with open(self.books_path) as file:
+            self.assertEqual(file.read(), "second")
+        with open(backup_path(self.books_path)) as file:
+            self.assertEqual(file.read(), "first")
+
+    # testing the size returned is the number of bytes written, not of characters
+    def test_atomic_write_bytes(self):
+        self.assertEqual(atomic_write(self.books_path, "Brontë", fsync=False), 7)
+        self.assertEqual(os.path.getsize(self.books_path), 7)
+        self.assertEqual(atomic_write(self.books_path, b"abc", fsync=False), 3)
+
+    # testing a failed write leaves the old file and no temporary files
+    def test_failed_write_leaves_old_file(self):
+        atomic_write(self.books_path, "first")
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                atomic_write(self.books_path, "second", backup=False)
+        with open(self.books_path) as file:
+            self.assertEqual(file.read(), "first")
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["library_data.json"])
+
+    # testing a corrupt books file is replaced by the last good snapshot
+    def test_recover_books(self):
+        library = Library(self.books_path, self.users_path)
+        library.add_book("Test Book 1", "Test Author")
+        library.add_book("Test Book 2", "Test Author")
+        with open(self.books_path, "w") as file:
+            file.write('[{"title": "Test Book 1", "author": "Test')
+
+        reloaded = Library(self.books_path, self.users_path)
+        self.assertEqual([book.title for book in reloaded.books], ["Test Book 1"])
+        self.assertTrue(os.path.exists(self.books_path + ".corrupt"))
+
+    # testing that a corrupt backup as well gives an empty library
+    def test_recover_books_corrupt_backup(self):
+        for path in [self.books_path, backup_path(self.books_path)]:
+            with open(path, "w") as file:
+                file.write("[{")
+        reloaded = Library(self.books_path, self.users_path)
+        self.assertEqual(reloaded.books, [])
+        with open(self.books_path) as file:
+            self.assertEqual(json.load(file)["books"], [])
+
+    # testing a corrupt users file is replaced by the last good snapshot
+    def test_recover_users(self):
+        library = Library(self.books_path, self.users_path)
+        library.register_user("user1", "password123")
+        library.register_user("user2", "password123")
+        with open(self.users_path, "w") as file:
+            file.write("{")
+
+        reloaded = Library(self.books_path, self.users_path)
+        self.assertEqual(list(reloaded.users), ["user1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,17 @@ class TestBook(unittest.TestCase):
         self.assertEqual(book.borrowed_by, "otheruser")  # Should remain with original borrower
         self.assertEqual(message, "The book Test Title is currently borrowed.")
 
+    # testing borrowing records when the book was lent and when it is due back
+    def test_borrow_due_date(self):
+        book = Book("Test Title", "Test Author", True)
+        book.borrow("testuser", now=1000.0, loan_days=7)
+        self.assertEqual((book.borrowed_at, book.due_at), (1000.0, 1000.0 + 7 * 86400))
+        self.assertFalse(book.is_overdue(1000.0 + 7 * 86400))
+        self.assertTrue(book.is_overdue(1001.0 + 7 * 86400))
+        book.return_book()
+        self.assertIsNone(book.due_at)
+        self.assertFalse(book.is_overdue(1e12))
+
     # testing returning a book that is borrowed
     def test_return_book(self):
         book = Book("Test Title", "Test Author", False, "testuser")
@@ -51,5 +62,12 @@ class TestBook(unittest.TestCase):
         self.assertTrue(book.status)  # Status should remain True
         self.assertEqual(message, "The book Test Title was not borrowed.")
 
+    # testing books use __slots__ instead of a per instance dict
+    def test_book_slots(self):
+        book = Book("Test Title", "Test Author", True)
+        self.assertFalse(hasattr(book, "__dict__"))
+        with self.assertRaises(AttributeError):
+            book.isbn = "123"
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import unittest
+from models.book import Book
+from models.catalog import BookView, Catalog, ColumnarCatalog
+
+#Tests for the Catalog class
+class TestCatalog(unittest.TestCase):
+    catalog_class = Catalog
+
+    def setUp(self):
+        self.catalog = self.catalog_class([
+            Book("Harry Potter", "J.K. Rowling", True),
+            Book("The Hobbit", "J.R.R. Tolkien", True),
+            Book("Casual Vacancy", "J.K. Rowling", True),
+        ])
+
+    # testing that the catalog keeps insertion order
+    def test_iteration_order(self):
+        titles = [book.title for book in self.catalog]
+        self.assertEqual(titles, ["Harry Potter", "The Hobbit", "Casual Vacancy"])
+
+    # testing exact title lookup ignores case
+    def test_by_title_case_insensitive(self):
+        books = self.catalog.by_title("  harry POTTER ")
+        self.assertEqual(len(books), 1)
+        self.assertEqual(books[0].author, "J.K. Rowling")
+
+    # testing author lookup returns books in catalog order
+    def test_by_author(self):
+        books = self.catalog.by_author("j.k. rowling")
+        self.assertEqual([book.title for book in books], ["Harry Potter", "Casual Vacancy"])
+
+    # testing that a duplicate title and author is rejected
+    def test_add_duplicate(self):
+        self.assertFalse(self.catalog.add(Book("HARRY POTTER", "j.k. rowling", True)))
+        self.assertEqual(len(self.catalog), 3)
+
+    # testing that removing a book clears it from every index
+    def test_remove(self):
+        book = self.catalog.find("The Hobbit", "J.R.R. Tolkien")
+        self.assertTrue(self.catalog.remove(book))
+        self.assertIsNone(self.catalog.find("The Hobbit", "J.R.R. Tolkien"))
+        self.assertEqual(self.catalog.by_title("The Hobbit"), [])
+        self.assertEqual(self.catalog.by_author("J.R.R. Tolkien"), [])
+        self.assertFalse(self.catalog.remove(book))
+
+    # testing fuzzy title search returns verified matches in catalog order
+    def test_fuzzy_by_title(self):
+        self.assertEqual([book.title for book in self.catalog.fuzzy_by_title("a")], ["Harry Potter", "Casual Vacancy"])
+        self.assertEqual([book.title for book in self.catalog.fuzzy_by_title("pot har")], ["Harry Potter"])
+        self.assertEqual(self.catalog.fuzzy_by_title("Potter Hobbit"), [])
+
+    # testing fuzzy author search after a book was removed
+    def test_fuzzy_by_author_after_remove(self):
+        self.catalog.remove(self.catalog.find("Harry Potter", "J.K. Rowling"))
+        books = self.catalog.fuzzy_by_author("rowling")
+        self.assertEqual([book.title for book in books], ["Casual Vacancy"])
+
+#Runs the same tests against the ColumnarCatalog
+    # testing offset pages
+    def test_page(self):
+        self.assertEqual([book.title for book in self.catalog.page(1, 1)], ["The Hobbit"])
+        self.assertEqual([book.title for book in self.catalog.page(1)], ["The Hobbit", "Casual Vacancy"])
+
+    # testing cursor pages don't skip books when an earlier book is removed between pages
+    def test_page_after(self):
+        page, cursor = self.catalog.page_after(-1, 2)
+        self.assertEqual([book.title for book in page], ["Harry Potter", "The Hobbit"])
+        self.catalog.remove(page[0])
+        self.catalog.add(Book("Dune", "Frank Herbert", True))
+        page, cursor = self.catalog.page_after(cursor, 2)
+        self.assertEqual([book.title for book in page], ["Casual Vacancy", "Dune"])
+        self.assertEqual(self.catalog.page_after(cursor, 2)[0], [])
+
+    # testing the borrower index follows loans, returns and removed books
+    def test_by_borrower(self):
+        catalog = self.catalog_class([Book("Dune", "Frank Herbert", False, "reader1")])
+        self.assertEqual([book.title for book in catalog.by_borrower("reader1")], ["Dune"])
+        catalog.add(Book("The Hobbit", "J.R.R. Tolkien", True))
+        hobbit = catalog.find("The Hobbit", "J.R.R. Tolkien")
+        hobbit.borrow("reader1")
+        catalog.lent(hobbit)
+        self.assertEqual([book.title for book in catalog.by_borrower("reader1")], ["Dune", "The Hobbit"])
+        catalog.remove(catalog.find("Dune", "Frank Herbert"))
+        hobbit.return_book()
+        catalog.returned(hobbit, "reader1")
+        self.assertEqual(catalog.by_borrower("reader1"), [])
+        self.assertEqual(catalog.loans(), {})
+
+    # testing the counters follow added, lent, returned and removed books
+    def test_counts(self):
+        self.assertEqual(self.catalog.counts(), {"total": 3, "titles": 3, "available": 3, "borrowed": 0, "borrowers": 0})
+        book = self.catalog.find("Harry Potter", "J.K. Rowling")
+        book.borrow("reader1")
+        self.catalog.lent(book)
+        self.catalog.add(Book("Dune", "Frank Herbert", False, "reader2"))
+        self.assertEqual(self.catalog.counts(), {"total": 4, "titles": 4, "available": 2, "borrowed": 2, "borrowers": 2})
+        self.assertEqual(self.catalog.author_counts("j.k. rowling"), {"books": 2, "borrowed": 1})
+        self.assertEqual(self.catalog.loan_counts(), {"reader1": 1, "reader2": 1})
+        self.catalog.remove(self.catalog.find("Dune", "Frank Herbert"))
+        book.return_book()
+        self.catalog.returned(book, "reader1")
+        self.assertEqual(self.catalog.counts(), {"total": 3, "titles": 3, "available": 3, "borrowed": 0, "borrowers": 0})
+        self.assertEqual(self.catalog.all_author_counts()["J.K. Rowling"], {"books": 2, "borrowed": 0})
+
+    # testing books get ids and several copies of a title can be kept
+    def test_ids_and_copies(self):
+        self.assertEqual([book.book_id for book in self.catalog], [1, 2, 3])
+        self.assertTrue(self.catalog.add(Book("The Hobbit", "J.R.R. Tolkien", True), copy=True))
+        self.assertFalse(self.catalog.add(Book("Dune", "Frank Herbert", True, book_id=2)))  # id already taken
+        copies = self.catalog.copies("the hobbit", "j.r.r. tolkien")
+        self.assertEqual([book.book_id for book in copies], [2, 4])
+        self.assertEqual(self.catalog.get(4).title, "The Hobbit")
+        self.assertTrue(self.catalog.remove(copies[0]))
+        self.assertIsNone(self.catalog.get(2))
+        self.assertEqual(self.catalog.find("The Hobbit", "J.R.R. Tolkien").book_id, 4)
+        self.assertEqual(self.catalog.counts()["titles"], 3)
+
+class TestColumnarCatalog(TestCatalog):
+    catalog_class = ColumnarCatalog
+
+    # testing books come back as views with the Book API
+    def test_views(self):
+        book = self.catalog.find("harry potter", "j.k. rowling")
+        self.assertIsInstance(book, BookView)
+        self.assertIsInstance(book, Book)
+        self.assertEqual(str(book), "Harry Potter by J.K. Rowling")
+
+    # testing borrowing through a view updates the columns
+    def test_borrow_through_view(self):
+        message = self.catalog.find("Harry Potter", "J.K. Rowling").borrow("testuser")
+        self.assertEqual(message, "The book Harry Potter has been successfully borrowed.")
+        book = self.catalog.find("Harry Potter", "J.K. Rowling")
+        self.assertFalse(book.status)
+        self.assertEqual(book.borrowed_by, "testuser")
+        self.assertTrue(self.catalog.find("Casual Vacancy", "J.K. Rowling").status)
+        book.return_book()
+        self.assertTrue(book.status)
+        self.assertIsNone(book.borrowed_by)
+
+    # testing authors are only stored once
+    def test_authors_interned(self):
+        self.assertEqual(len(self.catalog._authors), 2)
+
+if __name__ == '__main__':
+    unittest.main()
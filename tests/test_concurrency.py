@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from models.library import Library
+from models.session import Session
+from utils.passwords import PasswordHasher
+
+#Stress tests for using the library from many threads at once
+class TestConcurrency(unittest.TestCase):
+    columnar = False
+
+    # switch threads as often as possible so races actually happen
+    @classmethod
+    def setUpClass(cls):
+        cls.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.setswitchinterval(cls.switch_interval)
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.library = Library(os.path.join(self.temp_dir.name, "library_data.json"),
+                               os.path.join(self.temp_dir.name, "users_data.json"),
+                               journal=True, columnar=self.columnar,
+                               password_hasher=PasswordHasher(cost=4)) # logins aren't what is tested here
+        self.titles = [f"Test Title {n}" for n in range(5)]
+        self.library.add_books([(title, "Test Author") for title in self.titles])
+        self.sessions = []
+        for n in range(16):
+            self.library.register_user(f"user{n}", "password123")
+            success, session = self.library.create_session(f"user{n}", "password123")
+            self.assertTrue(success)
+            self.sessions.append(session)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # testing sessions are separate from the command line user
+    def test_create_session(self):
+        self.assertIsInstance(self.sessions[0], Session)
+        self.assertIsNone(self.library.current_user)
+        self.assertEqual(self.library.create_session("user0", "wrong"), (False, "Invalid username or password"))
+
+    # testing that every title is lent to exactly one of many competing sessions
+    def test_no_double_lending(self):
+        barrier = threading.Barrier(len(self.sessions))
+
+        def borrow_all(session):
+            barrier.wait() # start every thread at the same moment
+            return [session.borrow_book(title) for title in self.titles]
+
+        for _ in range(20):
+            with ThreadPoolExecutor(max_workers=len(self.sessions)) as pool:
+                results = list(pool.map(borrow_all, self.sessions))
+
+            successes = [message for messages in results for message in messages if "successfully" in message]
+            self.assertEqual(len(successes), len(self.titles))
+            lent = [title for session in self.sessions for title in session.borrowed_books]
+            self.assertEqual(sorted(lent), sorted(self.titles))
+            for book in self.library.books:
+                self.assertIn(book.title, self.library.users[book.borrowed_by].borrowed_books)
+                self.library.return_book(book.title, user=self.library.users[book.borrowed_by])
+
+    # testing repeated borrow and return cycles keep books and users consistent
+    def test_borrow_return_cycles(self):
+        def cycle(session):
+            for _ in range(20):
+                for title in self.titles:
+                    if "successfully" in session.borrow_book(title):
+                        session.return_book(title)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(cycle, self.sessions))
+
+        for book in self.library.books:
+            self.assertTrue(book.status)
+            self.assertIsNone(book.borrowed_by)
+        for session in self.sessions:
+            self.assertEqual(session.borrowed_books, [])
+
+        reloaded = Library(self.library.file_path, self.library.users_file_path, journal=True)
+        self.assertTrue(all(book.status for book in reloaded.books))
+
+#Runs the same stress tests against the columnar catalog
+class TestColumnarConcurrency(TestConcurrency):
+    columnar = True
+
+if __name__ == '__main__':
+    unittest.main()
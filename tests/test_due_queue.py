@@ -0,0 +1,39 @@
+import unittest
+from utils.due_queue import DueQueue
+
+#Tests for the DueQueue class
+class TestDueQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = DueQueue()
+        for key, due in [("a", 30.0), ("b", 10.0), ("c", 50.0), ("d", 20.0), ("e", 40.0)]:
+            self.queue.push(key, due)
+
+    # testing items come out in due order without being taken out of the queue
+    def test_due_order(self):
+        self.assertEqual(self.queue.due_before(30.5), [(10.0, "b"), (20.0, "d"), (30.0, "a")])
+        self.assertEqual(self.queue.due_before(30.0), [(10.0, "b"), (20.0, "d")])  # "a" isn't overdue yet
+        self.assertEqual(self.queue.due_before(30.0, limit=5), [(10.0, "b"), (20.0, "d")])
+        self.assertEqual(self.queue.first(2), [(10.0, "b"), (20.0, "d")])
+        self.assertEqual(len(self.queue), 5)
+        self.assertEqual(self.queue.due_before(100.0, limit=1), [(10.0, "b")])
+
+    # testing discarded items and old due times are skipped
+    def test_discard_and_move(self):
+        self.queue.discard("b")
+        self.queue.push("d", 45.0)
+        self.assertNotIn("b", self.queue)
+        self.assertEqual(self.queue.due("d"), 45.0)
+        self.assertEqual([key for _, key in self.queue.first(5)], ["a", "e", "d", "c"])
+
+    # testing the heap is rebuilt once it is mostly discarded entries
+    def test_compaction(self):
+        for n in range(100):
+            self.queue.push(n, float(n))
+        for n in range(100):
+            self.queue.discard(n)
+        self.assertLess(len(self.queue._heap), 30)
+        self.assertEqual(self.queue.first(1), [(10.0, "b")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from models.library import Library
+from storage.group_commit import GroupCommitStorage
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+#Tests for writing changes in groups on a background thread
+class TestGroupCommit(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.books_path = os.path.join(self.temp_dir.name, "library_data.json")
+        self.users_path = os.path.join(self.temp_dir.name, "users_data.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_library(self, interval=60, batch_size=1000, journal=False):
+        storage = GroupCommitStorage(JsonStorage(self.books_path, self.users_path, journal=journal),
+                                     interval=interval, batch_size=batch_size)
+        return Library(self.books_path, self.users_path, storage=storage)
+
+    def stored_titles(self):
+        with open(self.books_path) as file:
+            return [book["title"] for book in json.load(file)["books"]]
+
+    # testing changes wait for the interval until flush is called
+    def test_flush_is_a_durability_barrier(self):
+        library = self.open_library()
+        library.add_book("Test Book", "Test Author")
+        self.assertEqual(self.stored_titles(), [])
+        library.flush()
+        self.assertEqual(self.stored_titles(), ["Test Book"])
+        library.close()
+
+    # testing a full batch is written without waiting for the interval
+    def test_batch_size(self):
+        library = self.open_library(batch_size=2)
+        library.add_book("Test Book 1", "Test Author")
+        library.add_book("Test Book 2", "Test Author")
+        library.storage._writer.join(0.5)
+        self.assertEqual(self.stored_titles(), ["Test Book 1", "Test Book 2"])
+        library.close()
+
+    # testing close writes everything still pending
+    def test_close_writes_pending_changes(self):
+        library = self.open_library(journal=True)
+        library.register_user("testuser", "password123")
+        library.login("testuser", "password123")
+        library.add_book("Test Book", "Test Author")
+        library.borrow_book("Test Book")
+        library.close()
+
+        reloaded = Library(self.books_path, self.users_path, journal=True)
+        self.assertEqual(reloaded.books[0].borrowed_by, "testuser")
+        self.assertEqual(reloaded.users["testuser"].borrowed_books, ["Test Book"])
+
+    # testing many threads' changes end up in a few SQLite transactions
+    def test_concurrent_changes_sqlite(self):
+        db_path = os.path.join(self.temp_dir.name, "library.db")
+        library = Library(None, None, storage=GroupCommitStorage(SqliteStorage(db_path), interval=0.01))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda n: library.add_book(f"Test Book {n}", "Test Author"), range(200)))
+        library.flush()
+        self.assertEqual(len(library.storage.inner.find_by_author("Test Author")), 200)
+        library.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+import os
+import tempfile
+from interface.import_books import import_books, read_csv, read_jsonl
+from models.library import Library
+
+#Tests for the book import command
+class TestImportBooks(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.library = Library(os.path.join(self.temp_dir.name, "library_data.json"),
+                               os.path.join(self.temp_dir.name, "users_data.json"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    # testing CSV files with and without a header row
+    def test_read_csv(self):
+        with_header = self.write("books.csv", 'title,author\n"Dream Count, Vol 1",Khanya\n\nThe Hobbit,Tolkien\n')
+        without_header = self.write("plain.csv", "The Hobbit,Tolkien\n")
+        self.assertEqual(list(read_csv(with_header)), [{"title": "Dream Count, Vol 1", "author": "Khanya"},
+                                                       {"title": "The Hobbit", "author": "Tolkien"}])
+        self.assertEqual(list(read_csv(without_header)), [{"title": "The Hobbit", "author": "Tolkien"}])
+
+    # testing JSON Lines files, bad lines become invalid records
+    def test_read_jsonl(self):
+        path = self.write("books.jsonl", '{"title": "The Hobbit", "author": "Tolkien"}\nnot json\n')
+        self.assertEqual(list(read_jsonl(path)), [{"title": "The Hobbit", "author": "Tolkien"},
+                                                  {"title": "", "author": ""}])
+
+    # testing the whole import reports every record
+    def test_import_books(self):
+        path = self.write("books.jsonl", '{"title": "The Hobbit", "author": "Tolkien"}\n'
+                                         '{"title": "The Hobbit", "author": "Tolkien"}\n')
+        report = import_books(self.library, path)
+        self.assertEqual([result["status"] for result in report], ["added", "duplicate"])
+        self.assertEqual(len(self.library.books), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import atexit
+import os
+import pstats
+import tempfile
+from models.library import Library
+from storage.group_commit import GroupCommitStorage
+from storage.sqlite_storage import SqliteStorage
+from utils.instrumentation import Histogram, Metrics
+
+#Tests for the instrumentation of Library methods
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.metrics = Metrics()
+        self.library = Library(os.path.join(self.temp_dir.name, "library_data.json"),
+                               os.path.join(self.temp_dir.name, "users_data.json"), metrics=self.metrics)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # testing histogram buckets are counted cumulatively
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.001, 0.01))
+        for seconds in [0.0005, 0.005, 0.005, 1.0]:
+            histogram.observe(seconds)
+        self.assertEqual(histogram.cumulative(), [(0.001, 1), (0.01, 3), (float("inf"), 4)])
+        self.assertEqual(histogram.count, 4)
+
+    # testing calls, errors and bytes written are recorded
+    def test_instrumented_calls(self):
+        self.library.add_book("Test Book", "Test Author")
+        self.library.search_by_title("Test Book")
+        self.library.search_by_title("Other Book")
+        with self.assertRaises(AttributeError):
+            self.library.search_by_author(None)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot["methods"]["load_books"]["calls"], 1)
+        self.assertEqual(snapshot["methods"]["search_by_title"]["calls"], 2)
+        self.assertEqual(snapshot["methods"]["search_by_author"]["errors"], 1)
+        self.assertGreater(snapshot["bytes_written"], 0)
+
+    # testing the storage writes behind the library calls are timed on their own
+    def test_storage_calls(self):
+        self.library.add_book("Test Book", "Test Author")
+        self.library.register_user("testuser", "password123")
+        self.library.borrow_book("Test Book", user=self.library.users["testuser"])
+        methods = self.metrics.snapshot()["methods"]
+        self.assertEqual(methods["storage.put_book"]["calls"], 1)
+        self.assertEqual(methods["storage.put_user"]["calls"], 1)
+        self.assertEqual(methods["storage.write_batch"]["calls"], 1)
+
+    # testing the backend a group commit writes to is timed and SQLite reports the data it stored
+    def test_sqlite_group_commit(self):
+        metrics = Metrics()
+        storage = GroupCommitStorage(SqliteStorage(os.path.join(self.temp_dir.name, "library.db")))
+        library = Library(None, None, storage=storage, metrics=metrics)
+        try:
+            library.add_book("Test Book", "Test Author")
+            storage.flush()
+            snapshot = metrics.snapshot()
+            self.assertEqual(snapshot["methods"]["storage.put_book"]["calls"], 1)
+            self.assertEqual(snapshot["methods"]["storage.inner.write_batch"]["calls"], 1)
+            self.assertGreater(snapshot["bytes_written"], 0)
+        finally:
+            storage.close()
+            storage.inner.close()
+
+    # testing the Prometheus text format
+    def test_prometheus(self):
+        self.library.search_by_title("Test Book")
+        text = self.metrics.to_prometheus()
+        self.assertIn("# TYPE library_call_duration_seconds histogram", text)
+        self.assertIn('library_call_duration_seconds_bucket{method="search_by_title",le="+Inf"} 1', text)
+        self.assertIn('library_call_duration_seconds_count{method="search_by_title"} 1', text)
+        self.assertIn("library_storage_written_bytes_total", text)
+
+    # testing cProfile capture of the instrumented calls
+    def test_profile(self):
+        profile_path = os.path.join(self.temp_dir.name, "library.prof")
+        metrics = Metrics(profile_path=profile_path)
+        atexit.unregister(metrics.dump_profile) # the temporary directory is gone by then
+        library = Library(self.library.file_path, self.library.users_file_path, metrics=metrics)
+        library.add_book("Test Book", "Test Author")
+        metrics.dump_profile()
+        stats = pstats.Stats(profile_path)
+        self.assertTrue(any(function[2] == "add_book" for function in stats.stats))
+
+if __name__ == '__main__':
+    unittest.main()
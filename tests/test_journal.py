@@ -0,0 +1,148 @@
+import unittest
+import json
+import os
+from unittest import mock
+from models.library import Library
+from storage.json_storage import JsonStorage
+from utils.journal import Journal
+
+#Tests for the Journal class and the library journal mode
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.test_file_path = "test_library_data.json"
+        self.test_users_path = "test_users_data.json"
+        self.cleanup()
+
+    def tearDown(self):
+        self.cleanup()
+
+    def cleanup(self):
+        for file_path in [self.test_file_path, self.test_users_path]:
+            for path in [file_path, file_path + ".journal", file_path + ".bak"]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # testing records are read back in order
+    def test_append_and_replay(self):
+        journal = Journal(self.test_file_path + ".journal")
+        journal.append({"op": "put", "n": 1})
+        journal.append({"op": "del", "n": 2})
+        self.assertEqual(list(journal.replay()), [{"op": "put", "n": 1}, {"op": "del", "n": 2}])
+        self.assertEqual(len(journal), 2)
+
+    # testing appended records are synced to disk unless fsync is turned off
+    def test_fsync(self):
+        with mock.patch("os.fsync") as fsync:
+            Journal(self.test_file_path + ".journal").extend([{"n": 1}, {"n": 2}])
+            self.assertEqual(fsync.call_count, 1)
+            Journal(self.test_file_path + ".journal", fsync=False).append({"n": 3})
+            self.assertEqual(fsync.call_count, 1)
+            storage = JsonStorage(self.test_file_path, self.test_users_path, journal=True, fsync=False)
+            library = Library(self.test_file_path, self.test_users_path, storage=storage)
+            library.add_book("Test Book", "Test Author")
+            self.assertEqual(fsync.call_count, 1)
+
+    # testing a half written record is dropped and cut from the file
+    def test_replay_torn_record(self):
+        journal = Journal(self.test_file_path + ".journal")
+        journal.append({"n": 1})
+        with open(journal.path, "a") as file:
+            file.write('{"n": 2')
+        self.assertEqual(list(journal.replay()), [{"n": 1}])
+        journal.append({"n": 3})
+        self.assertEqual(list(journal.replay()), [{"n": 1}, {"n": 3}])
+
+    # testing that mutations are journaled instead of rewriting the snapshot
+    def test_library_mutations_are_journaled(self):
+        library = Library(self.test_file_path, self.test_users_path, journal=True)
+        library.add_book("Test Book", "Test Author")
+        library.add_book("Other Book", "Test Author")
+        library.register_user("testuser", "password123")
+        library.login("testuser", "password123")
+        library.borrow_book("Test Book")
+        library.remove_book("Other Book")
+
+        with open(self.test_file_path) as file:
+            self.assertEqual(json.load(file)["books"], [])
+        self.assertEqual(len(library.storage.books_journal), 4)
+
+        reloaded = Library(self.test_file_path, self.test_users_path, journal=True)
+        self.assertEqual([book.title for book in reloaded.books], ["Test Book"])
+        self.assertEqual(reloaded.books[0].borrowed_by, "testuser")
+        self.assertEqual(reloaded.users["testuser"].borrowed_books, ["Test Book"])
+
+    # testing a library opened without journal mode still sees journaled changes and folds them
+    # into its next save, so journal mode doesn't replay them over newer books later
+    def test_mixed_modes(self):
+        library = Library(self.test_file_path, self.test_users_path, journal=True)
+        library.add_book("Journal Book", "Test Author")
+        library.register_user("testuser", "password123")
+
+        plain = Library(self.test_file_path, self.test_users_path)
+        self.assertEqual([book.title for book in plain.books], ["Journal Book"])
+        self.assertIn("testuser", plain.users)
+        plain.add_book("Imported Book", "Test Author")
+        self.assertEqual([book.book_id for book in plain.books], [1, 2])
+        self.assertEqual(os.path.getsize(self.test_file_path + ".journal"), 0)
+
+        reloaded = Library(self.test_file_path, self.test_users_path, journal=True)
+        self.assertEqual([book.title for book in reloaded.books], ["Journal Book", "Imported Book"])
+        self.assertIn("testuser", reloaded.users)
+
+    # testing the snapshot is streamed with the journal applied book by book, new books last
+    def test_replay_streams_snapshot(self):
+        storage = JsonStorage(self.test_file_path, self.test_users_path, journal=True)
+        storage.books_journal.extend([
+            {"op": "put", "book": {"id": 2, "title": "Book 2", "author": "Test Author", "status": False}},
+            {"op": "put", "book": {"id": 5, "title": "Book 5", "author": "Test Author", "status": True}},
+            {"op": "del", "book": {"id": 3, "title": "Book 3", "author": "Test Author"}},
+        ])
+        read = []
+        def snapshot():
+            for book_id in range(1, 5):
+                read.append(book_id)
+                yield {"id": book_id, "title": f"Book {book_id}", "author": "Test Author", "status": True}
+
+        books = storage._replay_books(snapshot())
+        self.assertEqual(next(books)["id"], 1)
+        self.assertEqual(read, [1])
+        self.assertEqual([(book["id"], book["status"]) for book in books], [(2, False), (4, True), (5, True)])
+        self.assertEqual(storage.next_book_id(), 6)
+
+    # testing compaction folds the journal into the snapshot
+    def test_library_compaction(self):
+        library = Library(self.test_file_path, self.test_users_path, journal=True, compact_every=2)
+        library.add_book("Book One", "Test Author")
+        library.add_book("Book Two", "Test Author")
+        self.assertEqual(len(library.storage.books_journal), 0)
+        with open(self.test_file_path) as file:
+            self.assertEqual(len(json.load(file)["books"]), 2)
+
+        library.add_book("Book Three", "Test Author")
+        reloaded = Library(self.test_file_path, self.test_users_path, journal=True)
+        self.assertEqual(len(reloaded.books), 3)
+
+    # testing new copies and holds are journaled with one record per copy instead of a snapshot
+    def test_holds_are_journaled(self):
+        library = Library(self.test_file_path, self.test_users_path, journal=True)
+        library.add_book("Test Book", "Test Author")
+        library.add_copies("Test Book", "Test Author", 2)
+        self.assertEqual(len(library.storage.books_journal), 3)
+        library.register_user("testuser", "password123")
+        library.register_user("otheruser", "password123")
+        library.login("testuser", "password123")
+        for _ in range(3):
+            library.borrow_book("Test Book")
+        library.login("otheruser", "password123")
+        library.place_hold("Test Book")
+
+        with open(self.test_file_path) as file:
+            self.assertEqual(json.load(file)["books"], [])
+        self.assertEqual(len(library.storage.books_journal), 9)
+
+        reloaded = Library(self.test_file_path, self.test_users_path, journal=True)
+        self.assertEqual(reloaded.hold_queue("Test Book"), ["otheruser"])
+
+if __name__ == '__main__':
+    unittest.main()
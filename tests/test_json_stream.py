@@ -0,0 +1,50 @@
+import unittest
+import io
+import json
+from utils.json_stream import iter_json_array, iter_json_object_array
+
+#Tests for the streaming JSON array parser
+class TestJsonStream(unittest.TestCase):
+
+    # testing the items match json.loads for every chunk size
+    def test_matches_json_loads(self):
+        data = [{"title": "Dream Count", "author": "Khanya", "status": True, "borrowed_by": None},
+                12345, -0.25e-3, "text, with ] brackets", [1, 2], None, False]
+        for text in [json.dumps(data), json.dumps(data, indent=4)]:
+            for chunk_size in [1, 2, 5, 64]:
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), data)
+
+    # testing an empty array
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO("  [ ]  "))), [])
+
+    # testing that invalid documents raise JSONDecodeError
+    def test_invalid(self):
+        for text in ["", "{}", "[1, 2", "[1 2]", "[1,]", "[{]"]:
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json_array(io.StringIO(text), 2))
+
+    # testing the array stored under a key of an object, with the members before it
+    def test_object_array(self):
+        data = {"next_id": 12345, "name": "a, \"books\": [", "books": [{"n": n} for n in range(5)]}
+        for text in [json.dumps(data), json.dumps(data, indent=4), json.dumps(data["books"])]:
+            for chunk_size in [1, 3, 64]:
+                header = {}
+                items = list(iter_json_object_array(io.StringIO(text), "books", header, chunk_size))
+                self.assertEqual(items, data["books"])
+                if text.startswith("{"):
+                    self.assertEqual(header, {"next_id": 12345, "name": "a, \"books\": ["})
+        self.assertEqual(list(iter_json_object_array(io.StringIO(" {} "), "books", {})), [])
+        for text in ["", "{\"books\" [1]}", "{\"a\": 1 \"books\": []}", "{1: []}", "{\"a\": 1"]:
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json_object_array(io.StringIO(text), "books", {}, 2))
+
+    # testing items are produced before the whole file is read
+    def test_incremental(self):
+        stream = io.StringIO(json.dumps([{"n": n} for n in range(1000)]))
+        items = iter_json_array(stream, chunk_size=16)
+        self.assertEqual(next(items), {"n": 0})
+        self.assertLess(stream.tell(), 100)
+
+if __name__ == '__main__':
+    unittest.main()
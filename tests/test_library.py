@@ -3,7 +3,10 @@ from models.library import Library
 from models.user import User
 import json
 import os
+from unittest import mock
 from models.book import Book
+from storage.migrate_ids import migrate_ids
+from utils.passwords import PasswordHasher
 
 #Tests for the Library class
 class TestLibrary(unittest.TestCase):
@@ -22,8 +25,9 @@ class TestLibrary(unittest.TestCase):
     # cleans up the JSON files used for testing after each test
     def tearDown(self):
         for file_path in [self.test_file_path, self.test_users_path]:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            for path in [file_path, file_path + ".bak", file_path + ".corrupt"]:
+                if os.path.exists(path):
+                    os.remove(path)
 
     # testing adding a book to the library with validation
     def test_add_book(self):
@@ -50,6 +54,43 @@ class TestLibrary(unittest.TestCase):
         self.assertEqual(message, "Test Title by Test Author is already in this library.")
         self.assertEqual(len(self.library.books), 1)
 
+    # testing adding many books at once
+    def test_add_books(self):
+        self.library.add_book("Existing Title", "Test Author")
+        report = self.library.add_books([
+            ("Test Title 1", "Test Author"),
+            {"title": "Test Title 2", "author": "Test Author"},
+            ("existing title", "TEST AUTHOR"),
+            ("Test Title 1", "Test Author"),
+            ("", "Test Author"),
+        ])
+        self.assertEqual([result["status"] for result in report], ["added", "added", "duplicate", "duplicate", "invalid"])
+        self.assertEqual(report[4]["message"], "Error: Book title cannot be empty")
+        self.assertEqual(len(self.library.books), 3)
+        with open(self.test_file_path) as file:
+            self.assertEqual(len(json.load(file)["books"]), 3)
+
+    # testing malformed records are reported and books added before a failure are still saved
+    def test_add_books_malformed(self):
+        report = self.library.add_books([
+            ("Test Title 1", "Test Author"),
+            {"title": 42, "author": "Test Author"},
+            ("Test Title 2",),
+            ("Test Title 3", "Test Author", "extra"),
+            None,
+        ])
+        self.assertEqual([result["status"] for result in report], ["added", "invalid", "invalid", "invalid", "invalid"])
+        self.assertEqual(report[1]["message"], "Error: Book title and author must be text")
+        self.assertEqual(report[2]["message"], "Error: A record must have a title and an author")
+
+        def records():
+            yield ("Test Title 4", "Test Author")
+            raise OSError("read failed")
+        with self.assertRaises(OSError):
+            self.library.add_books(records())
+        with open(self.test_file_path) as file:
+            self.assertEqual(len(json.load(file)["books"]), 2)
+
     # testing removing book from the library
     def test_remove_book(self):
         self.library.add_book("Test Title", "Test Author")
@@ -57,6 +98,22 @@ class TestLibrary(unittest.TestCase):
         self.assertEqual(message, "Test Title has been successfully removed from the Library.")
         self.assertEqual(len(self.library.books), 0)
 
+    # testing a book removed after it was found isn't lent, held or returned, and stays removed
+    def test_removed_while_found(self):
+        self.library.add_book("Dune", "Frank Herbert")
+        self.library.register_user("alice", "password123")
+        alice = self.library.users["alice"]
+        stale = self.library.search_by_title("Dune")
+        self.library.remove_book("Dune")
+        with mock.patch.object(self.library, "search_by_title", return_value=stale):
+            self.assertEqual(self.library.borrow_book("Dune", user=alice), "Book not found in the library.")
+            self.assertEqual(self.library.place_hold("Dune", user=alice), "Book not found in the library.")
+            self.assertEqual(self.library.cancel_hold("Dune", user=alice), "Book not found in the library.")
+            self.assertEqual(self.library.return_book("Dune", user=alice), "The book Dune was not found.")
+        self.assertEqual(alice.borrowed_books, [])
+        reloaded = Library(self.test_file_path, self.test_users_path)
+        self.assertEqual(reloaded.books, [])
+
     # testing removing a book that does not exist
     def test_remove_nonexistent_book(self):
         message = self.library.remove_book("Non-existent Book")
@@ -81,6 +138,33 @@ class TestLibrary(unittest.TestCase):
         books = self.library.search_by_author("Rowling")
         self.assertEqual(len(books), 2)
 
+    # testing cached search results are dropped when books are added or removed
+    def test_search_cache(self):
+        self.library.add_book("Harry Potter and the Chamber of Secrets", "J.K. Rowling")
+        self.assertEqual(self.library.search_by_title("harry potter").title, "Harry Potter and the Chamber of Secrets")
+        self.library.add_book("Harry Potter", "J.K. Rowling")
+        self.assertEqual(self.library.search_by_title("harry potter").title, "Harry Potter")
+        self.library.remove_book("Harry Potter")
+        self.assertEqual(self.library.search_by_title("harry potter").title, "Harry Potter and the Chamber of Secrets")
+        self.assertEqual(len(self.library.search_by_author("rowling")), 1)
+        self.assertEqual(self.library.search_cache.stats()["misses"], 4)
+
+        # borrowing keeps the cached result, which shows the book's current status
+        self.library.register_user("testuser", "password123")
+        self.library.borrow_book("Harry Potter and the Chamber of Secrets", user=self.library.users["testuser"])
+        self.assertFalse(self.library.search_by_title("Harry Potter").status)
+        self.assertEqual(self.library.search_cache.stats()["hits"], 1)
+
+    # testing ranked search with a misspelled query
+    def test_search_ranked(self):
+        self.library.add_book("The Hobbit", "J.R.R. Tolkien")
+        self.library.add_book("Harry Potter", "J.K. Rowling")
+        results = self.library.search_ranked("tolkein", field="author")
+        self.assertEqual(results[0][0].title, "The Hobbit")
+        self.assertEqual(self.library.search_ranked("hary poter", k=1)[0][0].title, "Harry Potter")
+        with self.assertRaises(ValueError):
+            self.library.search_ranked("hobbit", field="isbn")
+
     # testing user registration
     def test_register_user(self):
         success, message = self.library.register_user("testuser", "password123")
@@ -115,6 +199,26 @@ class TestLibrary(unittest.TestCase):
         self.assertFalse(success)
         self.assertEqual(message, "Invalid username or password")
 
+    # testing passwords are saved hashed and hashed again at login when they were saved in
+    # plain text or with another work factor
+    def test_password_rehash(self):
+        self.library.register_user("testuser", "password123")
+        with open(self.test_users_path) as file:
+            self.assertTrue(json.load(file)["testuser"]["password"].startswith("scrypt$"))
+        with open(self.test_users_path, "w") as file:
+            json.dump({"olduser": {"password": "password123", "role": "reader", "borrowed_books": []}}, file)
+        library = Library(self.test_file_path, self.test_users_path, password_hasher=PasswordHasher(cost=4))
+        self.assertEqual(library.login("olduser", "password123"), (True, "Welcome olduser!"))
+        stored = library.users["olduser"].password
+        self.assertTrue(stored.startswith("scrypt$4$"))
+
+        library.password_hasher = PasswordHasher("pbkdf2_sha256", cost=1000)
+        self.assertEqual(library.login("olduser", "wrongpassword"), (False, "Invalid username or password"))
+        self.assertEqual(library.users["olduser"].password, stored)
+        self.assertEqual(library.login("olduser", "password123"), (True, "Welcome olduser!"))
+        with open(self.test_users_path) as file:
+            self.assertTrue(json.load(file)["olduser"]["password"].startswith("pbkdf2_sha256$1000$"))
+
     # testing borrowing a book with user tracking
     def test_borrow_book_with_user(self):
         self.library.register_user("testuser", "password123")
@@ -165,6 +269,194 @@ class TestLibrary(unittest.TestCase):
         message = self.library.return_book("Test Book")
         self.assertEqual(message, "You cannot return Test Book as it was borrowed by user1.")
 
+    # testing the loans of one user and of every user
+    def test_loans(self):
+        self.library.register_user("user1", "password123")
+        self.library.register_user("user2", "password123")
+        self.library.add_book("Book A", "Test Author")
+        self.library.add_book("Book B", "Test Author")
+        self.library.add_book("Book C", "Test Author")
+        self.library.borrow_book("Book B", user=self.library.users["user1"])
+        self.library.borrow_book("Book A", user=self.library.users["user1"])
+        self.library.borrow_book("Book C", user=self.library.users["user2"])
+        self.library.return_book("Book B", user=self.library.users["user1"])
+        self.assertEqual([book.title for book in self.library.loans_for_user("user1")], ["Book A"])
+        loans = self.library.all_loans()
+        self.assertEqual({username: [book.title for book in books] for username, books in loans.items()},
+                         {"user1": ["Book A"], "user2": ["Book C"]})
+
+    # testing copies of a title are lent one at a time and tracked by id
+    def test_copies(self):
+        self.library.register_user("user1", "password123")
+        self.library.register_user("user2", "password123")
+        self.library.register_user("user3", "password123")
+        self.assertEqual(self.library.add_copies("Test Book", "Test Author", 2),
+                         "2 copies of Test Book by Test Author added, the Library has 2.")
+        self.library.borrow_book("Test Book", user=self.library.users["user1"])
+        self.library.borrow_book("Test Book", user=self.library.users["user2"])
+        self.assertEqual(self.library.borrow_book("Test Book", user=self.library.users["user3"]),
+                         "All 2 copies of Test Book are currently borrowed.")
+        self.assertEqual(self.library.inventory("test book", "test author"), {"copies": 2, "available": 0})
+        self.assertEqual(self.library.users["user2"].book_ids(), [2])
+
+        self.library.return_book("Test Book", user=self.library.users["user2"])
+        self.assertEqual(self.library.get_book(2).status, True)
+        self.assertEqual(self.library.users["user1"].book_ids(), [1])
+        self.assertEqual(self.library.remove_copy(1), "Copy 1 of Test Book has been successfully removed from the Library.")
+        self.assertEqual(self.library.inventory("Test Book", "Test Author"), {"copies": 1, "available": 1})
+
+    # testing the id of a removed book isn't given to a new book after a restart
+    def test_ids_not_reused(self):
+        for journal in [False, True]:
+            os.remove(self.test_file_path)
+            library = Library(self.test_file_path, self.test_users_path, journal=journal)
+            library.add_book("Book A", "Test Author")
+            library.add_book("Book B", "Test Author")
+            library.remove_book("Book B")
+            reloaded = Library(self.test_file_path, self.test_users_path, journal=journal)
+            reloaded.add_book("Book C", "Test Author")
+            self.assertEqual([book.book_id for book in reloaded.books], [1, 3])
+            reloaded.compact()
+            self.assertEqual(Library(self.test_file_path, self.test_users_path).catalog.next_id, 4)
+        for path in [self.test_file_path + ".journal", self.test_users_path + ".journal"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    # testing ids are saved and loans saved by title are linked to their book by the migration
+    def test_book_ids_migration(self):
+        with open(self.test_file_path, "w") as file:
+            json.dump([{"title": "Book A", "author": "Test Author", "status": True, "borrowed_by": None},
+                       {"title": "Book B", "author": "Test Author", "status": False, "borrowed_by": "user1"}], file)
+        with open(self.test_users_path, "w") as file:
+            json.dump({"user1": {"password": "password123", "role": "reader", "borrowed_books": ["Book B"]}}, file)
+        self.assertEqual(migrate_ids(self.test_file_path, self.test_users_path), (2, 1))
+
+        with open(self.test_file_path) as file:
+            self.assertEqual([record["id"] for record in json.load(file)["books"]], [1, 2])
+        with open(self.test_users_path) as file:
+            self.assertEqual(json.load(file)["user1"]["borrowed_books"], [{"id": 2, "title": "Book B"}])
+        library = Library(self.test_file_path, self.test_users_path)
+        self.assertEqual(library.users["user1"].book_ids(), [2])
+        self.assertEqual(library.return_book("Book B", user=library.users["user1"]),
+                         "You have successfully returned the book Book B.")
+        self.assertEqual(library.users["user1"].loans(), [])
+
+    # testing due dates are kept with the loans and overdue books are found in due order
+    def test_due_dates(self):
+        self.library.clock = lambda: 0.0
+        self.library.loan_days = 10
+        self.library.register_user("user1", "password123")
+        for title in ["Book A", "Book B", "Book C"]:
+            self.library.add_book(title, "Test Author")
+        user = self.library.users["user1"]
+        self.library.borrow_book("Book B", user=user)
+        self.library.clock = lambda: 86400.0
+        self.library.borrow_book("Book A", user=user)
+        self.library.borrow_book("Book C", user=user)
+        self.library.return_book("Book C", user=user)
+
+        self.assertEqual([book.title for book in self.library.next_due()], ["Book B", "Book A"])
+        self.assertEqual([book.title for book in self.library.overdue_books(now=10.5 * 86400)], ["Book B"])
+        self.assertEqual(self.library.overdue_books(now=10 * 86400), []) # due back exactly now, like is_overdue
+        self.assertEqual(self.library.overdue_books(now=10 * 86400, limit=1), [])
+        reloaded = Library(self.test_file_path, self.test_users_path, columnar=True)
+        self.assertEqual(reloaded.search_by_title("Book A").due_at, 11 * 86400.0)
+        self.assertEqual([book.title for book in reloaded.overdue_books(now=12 * 86400)], ["Book B", "Book A"])
+
+    # testing the sweep writes one notice per overdue loan to the outbox
+    def test_overdue_sweep(self):
+        outbox_path = self.test_file_path + ".outbox"
+        self.addCleanup(os.remove, outbox_path)
+        self.library.clock = lambda: 0.0
+        self.library.register_user("user1", "password123")
+        self.library.add_book("Book A", "Test Author")
+        self.library.borrow_book("Book A", user=self.library.users["user1"])
+
+        sweeper = self.library.start_overdue_sweep(outbox_path, interval=3600.0)
+        self.library.close()
+        self.assertEqual(sweeper.sweep(now=20 * 86400), 1)
+        self.assertEqual(sweeper.sweep(now=21 * 86400), 0)
+        with open(outbox_path) as file:
+            notices = [json.loads(line) for line in file]
+        self.assertEqual([(notice["title"], notice["username"], notice["days_overdue"]) for notice in notices],
+                         [("Book A", "user1", 6)])
+        restarted = Library(self.test_file_path, self.test_users_path).start_overdue_sweep(outbox_path)
+        restarted.stop()
+        self.assertEqual(restarted.sweep(now=22 * 86400), 0)
+
+    # testing holds are handed out in order as copies come back and pass on when they run out
+    def test_holds(self):
+        self.library.clock = lambda: 0.0
+        self.library.hold_days = 2
+        for username in ["user1", "user2", "user3"]:
+            self.library.register_user(username, "password123")
+        user1, user2, user3 = (self.library.users[username] for username in ["user1", "user2", "user3"])
+        self.library.add_book("Test Book", "Test Author")
+        self.assertEqual(self.library.place_hold("Test Book", user=user2),
+                         "Test Book is available, you can borrow it now.")
+        self.library.borrow_book("Test Book", user=user1)
+        self.assertEqual(self.library.place_hold("Test Book", user=user2), "You are number 1 in the queue for Test Book.")
+        self.assertEqual(self.library.place_hold("Test Book", user=user3), "You are number 2 in the queue for Test Book.")
+        self.assertEqual(self.library.place_hold("Test Book", user=user3),
+                         "You are already number 2 in the queue for Test Book.")
+
+        self.assertEqual(self.library.return_book("Test Book", user=user1),
+                         "You have successfully returned the book Test Book. It is now held for user2.")
+        self.assertEqual(self.library.borrow_book("Test Book", user=user3),
+                         "Test Book is held for another reader, you can place a hold to join the queue.")
+        self.assertEqual(self.library.hold_queue("Test Book"), ["user3"])
+
+        reloaded = Library(self.test_file_path, self.test_users_path, columnar=True)
+        book = reloaded.search_by_title("Test Book")
+        self.assertEqual((book.held_for, book.hold_until, reloaded.hold_queue("Test Book")), ("user2", 2 * 86400.0, ["user3"]))
+        self.assertEqual(reloaded.expire_holds(now=3 * 86400), 1) # user2 didn't come
+        self.assertEqual(book.held_for, "user3")
+        self.assertEqual(reloaded.cancel_hold("Test Book", user=reloaded.users["user3"]),
+                         "Your hold on Test Book has been cancelled.")
+        self.assertEqual((book.held_for, reloaded.hold_queue("Test Book")), (None, []))
+        self.assertEqual(reloaded.borrow_book("Test Book", user=reloaded.users["user1"]),
+                         "The book Test Book has been successfully borrowed.")
+
+    # testing a hold is collected by its reader and new copies go to the queue
+    def test_hold_collected(self):
+        for columnar in [False, True]:
+            with self.subTest(columnar=columnar):
+                os.remove(self.test_file_path)
+                library = Library(self.test_file_path, self.test_users_path, columnar=columnar)
+                for username in ["user1", "user2", "user3"]:
+                    library.register_user(username, "password123")
+                user1, user2, user3 = (library.users[username] for username in ["user1", "user2", "user3"])
+                library.add_book("Test Book", "Test Author")
+                library.borrow_book("Test Book", user=user1)
+                library.place_hold("Test Book", user=user2)
+                library.place_hold("Test Book", user=user3)
+                library.return_book("Test Book", user=user1)
+                library.borrow_book("Test Book", user=user2)
+                self.assertEqual(library.search_by_title("Test Book").held_for, None)
+                self.assertEqual(library.ready_holds(), [])
+
+                library.add_copies("Test Book", "Test Author")
+                self.assertEqual([book.held_for for book in library.ready_holds()], ["user3"])
+                self.assertEqual(library.hold_queue("Test Book"), [])
+                self.assertEqual(library.borrow_book("Test Book", user=user1),
+                                 "Test Book is held for another reader, you can place a hold to join the queue.")
+                reloaded = Library(self.test_file_path, self.test_users_path, columnar=columnar)
+                self.assertEqual([book.held_for for book in reloaded.ready_holds()], ["user3"])
+
+    # testing the statistics follow borrowing and removing books
+    def test_stats(self):
+        self.library.register_user("user1", "password123")
+        self.library.add_book("Book A", "Test Author")
+        self.library.add_book("Book B", "Test Author")
+        self.library.borrow_book("Book A", user=self.library.users["user1"])
+        stats = self.library.stats(details=True)
+        self.assertEqual((stats["total"], stats["available"], stats["borrowed"], stats["users"]), (2, 1, 1, 1))
+        self.assertEqual(stats["loans_per_user"], {"user1": 1})
+        self.assertEqual(self.library.author_stats("Test Author"), {"books": 2, "borrowed": 1})
+        self.library.remove_book("Book A")
+        self.assertEqual(self.library.stats()["borrowed"], 0)
+        self.assertEqual(self.library.loan_count("user1"), 0)
+
     # testing display books with borrower information
     def test_display_books_with_borrower(self):
         self.library.register_user("testuser", "password123")
@@ -177,6 +469,69 @@ class TestLibrary(unittest.TestCase):
         self.assertIn("Test Title 1 by Test Author - Borrowed by testuser", message)
         self.assertIn("Test Title 2 by Test Author - Available", message)
 
+    # testing displaying one page of books and streaming every row
+    def test_display_books_paginated(self):
+        for n in range(1, 6):
+            self.library.add_book(f"Test Title {n}", "Test Author")
+        self.assertEqual(self.library.display_books(2, 2),
+                         "3. Test Title 3 by Test Author - Available\n4. Test Title 4 by Test Author - Available")
+        self.assertEqual(self.library.display_books(5, 2), "There are no more books to display.")
+        rows = list(self.library.iter_display_books(page_size=2))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[-1], "5. Test Title 5 by Test Author - Available")
+
+    # testing that a lazy library only reads the books file on first use
+    def test_lazy_loading(self):
+        self.library.add_book("Test Title", "Test Author")
+        library = Library(self.test_file_path, self.test_users_path, lazy=True)
+        self.assertIsNone(library._catalog)
+        self.assertEqual(library.search_by_title("Test Title").author, "Test Author")
+        self.assertEqual(len(library.books), 1)
+        self.assertIn("books", library.load_times)
+
+    # testing that a lazy library only reads the users file at the first login
+    def test_lazy_users(self):
+        self.library.register_user("testuser", "password123")
+        library = Library(self.test_file_path, self.test_users_path, lazy=True)
+        self.assertIsNone(library._users)
+        self.assertNotIn("users", library.load_times)
+        success, _ = library.login("testuser", "password123")
+        self.assertTrue(success)
+        self.assertIn("users", library.load_times)
+
+    # testing searches on a sharded library
+    def test_sharded_library(self):
+        library = Library(self.test_file_path, self.test_users_path, shards=2)
+        library.catalog.parallel_min = 0
+        try:
+            library.add_book("Test Title 1", "J.K. Rowling")
+            library.add_book("Test Title 2", "J.K. Rowling")
+            self.assertEqual(len(library.search_by_author("j k")), 2)
+        finally:
+            library.close()
+        with self.assertRaises(ValueError):
+            Library(self.test_file_path, self.test_users_path, shards=2, columnar=True)
+
+    # testing that a corrupted books file loads as an empty library
+    def test_load_corrupted_file(self):
+        with open(self.test_file_path, "w") as file:
+            file.write('[{"title": "Test Title", "author": "Test Author", "status": true}, {"title": ')
+        library = Library(self.test_file_path, self.test_users_path)
+        self.assertEqual(library.books, [])
+
+    # testing borrowing and reloading with the columnar catalog
+    def test_columnar_library(self):
+        self.library.register_user("testuser", "password123")
+        self.library.add_book("Test Title 1", "Test Author")
+        self.library.add_book("Test Title 2", "Test Author")
+        library = Library(self.test_file_path, self.test_users_path, columnar=True)
+        library.login("testuser", "password123")
+        self.assertEqual(library.borrow_book("Test Title 2"), "The book Test Title 2 has been successfully borrowed.")
+        self.assertEqual(library.remove_book("Test Title 1"), "Test Title 1 has been successfully removed from the Library.")
+
+        reloaded = Library(self.test_file_path, self.test_users_path, columnar=True)
+        self.assertEqual(reloaded.display_books(), "1. Test Title 2 by Test Author - Borrowed by testuser")
+
     # testing logout
     def test_logout(self):
         self.library.register_user("testuser", "password123")
@@ -0,0 +1,80 @@
+import unittest
+import os
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from models.book import Book
+from models.library import Library
+from storage.base import CorruptDataError
+from storage.mmap_catalog import MappedCatalog, install_reload_signal, publish_catalog, read_generation, write_catalog
+
+
+def search_in_worker(path, title):
+    return MappedCatalog(path).search_by_title(title).author
+
+#Tests for the memory mapped binary catalog
+class TestMappedCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "catalog.bin")
+        self.books = [
+            Book("Harry Potter", "J.K. Rowling", True, book_id=1),
+            Book("The Hobbit", "J.R.R. Tolkien", False, "reader1", 2),
+            Book("Casual Vacancy", "J.K. Rowling", True, book_id=3),
+            Book("Cien años de soledad", "Gabriel García Márquez", True, book_id=5),
+        ]
+        write_catalog(self.path, self.books, fsync=False)
+        self.catalog = MappedCatalog(self.path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # testing every field is read back in catalog order
+    def test_read_back(self):
+        self.assertEqual(len(self.catalog), 4)
+        for original, book in zip(self.books, self.catalog):
+            self.assertEqual((book.title, book.author, book.status, book.borrowed_by, book.book_id),
+                             (original.title, original.author, original.status, original.borrowed_by, original.book_id))
+        self.assertEqual(bytes(self.catalog.string_bytes(self.catalog._titles, 3)), "Cien años de soledad".encode())
+
+    # testing exact lookups ignore case and fuzzy searches match words
+    def test_search(self):
+        self.assertEqual(self.catalog.search_by_title("the hobbit").borrowed_by, "reader1")
+        self.assertEqual(self.catalog.search_by_title("vacancy").title, "Casual Vacancy")
+        self.assertIsNone(self.catalog.search_by_title("Twilight"))
+        self.assertEqual([book.title for book in self.catalog.search_by_author("j.k. rowling")],
+                         ["Harry Potter", "Casual Vacancy"])
+        self.assertEqual(len(self.catalog.search_by_author("garcía")), 1)
+
+    # testing a file that isn't a catalog is refused
+    def test_corrupt_file(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a catalog")
+        with self.assertRaises(CorruptDataError):
+            MappedCatalog(self.path)
+
+    # testing a worker process reads the same file
+    def test_worker_process(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            self.assertEqual(executor.submit(search_in_worker, self.path, "Hobbit").result(), "J.R.R. Tolkien")
+
+    # testing a published catalog is picked up after the reload signal
+    @unittest.skipUnless(hasattr(signal, "SIGHUP"), "needs SIGHUP")
+    def test_publish_and_reload(self):
+        library = Library(os.path.join(self.temp_dir.name, "library_data.json"),
+                          os.path.join(self.temp_dir.name, "users_data.json"))
+        library.add_book("Dune", "Frank Herbert")
+        previous = signal.getsignal(signal.SIGHUP)
+        try:
+            install_reload_signal(self.catalog)
+            publish_catalog(library, self.path, worker_pids=[os.getpid()])
+        finally:
+            signal.signal(signal.SIGHUP, previous)
+        self.assertEqual(self.catalog.search_by_title("Dune").author, "Frank Herbert")
+        self.assertEqual(len(self.catalog), len(library.books))
+        self.assertEqual(self.catalog.generation, read_generation(self.path))
+        self.assertEqual(self.catalog.generation, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from utils.passwords import PasswordHasher
+
+#Tests for the PasswordHasher class
+class TestPasswordHasher(unittest.TestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(cost=4)
+
+    # testing a hash verifies its own password only and is salted
+    def test_hash_and_verify(self):
+        stored = self.hasher.hash("password123")
+        self.assertTrue(stored.startswith("scrypt$4$8$1$"))
+        self.assertTrue(self.hasher.verify("password123", stored))
+        self.assertFalse(self.hasher.verify("password124", stored))
+        self.assertNotEqual(stored, self.hasher.hash("password123"))
+
+    # testing PBKDF2 hashes record their iterations
+    def test_pbkdf2(self):
+        hasher = PasswordHasher("pbkdf2_sha256", cost=1000)
+        stored = hasher.hash("password123")
+        self.assertEqual(hasher.parse(stored)[:2], ("pbkdf2_sha256", (1000,)))
+        self.assertTrue(hasher.verify("password123", stored))
+        self.assertTrue(self.hasher.verify("password123", stored)) # checked with its own settings
+
+    # testing plain text passwords and hashes with other settings need a rehash
+    def test_needs_rehash(self):
+        self.assertTrue(self.hasher.verify("password123", "password123"))
+        self.assertTrue(self.hasher.needs_rehash("password123"))
+        self.assertFalse(self.hasher.needs_rehash(self.hasher.hash("password123")))
+        self.assertTrue(PasswordHasher(cost=5).needs_rehash(self.hasher.hash("password123")))
+        self.assertTrue(PasswordHasher("pbkdf2_sha256").needs_rehash(self.hasher.hash("password123")))
+        with self.assertRaises(ValueError):
+            PasswordHasher("md5")
+
+    # testing verified passwords are cached when a cache size is given
+    def test_cache(self):
+        hasher = PasswordHasher(cost=4, cache_size=10)
+        stored = hasher.hash("password123")
+        self.assertTrue(hasher.verify("password123", stored))
+        self.assertTrue(hasher.verify("password123", stored))
+        self.assertFalse(hasher.verify("wrong", stored))
+        self.assertEqual(hasher.cache.stats()["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
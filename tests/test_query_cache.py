@@ -0,0 +1,63 @@
+import unittest
+from utils.query_cache import MISSING, QueryCache
+
+#Tests for the QueryCache class
+class TestQueryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = QueryCache(maxsize=2, ttl=10.0, clock=lambda: self.now)
+
+    # testing a cached value is returned and counted as a hit
+    def test_hit_and_miss(self):
+        self.assertIs(self.cache.get("harry"), MISSING)
+        self.cache.put("harry", ["Harry Potter"])
+        self.assertEqual(self.cache.get("harry"), ["Harry Potter"])
+        self.assertEqual((self.cache.stats()["hits"], self.cache.stats()["misses"]), (1, 1))
+
+    # testing the least recently used value is evicted first
+    def test_lru_eviction(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertIs(self.cache.get("b"), MISSING)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    # testing values expire after the time to live
+    def test_ttl(self):
+        self.cache.put("a", 1)
+        self.now = 9.9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.now = 10.0
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertEqual(len(self.cache), 0)
+
+    # testing invalidate makes every value stale
+    def test_invalidate(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", None)
+        self.cache.invalidate()
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.assertIs(self.cache.get("b"), MISSING)
+        self.cache.put("a", 2)
+        self.assertEqual(self.cache.get("a"), 2)
+
+    # testing a value computed before an invalidate is not cached
+    def test_put_stale_generation(self):
+        generation = self.cache.generation
+        self.cache.invalidate()
+        self.cache.put("a", 1, generation)
+        self.assertIs(self.cache.get("a"), MISSING)
+        self.cache.put("a", 2, self.cache.generation)
+        self.assertEqual(self.cache.get("a"), 2)
+
+    # testing a cache of size 0 keeps nothing
+    def test_disabled(self):
+        cache = QueryCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertIs(cache.get("a"), MISSING)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from utils.search_index import NgramIndex
+
+#Tests for the NgramIndex class
+class TestNgramIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NgramIndex()
+        self.index.add(1, "Harry Potter and the Philosopher's Stone")
+        self.index.add(2, "The Hobbit")
+        self.index.add(3, "Harry Harrison Omnibus")
+
+    # testing that every query word has to appear
+    def test_candidates_all_words(self):
+        self.assertEqual(self.index.candidates("harry stone"), {1})
+
+    # testing partial words are found like in fuzzy_search
+    def test_candidates_substring(self):
+        self.assertEqual(self.index.candidates("ARRY"), {1, 3})
+
+    # testing a query with no matching n-gram
+    def test_candidates_no_match(self):
+        self.assertEqual(self.index.candidates("Twilight"), set())
+
+    # testing that short queries can't use the index
+    def test_candidates_short_query(self):
+        self.assertIsNone(self.index.candidates("to"))
+
+    # testing removing a document from the index
+    def test_remove(self):
+        self.index.remove(3, "Harry Harrison Omnibus")
+        self.assertEqual(self.index.candidates("harry"), {1})
+        self.assertEqual(self.index.candidates("omnibus"), set())
+
+    # testing that ranking finds misspelled queries
+    def test_rank_typo(self):
+        results = self.index.rank("hobit", k=3)
+        self.assertEqual(results[0][1], 2)
+
+    # testing that ranking returns at most k results with the best match first
+    def test_rank_top_k(self):
+        results = self.index.rank("harry potter", k=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual([doc_id for _, doc_id in results], [1, 3])
+        self.assertGreater(results[0][0], results[1][0])
+
+    # testing that removed documents are no longer ranked
+    def test_rank_removed(self):
+        self.index.remove(2, "The Hobbit")
+        self.assertEqual(self.index.rank("hobbit"), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from benchmarks.load_http import HttpConnection
+from interface.server import LibraryServer
+from models.library import Library
+from utils.instrumentation import Metrics
+
+#Tests for the HTTP/JSON service
+class TestServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.library = Library(os.path.join(self.temp_dir.name, "library_data.json"),
+                               os.path.join(self.temp_dir.name, "users_data.json"))
+        self.library.add_book("Test Book", "Test Author")
+        self.library.register_user("testuser", "password123")
+        self.server = LibraryServer(self.library, workers=2)
+        self.listener = await self.server.start("127.0.0.1", 0)
+        self.connection = HttpConnection("127.0.0.1", self.listener.sockets[0].getsockname()[1])
+        await self.connection.open()
+
+    async def asyncTearDown(self):
+        self.connection.close()
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.server.close()
+        self.temp_dir.cleanup()
+
+    async def login(self, username, password):
+        status, payload = await self.connection.request("POST", "/login", {"username": username, "password": password})
+        self.assertEqual(status, 200)
+        return payload["token"]
+
+    # testing searches by title and author
+    async def test_search(self):
+        status, payload = await self.connection.request("GET", "/search/title?q=test%20bo")
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["book"]["title"], "Test Book")
+        status, payload = await self.connection.request("GET", "/search/author?q=Nobody")
+        self.assertEqual(status, 404)
+
+    # testing a reader can borrow and return over one keep-alive connection
+    async def test_borrow_and_return(self):
+        token = await self.login("testuser", "password123")
+        status, payload = await self.connection.request("POST", "/borrow", {"title": "Test Book"}, token)
+        self.assertEqual(payload["message"], "The book Test Book has been successfully borrowed.")
+        self.assertEqual(self.library.search_by_title("Test Book").borrowed_by, "testuser")
+        status, payload = await self.connection.request("POST", "/return", {"title": "Test Book"}, token)
+        self.assertEqual(payload["message"], "You have successfully returned the book Test Book.")
+        self.assertIsNone(self.library.current_user)
+
+    # testing readers see their own loans and the librarian sees every loan
+    async def test_loans(self):
+        token = await self.login("testuser", "password123")
+        await self.connection.request("POST", "/borrow", {"title": "Test Book"}, token)
+        status, payload = await self.connection.request("GET", "/loans", token=token)
+        self.assertEqual([book["title"] for book in payload["loans"]["testuser"]], ["Test Book"])
+        librarian = await self.login("admin", "admin")
+        status, payload = await self.connection.request("GET", "/loans", token=librarian)
+        self.assertEqual(list(payload["loans"]), ["testuser"])
+        status, payload = await self.connection.request("GET", "/stats?details=1", token=librarian)
+        self.assertEqual((payload["borrowed"], payload["loans_per_user"]), (1, {"testuser": 1}))
+
+    # testing the librarian can list overdue loans
+    async def test_overdue(self):
+        token = await self.login("testuser", "password123")
+        await self.connection.request("POST", "/borrow", {"title": "Test Book"}, token)
+        status, _ = await self.connection.request("GET", "/overdue", token=token)
+        self.assertEqual(status, 403)
+        self.library.clock = lambda: self.library.search_by_title("Test Book").due_at + 1
+        librarian = await self.login("admin", "admin")
+        status, payload = await self.connection.request("GET", "/overdue?limit=10", token=librarian)
+        self.assertEqual([book["title"] for book in payload["overdue"]], ["Test Book"])
+        self.assertEqual(payload["next_due"][0]["borrowed_by"], "testuser")
+
+    # testing readers join and leave the queue for a borrowed book
+    async def test_holds(self):
+        self.library.register_user("otheruser", "password123")
+        token = await self.login("testuser", "password123")
+        other = await self.login("otheruser", "password123")
+        await self.connection.request("POST", "/borrow", {"title": "Test Book"}, token)
+        status, payload = await self.connection.request("POST", "/holds", {"title": "Test Book"}, other)
+        self.assertEqual(payload["message"], "You are number 1 in the queue for Test Book.")
+        status, payload = await self.connection.request("GET", "/holds?title=Test%20Book")
+        self.assertEqual(payload["queue"], ["otheruser"])
+        status, payload = await self.connection.request("DELETE", "/holds?title=Test%20Book", None, other)
+        self.assertEqual(payload["message"], "Your hold on Test Book has been cancelled.")
+
+    # testing metrics are served in the Prometheus text format once enabled
+    async def test_metrics(self):
+        status, _ = await self.connection.request("GET", "/metrics")
+        self.assertEqual(status, 404)
+        self.library.metrics = Metrics()
+        self.library.metrics.instrument(self.library)
+        await self.connection.request("GET", "/search/title?q=Test%20Book")
+        status, payload = await self.connection.request("GET", "/metrics")
+        self.assertIn('library_call_duration_seconds_count{method="search_by_title"} 1', payload)
+        status, payload = await self.connection.request("GET", "/metrics?format=json")
+        self.assertEqual(payload["methods"]["search_by_title"]["calls"], 1)
+
+    # testing borrowing needs a login and wrong passwords are refused
+    async def test_authentication(self):
+        status, payload = await self.connection.request("POST", "/borrow", {"title": "Test Book"})
+        self.assertEqual(status, 401)
+        status, payload = await self.connection.request("POST", "/login", {"username": "testuser", "password": "x"})
+        self.assertEqual(status, 401)
+
+    # testing only the librarian can add and remove books
+    async def test_librarian_endpoints(self):
+        reader = await self.login("testuser", "password123")
+        status, _ = await self.connection.request("POST", "/books", {"title": "New Book", "author": "New Author"}, reader)
+        self.assertEqual(status, 403)
+
+        librarian = await self.login("admin", "admin")
+        status, payload = await self.connection.request("POST", "/books", {"title": "New Book", "author": "New Author"}, librarian)
+        self.assertEqual(payload["message"], "New Book by New Author has been successfully added to the Library.")
+        status, payload = await self.connection.request("DELETE", "/books?title=Test%20Book", None, librarian)
+        self.assertEqual(payload["message"], "Test Book has been successfully removed from the Library.")
+        status, payload = await self.connection.request("GET", "/books")
+        self.assertEqual([book["title"] for book in payload["books"]], ["New Book"])
+
+    # testing unknown paths and bad bodies
+    async def test_errors(self):
+        status, _ = await self.connection.request("GET", "/nothing")
+        self.assertEqual(status, 404)
+        status, _ = await self.connection.request("PUT", "/books")
+        self.assertEqual(status, 405)
+        status, _ = await self.connection.request("POST", "/register", ["not", "an", "object"])
+        self.assertEqual(status, 400)
+
+    # testing a request with a malformed Content-Length is answered with 400
+    async def test_bad_content_length(self):
+        port = self.listener.sockets[0].getsockname()[1]
+        for length in [b"abc", b"-5"]:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /register HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+            await writer.drain()
+            self.assertTrue((await reader.readline()).startswith(b"HTTP/1.1 400"))
+            writer.close()
+            await writer.wait_closed()
+
+if __name__ == '__main__':
+    unittest.main()
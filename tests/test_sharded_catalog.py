@@ -0,0 +1,55 @@
+import unittest
+from models.book import Book
+from models.sharded_catalog import ShardedCatalog, shard_of
+
+#Tests for the ShardedCatalog class
+class TestShardedCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.books = [Book(f"Book {n} {'ab' if n % 3 == 0 else 'cd'}", f"Author {n % 5}", True) for n in range(60)]
+        self.catalog = ShardedCatalog(self.books, shards=3, parallel_min=0)
+
+    def tearDown(self):
+        self.catalog.close()
+
+    # testing every book is in exactly one shard, picked by its title
+    def test_shard_sizes(self):
+        self.assertEqual(sum(self.catalog.shard_sizes()), 60)
+        expected = [0, 0, 0]
+        for book in self.books:
+            expected[shard_of(book.title, 3)] += 1
+        self.assertEqual(self.catalog.shard_sizes(), expected)
+
+    # testing a scan across the workers gives the same books in the same order as a plain scan
+    def test_parallel_scan_order(self):
+        self.assertIsNone(self.catalog._title_grams.candidates("ab"))
+        expected = [book for book in self.books if "ab" in book.title]
+        self.assertEqual(self.catalog.fuzzy_by_title("ab"), expected)
+        self.assertEqual(self.catalog.fuzzy_by_title("ab", limit=4), expected[:4])
+
+    # testing books added and removed after the workers started are seen by the next scan
+    def test_changes_reach_workers(self):
+        self.catalog.fuzzy_by_title("ab")
+        self.catalog.remove(self.books[0])
+        self.catalog.add(Book("Zz ab", "New Author", True))
+        titles = [book.title for book in self.catalog.fuzzy_by_title("ab")]
+        self.assertNotIn("Book 0 ab", titles)
+        self.assertEqual(titles[-1], "Zz ab")
+        self.assertEqual(len(titles), 20)
+
+    # testing a scan started before a book was removed doesn't return the removed book
+    def test_scan_in_two_steps(self):
+        scan = self.catalog.start_fuzzy("title", "ab", limit=3)
+        self.catalog.remove(self.books[0])
+        books = self.catalog.scanned_books(scan(), limit=3)
+        self.assertEqual(books, [book for book in self.books[1:] if "ab" in book.title][:3])
+        self.assertIsNone(self.catalog.start_fuzzy("title", "Book"))  # the index answers this one
+
+    # testing closing stops the workers and a later scan starts them again with every book
+    def test_close_and_restart(self):
+        self.catalog.fuzzy_by_author("4")
+        self.catalog.close()
+        self.assertEqual(len(self.catalog.fuzzy_by_author("4")), 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import json
+import os
+import sqlite3
+import tempfile
+from models.library import Library
+from storage.migrate import migrate
+from storage.sqlite_storage import SqliteStorage
+
+#Tests for the SQLite storage backend and the JSON migration
+class TestSqliteStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "library.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def open_library(self):
+        return Library(None, None, storage=SqliteStorage(self.db_path))
+
+    # testing that changes made through the library are stored in the database
+    def test_library_round_trip(self):
+        library = self.open_library()
+        library.add_book("Test Book", "Test Author")
+        library.add_book("Other Book", "Other Author")
+        library.register_user("testuser", "password123")
+        library.login("testuser", "password123")
+        library.borrow_book("Test Book")
+        library.remove_book("Other Book")
+        library.storage.close()
+
+        reloaded = self.open_library()
+        self.assertEqual([book.title for book in reloaded.books], ["Test Book"])
+        self.assertFalse(reloaded.books[0].status)
+        self.assertEqual(reloaded.books[0].borrowed_by, "testuser")
+        self.assertEqual(reloaded.users["testuser"].borrowed_books, ["Test Book"])
+        self.assertEqual(reloaded.users["testuser"].book_ids(), [reloaded.books[0].book_id])
+        reloaded.storage.close()
+
+    # testing a loan is stored in one transaction, the book isn't lent on disk if its user can't be written
+    def test_loan_is_one_transaction(self):
+        library = self.open_library()
+        library.add_book("Test Book", "Test Author")
+        library.register_user("testuser", "password123")
+        library.storage.connection.execute(
+            "CREATE TRIGGER fail_users BEFORE UPDATE ON users BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+        with self.assertRaises(sqlite3.IntegrityError):
+            library.borrow_book("Test Book", user=library.users["testuser"])
+        row = library.storage.connection.execute("SELECT status, borrowed_by FROM books").fetchone()
+        self.assertEqual(tuple(row), (1, None))
+        library.storage.close()
+
+    # testing a database made before books had ids is upgraded and keeps copies apart
+    def test_upgrade_schema(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript("""
+            CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT NOT NULL,
+                title_key TEXT NOT NULL, author_key TEXT NOT NULL, status INTEGER, borrowed_by TEXT,
+                UNIQUE (title_key, author_key));
+            INSERT INTO books (title, author, title_key, author_key, status) VALUES ('Test Book', 'Test Author', 'test book', 'test author', 1);
+        """)
+        connection.close()
+
+        library = self.open_library()
+        self.assertEqual(library.books[0].book_id, 1)
+        library.add_copies("Test Book", "Test Author", 2)
+        library.storage.close()
+        reloaded = self.open_library()
+        self.assertEqual([book.book_id for book in reloaded.books], [1, 2, 3])
+        reloaded.storage.close()
+
+    # testing the id of a removed book isn't given to a new book after a restart
+    def test_ids_not_reused(self):
+        library = self.open_library()
+        library.add_book("Book A", "Test Author")
+        library.add_book("Book B", "Test Author")
+        library.remove_book("Book B")
+        library.storage.close()
+        reloaded = self.open_library()
+        reloaded.add_book("Book C", "Test Author")
+        self.assertEqual([book.book_id for book in reloaded.books], [1, 3])
+        reloaded.storage.close()
+
+    # testing the indexed lookup queries
+    def test_indexed_queries(self):
+        library = self.open_library()
+        library.add_book("Test Book", "Test Author")
+        library.add_book("Another Book", "Test Author")
+        library.register_user("testuser", "password123")
+        library.login("testuser", "password123")
+        library.borrow_book("Another Book")
+
+        storage = library.storage
+        self.assertEqual([row["author"] for row in storage.find_by_title("test book")], ["Test Author"])
+        self.assertEqual(len(storage.find_by_author("TEST AUTHOR")), 2)
+        self.assertEqual([row["title"] for row in storage.loans_for("testuser")], ["Another Book"])
+        storage.close()
+
+    # testing that the migration copies the JSON files into the database
+    def test_migrate(self):
+        books_path = os.path.join(self.temp_dir.name, "library_data.json")
+        users_path = os.path.join(self.temp_dir.name, "users_data.json")
+        with open(books_path, "w") as file:
+            json.dump([{"title": "Dream Count", "author": "Khanya", "status": False, "borrowed_by": "khanya123"}], file)
+        with open(users_path, "w") as file:
+            json.dump({"khanya123": {"password": "password123", "role": "reader", "borrowed_books": ["Dream Count"]}}, file)
+
+        self.assertEqual(migrate(books_path, users_path, self.db_path), (1, 1))
+        library = self.open_library()
+        self.assertEqual(library.books[0].borrowed_by, "khanya123")
+        self.assertEqual(library.users["khanya123"].borrowed_books, ["Dream Count"])
+        self.assertEqual(library.users["khanya123"].book_ids(), [1]) # linked by the migration
+        library.storage.close()
+
+if __name__ == '__main__':
+    unittest.main()
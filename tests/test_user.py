@@ -38,6 +38,40 @@ class TestUser(unittest.TestCase):
         user.remove_borrowed_book("Test Book")
         self.assertNotIn("Test Book", user.borrowed_books)
 
+    # testing borrowed books keep their order and can be checked without a scan
+    def test_has_borrowed(self):
+        user = User("testuser", "password123")
+        user.borrowed_books = ["Book B", "Book A"]
+        user.add_borrowed_book("Book C")
+        self.assertTrue(user.has_borrowed("Book A"))
+        self.assertFalse(user.has_borrowed("Book D"))
+        self.assertEqual(user.borrowed_books, ["Book B", "Book A", "Book C"])
+
+    # testing loans are keyed by book id and old loans by title can be linked to an id
+    def test_loans_by_id(self):
+        user = User("testuser", "password123")
+        user.borrowed_books = ["Old Book"]
+        user.add_borrowed_book("Test Book", 7)
+        user.add_borrowed_book("Test Book", 8)
+        self.assertEqual(user.book_ids(), [7, 8])
+        self.assertTrue(user.has_borrowed(8))
+        user.remove_borrowed_book("Test Book", 7)
+        user.link_loan("Old Book", 3)
+        self.assertEqual(user.loans(), [(3, "Old Book"), (8, "Test Book")])
+
+    # testing loans kept by id are still found and removed by their title
+    def test_title_index(self):
+        user = User("testuser", "password123")
+        user.add_borrowed_book("Test Book", 7)
+        user.add_borrowed_book("Test Book", 8)
+        user.add_borrowed_book("Other Book", 9)
+        self.assertTrue(user.has_borrowed("Test Book"))
+        user.remove_borrowed_book("Test Book")
+        self.assertEqual(user.book_ids(), [8, 9])
+        user.remove_borrowed_book("Test Book")
+        self.assertFalse(user.has_borrowed("Test Book"))
+        self.assertTrue(user.has_borrowed("Other Book"))
+
     # testing removing non-existent borrowed book
     def test_remove_nonexistent_borrowed_book(self):
         user = User("testuser", "password123")
@@ -0,0 +1,63 @@
+# Crash safe file replacement: write a temporary file, then rename it over the target
+
+import os
+import shutil
+import tempfile
+
+
+# Method to get the path of the copy of the last good version of a file
+def backup_path(path):
+    return path + ".bak"
+
+
+# Method to replace the file at path with text so that a crash leaves either the old
+# or the new contents, never a truncated file. The previous version is kept as a
+# backup. With fsync=True the data is on disk before the method returns.
+# text may also be bytes, which are written as they are, text is written as UTF-8.
+# Returns the number of bytes written
+def atomic_write(path, text, fsync=True, backup=True):
+    directory = os.path.dirname(path) or "."
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+            file.flush()
+            if fsync:
+                os.fsync(file.fileno())
+        if backup and os.path.exists(path):
+            _keep_backup(path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if fsync:
+        _fsync_directory(directory)
+    return len(data)
+
+
+# Method to keep the current version as the backup without ever removing the file itself
+def _keep_backup(path):
+    temp_backup = backup_path(path) + ".tmp"
+    try:
+        if os.path.exists(temp_backup):
+            os.remove(temp_backup)
+        os.link(path, temp_backup)
+    except OSError: # file system without hard links
+        shutil.copy2(path, temp_backup)
+    os.replace(temp_backup, backup_path(path))
+
+
+# Method to make a rename durable, not every platform can open a directory
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,82 @@
+# Priority queue of items ordered by due time, for finding what is overdue without
+# looking at every item
+
+import heapq
+import itertools
+
+
+class DueQueue:
+    # Items are kept in a binary heap of (due time, key, entry number). Removing or moving an
+    # item only forgets its entry number, the old heap entry is skipped when it comes up and
+    # the heap is rebuilt once more than half of it is such stale entries
+    def __init__(self):
+        self._heap = []
+        self._entries = {}  # key -> (due time, entry number) of the item's live heap entry
+        self._numbers = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    # Method to add an item or change its due time
+    def push(self, key, due):
+        entry = (due, next(self._numbers))
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (due, key, entry[1]))
+
+    def discard(self, key):
+        if self._entries.pop(key, None) is not None and len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [item for item in self._heap if self._live(item)]
+            heapq.heapify(self._heap)
+
+    def due(self, key):
+        entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def _live(self, item):
+        due, key, number = item
+        return self._entries.get(key) == (due, number)
+
+    # Method to yield (due time, key) of the items in due order, starting with the earliest.
+    # The heap isn't changed: positions are visited through a second heap holding the
+    # children of the positions visited so far, so the first k items take O(k log k)
+    def iter_due(self):
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            item, position = heapq.heappop(frontier)
+            if self._live(item):
+                yield item[0], item[1]
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    # Method to get (due time, key) of the items due before now, earliest first. An item
+    # due exactly at now isn't included, the same rule as Book.is_overdue. Without a limit
+    # the heap is walked down to the first item not due yet on every branch and what was
+    # found is sorted once, which is cheaper than visiting in order
+    def due_before(self, now, limit=None):
+        if limit is not None:
+            return list(itertools.islice(itertools.takewhile(lambda item: item[0] < now, self.iter_due()), limit))
+        heap = self._heap
+        found = []
+        positions = [0] if heap else []
+        while positions:
+            position = positions.pop()
+            item = heap[position]
+            if item[0] >= now:
+                continue  # so is everything below it
+            if self._live(item):
+                found.append(item)
+            child = 2 * position + 1
+            positions.extend(range(child, min(child + 2, len(heap))))
+        found.sort()
+        return [(due, key) for due, key, _ in found]
+
+    # Method to get (due time, key) of the n items due first
+    def first(self, n):
+        return list(itertools.islice(self.iter_due(), n))
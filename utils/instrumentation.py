@@ -0,0 +1,168 @@
+# Opt-in instrumentation of Library methods: call counts, latency histograms and bytes
+# written, exported as JSON or in the Prometheus text format.
+# Setting LIBRARY_PROFILE=PATH also profiles the instrumented calls with cProfile and
+# writes the stats to PATH when the program exits (read them with python -m pstats PATH)
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+PROFILE_ENV = "LIBRARY_PROFILE"
+
+# upper bounds of the latency buckets in seconds, slower calls fall in the +Inf bucket
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Library methods timed by Metrics.instrument
+INSTRUMENTED = ("load_books", "add_book_to_file", "save_users", "search_by_title", "search_by_author",
+                "search_ranked", "add_book", "remove_book", "borrow_book", "return_book")
+
+# Storage backend methods timed by Metrics.instrument as "storage.<name>", the library
+# persists every change through them
+STORAGE_INSTRUMENTED = ("save_books", "save_users", "put_book", "put_books", "delete_book", "put_user",
+                        "write_batch")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, not cumulative
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    # Method to get (upper bound, calls at or below it) pairs the way Prometheus expects them
+    def cumulative(self):
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    def __init__(self, buckets=BUCKETS, profile_path=None):
+        self.buckets = buckets
+        self.histograms = {}  # method name -> Histogram
+        self.errors = {}  # method name -> calls that raised
+        self._lock = threading.Lock()
+        self._bytes_written = lambda: 0
+        self._cache_stats = lambda: None
+        self.profile_path = profile_path or os.environ.get(PROFILE_ENV)
+        self.profiler = None
+        if self.profile_path:
+            import cProfile # only imported when profiling, it slows down startup
+            self.profiler = cProfile.Profile()
+            self._profile_lock = threading.RLock()
+            self._profile_depth = 0
+            atexit.register(self.dump_profile)
+
+    # Method to time the given methods of a library from now on, by replacing them on the instance,
+    # and the write methods of its storage backend. A backend wrapping another one, like
+    # GroupCommitStorage, only queues changes, so the one it writes to is timed as "storage.inner.<name>"
+    def instrument(self, library, names=INSTRUMENTED):
+        for name in names:
+            setattr(library, name, self.wrap(name, getattr(library, name)))
+        prefix, storage = "storage.", library.storage
+        while storage is not None:
+            for name in STORAGE_INSTRUMENTED:
+                setattr(storage, name, self.wrap(prefix + name, getattr(storage, name)))
+            prefix, storage = prefix + "inner.", getattr(storage, "inner", None)
+        self._bytes_written = library.storage.written_bytes
+        self._cache_stats = library.search_cache.stats
+
+    # Method to wrap a function so every call is counted and timed under name
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            failed = True
+            start = time.perf_counter()
+            try:
+                result = self._call(function, args, kwargs)
+                failed = False
+                return result
+            finally:
+                self.observe(name, time.perf_counter() - start, failed)
+        return timed
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    # Calls are profiled one thread at a time: a call made while another thread is being
+    # profiled just runs, and calls nested in a profiled call are part of its profile
+    def _call(self, function, args, kwargs):
+        if self.profiler is None or not self._profile_lock.acquire(blocking=False):
+            return function(*args, **kwargs)
+        try:
+            self._profile_depth += 1
+            if self._profile_depth > 1:
+                return function(*args, **kwargs)
+            return self.profiler.runcall(function, *args, **kwargs)
+        finally:
+            self._profile_depth -= 1
+            self._profile_lock.release()
+
+    # Method to write the cProfile stats collected so far
+    def dump_profile(self):
+        if self.profiler is not None:
+            with self._profile_lock:
+                self.profiler.dump_stats(self.profile_path)
+
+    # Method to get every metric as a JSON friendly dict
+    def snapshot(self):
+        with self._lock:
+            methods = {}
+            for name, histogram in sorted(self.histograms.items()):
+                methods[name] = {
+                    "calls": histogram.count,
+                    "errors": self.errors.get(name, 0),
+                    "total_s": histogram.sum,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "buckets": {("+Inf" if bound == float("inf") else str(bound)): count
+                                for bound, count in histogram.cumulative()}
+                }
+        return {"methods": methods, "bytes_written": self._bytes_written(), "search_cache": self._cache_stats()}
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=4)
+
+    # Method to get every metric in the Prometheus text exposition format
+    def to_prometheus(self, prefix="library"):
+        lines = [f"# HELP {prefix}_call_duration_seconds Time spent in Library and storage methods.",
+                 f"# TYPE {prefix}_call_duration_seconds histogram"]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            errors = dict(self.errors)
+        for name, histogram in histograms:
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{method="{name}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_call_duration_seconds_sum{{method="{name}"}} {histogram.sum!r}')
+            lines.append(f'{prefix}_call_duration_seconds_count{{method="{name}"}} {histogram.count}')
+        lines += [f"# HELP {prefix}_call_errors_total Library method calls that raised an exception.",
+                  f"# TYPE {prefix}_call_errors_total counter"]
+        for name, _ in histograms:
+            lines.append(f'{prefix}_call_errors_total{{method="{name}"}} {errors.get(name, 0)}')
+        lines += [f"# HELP {prefix}_storage_written_bytes_total Data written by the storage backend.",
+                  f"# TYPE {prefix}_storage_written_bytes_total counter",
+                  f"{prefix}_storage_written_bytes_total {self._bytes_written()}"]
+        cache = self._cache_stats()
+        if cache is not None:
+            for name in ("hits", "misses", "evictions"):
+                lines += [f"# TYPE {prefix}_search_cache_{name}_total counter",
+                          f"{prefix}_search_cache_{name}_total {cache[name]}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,66 @@
+# Append-only journal of JSON records, one compact record per line
+
+import json
+import os
+
+
+class Journal:
+    # With fsync=True every write waits until the records are on disk, so an appended
+    # change survives a crash just like a rewritten file does
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.count = 0  # records written since the last truncate, updated by replay and append
+
+    def __len__(self):
+        return self.count
+
+    # Method to check whether the journal holds anything to replay
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    # Method to append one record to the end of the journal, returns the number of bytes written
+    def append(self, record):
+        return self.extend([record])
+
+    # Method to append several records with a single write
+    def extend(self, records):
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode("utf-8")
+        if not lines:
+            return 0
+        with open(self.path, "ab") as file:
+            file.write(lines)
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+        self.count += len(records)
+        return len(lines)
+
+    # Method to read back every record in the order it was written.
+    # A half written last line (e.g. after a crash) is cut off so new records
+    # are not appended behind it.
+    def replay(self):
+        self.count = 0
+        if not os.path.exists(self.path):
+            return
+        good_size = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                good_size += len(line)
+                self.count += 1
+                yield record
+        if good_size < os.path.getsize(self.path):
+            os.truncate(self.path, good_size)
+
+    # Method to empty the journal once its records are folded into a snapshot
+    def truncate(self):
+        if os.path.exists(self.path):
+            with open(self.path, "w"):
+                pass
+        self.count = 0
@@ -0,0 +1,148 @@
+# Incremental parser for files holding one large top-level JSON array
+
+import json
+
+WHITESPACE = " \t\n\r"
+
+
+# Method to yield the items of the JSON array in file one at a time.
+# Only about chunk_size characters plus the current item are held in memory.
+# Raises json.JSONDecodeError if the file is not a valid JSON array.
+def iter_json_array(file, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    # Method to make sure the buffer holds at least one character after pos
+    def fill():
+        nonlocal buffer, pos, eof
+        while not eof and _skip(buffer, pos) >= len(buffer):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        pos = _skip(buffer, pos)
+        return pos < len(buffer)
+
+    if not fill() or buffer[pos] != "[":
+        raise json.JSONDecodeError("Expecting '['", buffer, pos)
+    pos += 1
+    if fill() and buffer[pos] == "]":
+        return
+
+    while True:
+        if not fill():
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                after = _skip(buffer, end)
+                # only trust the item once the delimiter after it is in the buffer,
+                # a number cut off by the end of a chunk decodes to a shorter number
+                if eof or (after < len(buffer) and buffer[after] in ",]"):
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        pos = end
+        yield item
+
+        if not fill():
+            raise json.JSONDecodeError("Unterminated array", buffer, pos)
+        if buffer[pos] == "]":
+            return
+        if buffer[pos] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
+        if pos > chunk_size:  # drop what was already parsed
+            buffer = buffer[pos:]
+            pos = 0
+
+
+# Method to yield the items of the array stored under key in the JSON object in file one
+# at a time, like iter_json_array. The members written before the array are put in header,
+# they are expected to be small; anything after the array is not read. A file holding just
+# an array, as written before the object form existed, yields that array's items
+def iter_json_object_array(file, key, header, chunk_size=65536):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+
+    # Method to get the next character that isn't whitespace, "" at the end of the file
+    def peek():
+        nonlocal buffer, pos
+        pos = _skip(buffer, pos)
+        while pos >= len(buffer):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return ""
+            buffer = chunk
+            pos = _skip(buffer, 0)
+        return buffer[pos]
+
+    # Method to decode the value at pos, reading on until the delimiter after it is in the buffer
+    def value():
+        nonlocal buffer, pos
+        while True:
+            peek()
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                if _skip(buffer, end) < len(buffer):
+                    pos = end
+                    return item
+            except json.JSONDecodeError:
+                pass
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise json.JSONDecodeError("Unterminated object", buffer, pos)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", buffer, pos)
+        pos += 1
+
+    if peek() == "[":
+        yield from iter_json_array(_Prefixed(buffer[pos:], file), chunk_size)
+        return
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        name = value()
+        if not isinstance(name, str):
+            raise json.JSONDecodeError("Expecting property name", buffer, pos)
+        expect(":")
+        if name == key:
+            yield from iter_json_array(_Prefixed(buffer[pos:], file), chunk_size)
+            return
+        header[name] = value()
+        expect(",")
+
+
+# File-like object that reads text that was already read from file before the rest of file
+class _Prefixed:
+    def __init__(self, text, file):
+        self.text = text
+        self.file = file
+
+    def read(self, size):
+        if self.text:
+            text, self.text = self.text, ""
+            return text
+        return self.file.read(size)
+
+
+def _skip(text, pos):
+    while pos < len(text) and text[pos] in WHITESPACE:
+        pos += 1
+    return pos
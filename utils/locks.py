@@ -0,0 +1,13 @@
+# Fixed set of locks shared out by key, so unrelated keys rarely wait on each other
+
+import threading
+import zlib
+
+
+class LockStripes:
+    def __init__(self, count=64):
+        self._locks = [threading.Lock() for _ in range(count)]
+
+    # Method to get the lock guarding this key, the same key always gets the same lock
+    def for_key(self, key):
+        return self._locks[zlib.crc32(key.encode("utf-8")) % len(self._locks)]
@@ -0,0 +1,99 @@
+# Salted password hashes with a tunable work factor, using the standard library's scrypt
+# or PBKDF2. Hashes are stored as text that names the scheme and its parameters:
+#   scrypt$<log2 of n>$<r>$<p>$<salt>$<hash>
+#   pbkdf2_sha256$<iterations>$<salt>$<hash>
+# with the salt and hash in base64. Anything else is taken to be a plain text password
+# saved before passwords were hashed
+
+import base64
+import hashlib
+import hmac
+import os
+from utils.query_cache import MISSING, QueryCache
+
+SCHEMES = ("scrypt", "pbkdf2_sha256")
+DEFAULT_COSTS = {"scrypt": 14, "pbkdf2_sha256": 600000}  # log2 of n for scrypt, iterations for PBKDF2
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _decode(text):
+    return base64.b64decode(text.encode("ascii"), validate=True)
+
+
+class PasswordHasher:
+    # cost is the work factor: scrypt uses n = 2 ** cost with block size r and parallelism p,
+    # PBKDF2 does cost iterations of HMAC-SHA256. With cache_size > 0 the passwords that
+    # verified in the last cache_ttl seconds are remembered, keyed by an HMAC of the password
+    # with a key made for this process, so repeated logins skip the slow hash
+    def __init__(self, scheme="scrypt", cost=None, r=8, p=1, cache_size=0, cache_ttl=300.0):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password scheme: {scheme}")
+        self.scheme = scheme
+        self.cost = DEFAULT_COSTS[scheme] if cost is None else cost
+        self.r = r
+        self.p = p
+        self.cache = QueryCache(cache_size, cache_ttl)
+        self._cache_key = os.urandom(32)
+
+    # Method to get the stored form of a password, with a new random salt
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        if self.scheme == "scrypt":
+            params = (self.cost, self.r, self.p)
+        else:
+            params = (self.cost,)
+        digest = self._derive(self.scheme, params, password, salt)
+        return "$".join([self.scheme, *map(str, params), _encode(salt), _encode(digest)])
+
+    # Method to check a password against its stored form, in constant time
+    def verify(self, password, stored):
+        cache_key = (stored, hmac.digest(self._cache_key, password.encode("utf-8"), "sha256"))
+        if self.cache.get(cache_key) is not MISSING:
+            return True
+        parsed = self.parse(stored)
+        if parsed is None:
+            matches = hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+        else:
+            scheme, params, salt, digest = parsed
+            matches = hmac.compare_digest(self._derive(scheme, params, password, salt), digest)
+        if matches:
+            self.cache.put(cache_key, True)
+        return matches
+
+    # Method to tell whether a stored password should be hashed again with the current
+    # scheme and work factor, true for plain text passwords
+    def needs_rehash(self, stored):
+        parsed = self.parse(stored)
+        if parsed is None:
+            return True
+        scheme, params, _, _ = parsed
+        if scheme != self.scheme:
+            return True
+        return params != ((self.cost, self.r, self.p) if scheme == "scrypt" else (self.cost,))
+
+    # Method to split a stored hash into (scheme, parameters, salt, hash), None for plain text
+    @staticmethod
+    def parse(stored):
+        parts = stored.split("$")
+        counts = {"scrypt": 6, "pbkdf2_sha256": 4}
+        if counts.get(parts[0]) != len(parts):
+            return None
+        try:
+            params = tuple(int(part) for part in parts[1:-2])
+            return parts[0], params, _decode(parts[-2]), _decode(parts[-1])
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _derive(scheme, params, password, salt):
+        if scheme == "scrypt":
+            cost, r, p = params
+            n = 2 ** cost
+            return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                                  maxmem=128 * r * (n + p + 2) + 1024 * 1024, dklen=HASH_BYTES)
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, params[0], dklen=HASH_BYTES)
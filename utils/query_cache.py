@@ -0,0 +1,71 @@
+# Bounded LRU cache for search results with a time to live and O(1) invalidation
+
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object() # returned by get when the key isn't cached
+
+
+class QueryCache:
+    # At most maxsize results are kept, the least recently used one is evicted first, and
+    # results older than ttl seconds are not returned. invalidate() makes every cached
+    # result stale at once by moving to a new generation, stale entries are dropped lazily
+    def __init__(self, maxsize=1024, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # key -> (generation, expiry time, value)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Method to get the cached value of key, or MISSING
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                generation, expires, value = entry
+                if generation == self.generation and self.clock() < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    # Method to cache a value. Given the generation the value was computed in, it is only
+    # kept if nothing was invalidated since
+    def put(self, key, value, generation=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self.generation, self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    # Method to make every cached value stale, called whenever the data behind them changes
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,134 @@
+# Inverted n-gram index used to answer fuzzy searches without scanning every book,
+# and to rank books by how similar they are to a query (typos included)
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+def tokenize(text):
+    return text.lower().split()  # same normalization as fuzzy_search
+
+
+def ngrams(word, n=3):
+    return {word[i:i + n] for i in range(len(word) - n + 1)}
+
+
+# Method to get the n-grams of a word with a space on either side, so short words and
+# the start and end of words get n-grams of their own
+def padded_ngrams(word, n=3):
+    return ngrams(f" {word} ", n)
+
+
+class NgramIndex:
+    # Ranking reads the posting lists of the query's rarest n-grams until about
+    # rank_budget document ids were counted, then scores the best candidates exactly
+    def __init__(self, n=3, rank_budget=20000):
+        self.n = n
+        self.rank_budget = rank_budget
+        # n-gram -> sorted array of document ids, 4 bytes per id instead of a set entry
+        self._postings = {}
+        self._texts = {}  # document id -> indexed text, used to score candidates
+
+    def __len__(self):
+        return len(self._postings)
+
+    # Method to index the n-grams of every word in the text under doc_id. Ids are usually
+    # added in increasing order, so they are appended to the postings
+    def add(self, doc_id, text):
+        grams = self._grams(text)
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                self._postings[gram] = array("i", (doc_id,))
+            elif posting[-1] < doc_id:
+                posting.append(doc_id)
+            else:
+                position = bisect_left(posting, doc_id)
+                if position == len(posting) or posting[position] != doc_id:
+                    posting.insert(position, doc_id)
+        self._texts[doc_id] = text
+
+    # Method to remove a document, text must be the same text it was added with
+    def remove(self, doc_id, text):
+        for gram in self._grams(text):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                position = bisect_left(posting, doc_id)
+                if position < len(posting) and posting[position] == doc_id:
+                    del posting[position]
+                if not posting:
+                    del self._postings[gram]
+        self._texts.pop(doc_id, None)
+
+    def clear(self):
+        self._postings.clear()
+        self._texts.clear()
+
+    # Method to get the ids of documents that may contain every query word.
+    # Returns None when no query word is long enough to use the index, the caller
+    # then has to check every document. Results still need to be confirmed with
+    # fuzzy_search because n-grams can match out of order.
+    def candidates(self, query):
+        grams = set()
+        for word in tokenize(query):
+            if len(word) >= self.n:
+                grams |= ngrams(word, self.n)
+        if not grams:
+            return None
+
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)  # intersect the smallest posting lists first
+
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if len(result) * 16 < len(posting): # few ids left, look each one up
+                result = {doc_id for doc_id in result if _contains(posting, doc_id)}
+            else:
+                result.intersection_update(posting)
+            if not result:
+                break
+        return result
+
+    # Method to get the k documents most similar to the query as (score, doc_id) pairs,
+    # best first. The score is the Dice coefficient of the two sets of n-grams, from 0 to 1,
+    # so misspelled or partial queries still find close matches
+    def rank(self, query, k=10, min_score=0.1):
+        query_grams = self._grams(query)
+        if not query_grams or k <= 0:
+            return []
+
+        # count shared n-grams starting from the rarest, common ones add little but cost most
+        postings = sorted((self._postings.get(gram, ()) for gram in query_grams), key=len)
+        overlaps = Counter()
+        counted = 0
+        for posting in postings:
+            if counted and counted + len(posting) > self.rank_budget:
+                break
+            overlaps.update(posting)
+            counted += len(posting)
+
+        scored = []
+        for doc_id, _ in overlaps.most_common(max(10 * k, 100)):
+            doc_grams = self._grams(self._texts[doc_id])
+            score = 2 * len(query_grams & doc_grams) / (len(query_grams) + len(doc_grams))
+            if score >= min_score:
+                scored.append((score, doc_id))
+        return heapq.nsmallest(k, scored, key=lambda item: (-item[0], item[1]))
+
+    # the n-grams of a text are the padded n-grams of its words, they include every
+    # n-gram inside the words so substring candidates can still be found
+    def _grams(self, text):
+        grams = set()
+        for word in tokenize(text):
+            grams |= padded_ngrams(word, self.n)
+        return grams
+
+
+def _contains(posting, doc_id):
+    position = bisect_left(posting, doc_id)
+    return position < len(posting) and posting[position] == doc_id